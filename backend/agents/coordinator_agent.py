@@ -1,38 +1,36 @@
-import asyncio
+import time
+import uuid
 from langgraph.graph import StateGraph, END
 from google.genai import types 
-import json
 from backend.model_interactions.coordinator_model import call_gemini
 from backend.states.coordinator_states import CoordinatorState
 from backend.states.web_automation_states import WebAutomationState
 from backend.agents.web_automation_agent import web_automation_agent_graph
+from backend.agents.progress import report_progress
+from backend.agents.executor import SubAgentExecutor, GoalJob
+from backend.metrics import instrumented, goal_trace
 
 async def call_gemini_model(state: CoordinatorState):
     state["tool_call"] = False
+    history = state["history"]
     if state["last_user_message"] is None:
-        response = call_gemini(conversation_history = state["conversation_history"])
+        response = await call_gemini(conversation_history = await history.contents())
     else:
-        pages = await state['browser_manager'].get_page_summaries()
-        user_content_with_json = types.Content(
-        role="user",
-        parts=[
-            types.Part.from_text(text=f"{state['last_user_message']}\n\n PAGE DATA IN JSON"),
-            types.Part.from_text(text=f"```json\n{json.dumps(pages)}\n```")
-        ]
-        )
-
-        response = call_gemini(input_content=user_content_with_json,
-                               conversation_history = state["conversation_history"])
-        
-        conversation_history = state["conversation_history"]
-        conversation_history.append(types.Content(role="user", parts=[types.Part.from_text(text=state["last_user_message"])]))
+        if state.get('worker_pool') is not None:
+            pages = await state['worker_pool'].get_page_summaries(state['session_id'])
+        else:
+            context = await state['browser_manager'].context_for(state['session_id'])
+            pages = await state['browser_manager'].get_page_summaries(context)
+        # the page data stays in the history until newer page data replaces it
+        history.add_user_message(state["last_user_message"], pages)
+
+        response = await call_gemini(conversation_history = await history.contents())
 
         for _part in response.parts:
             if _part.function_call:
                 state["tool_call"] = True
                 break
         
-        state["conversation_history"] = conversation_history
         state["last_user_message"] = None
     
     state["model_response"] = response
@@ -41,9 +39,10 @@ async def call_gemini_model(state: CoordinatorState):
 
 async def process_model_output(state: CoordinatorState):
     # send to Streamlit UI
-    state["conversation_history"].append(types.Content(role="model", parts=state["model_response"].parts))
+    state["history"].add(types.Content(role="model", parts=state["model_response"].parts))
     
     response = []
+    state["goal_ids"] = []
     for _part in state["model_response"].parts:
         if _part.text:
             response.append({
@@ -51,59 +50,113 @@ async def process_model_output(state: CoordinatorState):
                 "text": _part.text
             })
         else:
+            # progress events of this goal carry the same id
+            goal_id = uuid.uuid4().hex[:12]
+            state["goal_ids"].append(goal_id)
             response.append({
                 "role": "model",
+                "goal_id": goal_id,
                 "function_call": {
                     "name": _part.function_call.name,
                     "args": _part.function_call.args
                 }
             })
-    await state["ws"].send_json(response)
+    await state["progress"].send(response)
 
     # GRAPH WILL STOP → waiting for next user message
     return state
 
 
 async def handle_tool_call(state: CoordinatorState):
-    def get_web_interaction_state(goal, page):
+    if state.get("worker_pool") is not None:
+        return await handle_tool_call_in_workers(state)
+
+    def get_web_interaction_state(job, page):
         _state = WebAutomationState()
         _state["browser_manager"] = state["browser_manager"]
-        _state["goal_statement"] = goal
+        _state["goal_statement"] = job.goal_statement
         _state["page"] = page
         _state["action_history"] = []
         _state["action"] = None
+        _state["goal_id"] = job.goal_id
+        _state["progress"] = job.progress
+        _state["control"] = state.get("control")
         # _state["url"] = url
         return _state
 
-    # Build initial subgraph states
-    state["subgraph_states"] = []
+    # One job per web_interaction call; goals without page_index get a tab from the executor
+    context = await state["browser_manager"].context_for(state["session_id"])
+    goal_ids = iter(state["goal_ids"])
+    jobs = []
     for _part in state['model_response'].parts:
         if _part.function_call:
             if "page_index" in _part.function_call.args:
-                page = state["browser_manager"].context.pages[_part.function_call.args["page_index"]]
+                page = context.pages[_part.function_call.args["page_index"]]
                 goal_statement = f"{_part.function_call.args['goal']}"
             else:
-                page = await state["browser_manager"].context.new_page()
+                page = None
                 goal_statement = f"{_part.function_call.args['goal']} WEBSITE - {_part.function_call.args['url']}"
-            _state = get_web_interaction_state(goal=goal_statement, page=page)
-            state["subgraph_states"].append(_state)
+            jobs.append(GoalJob(next(goal_ids), goal_statement, tab=page, forward=state["progress"].publish))
+
+    async def run_goal(job, page):
+        started = time.monotonic()
+        with goal_trace(job.goal_id, job.goal_statement):
+            result = await web_automation_agent_graph.ainvoke(get_web_interaction_state(job, page), {"recursion_limit": 80})
+        report_progress(result, "finished", started, status=result.get("action"))
+        return result, page
 
-    # Run all subgraphs and CAPTURE updated states
-    subgraph_tasks = [
-        web_automation_agent_graph.ainvoke(_state, {"recursion_limit": 80})
-        for _state in state["subgraph_states"]
-    ]
+    async def close_tab(page):
+        await page.close()
 
-    updated_states = await asyncio.gather(*subgraph_tasks)
+    # Bounded parallelism; failed / timed out goals come back as results, each goal can be cancelled on its own
+    executor = SubAgentExecutor(run_goal, control=state.get("control"), open_tab=context.new_page, close_tab=close_tab)
+    state["subgraph_states"] = await executor.run_all(jobs)
+    return state
+
+
+async def handle_tool_call_in_workers(state: CoordinatorState):
+    # Same as handle_tool_call, but every goal runs in a browser worker process; tabs are recycled by page_id
+    pool = state["worker_pool"]
+    goal_ids = iter(state["goal_ids"])
+    jobs = []
+    for _part in state['model_response'].parts:
+        if _part.function_call:
+            if "page_index" in _part.function_call.args:
+                page_id = pool.resolve_page_index(state["session_id"], int(_part.function_call.args["page_index"]))
+                goal_statement = f"{_part.function_call.args['goal']}"
+            else:
+                page_id = None
+                goal_statement = f"{_part.function_call.args['goal']} WEBSITE - {_part.function_call.args['url']}"
+            jobs.append(GoalJob(next(goal_ids), goal_statement, tab=page_id, forward=state["progress"].publish))
 
-    # Replace with updated versions
-    state["subgraph_states"] = updated_states
+    async def run_goal(job, page_id):
+        result = await pool.run_goal(state["session_id"], job.goal_statement, page_id=page_id, goal_id=job.goal_id,
+                                     progress=job.progress)
+        return result, result.get("page_id")
 
+    state["subgraph_states"] = await SubAgentExecutor(run_goal, control=state.get("control")).run_all(jobs)
     return state
 
     
+def finished_goal(goal_state):
+    return {"goal_statement": goal_state.get("goal_statement"), "action": goal_state.get("action"),
+            "action_args": dict(goal_state.get("action_args") or {})}
+
+
+def close_pending_tool_calls(state: CoordinatorState):
+    """After a cancelled run: answer the model's unanswered web_interaction calls so the history stays valid."""
+    history = state["history"]
+    if not history.messages or history.messages[-1].role != "model":
+        return
+    for _part in history.messages[-1].parts or []:
+        if _part.function_call:
+            history.add(types.Content(role="user", parts=[types.Part.from_function_response(
+                name=_part.function_call.name,
+                response={"result": {"status": "cancelled", "output": "stopped by the user"}})]))
+
+
 async def post_tool_calls(state: CoordinatorState):
-    conversation_history = state["conversation_history"]
+    history = state["history"]
     # message will come from other sources - fucntion call responses
     for _web_interaction_state in state["subgraph_states"]:
         if _web_interaction_state["action"] == "done":
@@ -112,17 +165,30 @@ async def post_tool_calls(state: CoordinatorState):
             response_dict = {"result": {"status": "awaiting_input", "output": str(_web_interaction_state["action_args"]["information_required"])}}
         elif _web_interaction_state["action"] == "wait_for_action":
             response_dict = {"result": {"status": "awaiting_user_action", "output": _web_interaction_state["action_args"]["action_required"]}}
+        elif _web_interaction_state["action"] == "cancelled":
+            response_dict = {"result": {"status": "cancelled", "output": "stopped by the user"}}
+        elif _web_interaction_state["action"] in ("timeout", "failed"):
+            # partial result: what went wrong and the steps that were done before
+            response_dict = {"result": {"status": _web_interaction_state["action"], "output": "",
+                                        "error": _web_interaction_state["action_args"]["error"],
+                                        "completed_steps": _web_interaction_state["action_args"]["completed_steps"]}}
+        else:
+            response_dict = {"result": {"status": str(_web_interaction_state["action"]), "output": ""}}
 
-        conversation_history.append(types.Content(role="user", parts=[types.Part.from_function_response(name="web_interaction", response=response_dict)]))
+        history.add(types.Content(role="user", parts=[types.Part.from_function_response(name="web_interaction", response=response_dict)]))
+
+    # the results are in the history now: drop pages, screenshots and element snapshots of finished goals
+    state["subgraph_states"] = [finished_goal(_state) for _state in state["subgraph_states"]]
+    return state
 
 
 
 graph = StateGraph(CoordinatorState)
 
-graph.add_node("call_gemini_model", call_gemini_model)
-graph.add_node("process_model_output", process_model_output)
-graph.add_node("handle_tool_call", handle_tool_call)
-graph.add_node("post_tool_calls", post_tool_calls)
+graph.add_node("call_gemini_model", instrumented("node.coordinator.call_gemini_model")(call_gemini_model))
+graph.add_node("process_model_output", instrumented("node.coordinator.process_model_output")(process_model_output))
+graph.add_node("handle_tool_call", instrumented("node.coordinator.handle_tool_call")(handle_tool_call))
+graph.add_node("post_tool_calls", instrumented("node.coordinator.post_tool_calls")(post_tool_calls))
 
 # Entry
 graph.set_entry_point("call_gemini_model")
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.agents.progress import report_progress
+from backend.agents.scheduler import RunControl, run_cancellable
+from backend.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SUBAGENT_CONCURRENCY = int(os.environ.get("YB_SUBAGENT_CONCURRENCY", "4"))
+GOAL_TIMEOUT = float(os.environ.get("YB_GOAL_TIMEOUT", "300"))
+PARTIAL_STEPS = 8
+
+
+@dataclass
+class GoalJob:
+    goal_id: str
+    goal_statement: str
+    tab: Any = None   # fixed tab (page_index / page_id) or None → a recycled or new tab
+    forward: Optional[Callable[[Dict[str, Any]], None]] = None
+    steps: List[str] = field(default_factory=list)
+
+    def progress(self, event: Dict[str, Any]):
+        # progress sink of the run: remembers the step summaries for a partial result, then forwards
+        if event.get("phase") == "decision" and event.get("summary"):
+            self.steps.append(event["summary"])
+            del self.steps[:-PARTIAL_STEPS]
+        if self.forward is not None:
+            self.forward(event)
+
+
+def failed_goal(job: GoalJob, status: str, error: str) -> Dict[str, Any]:
+    return {"goal_statement": job.goal_statement, "action": status,
+            "action_args": {"error": error, "completed_steps": list(job.steps)}}
+
+
+def cancelled_goal(goal_statement):
+    return {"goal_statement": goal_statement, "action": "cancelled", "action_args": {}}
+
+
+class SubAgentExecutor:
+    """
+    Runs the web_interaction goals of one coordinator turn:
+      * at most `max_concurrency` goals at once, the others wait in a FIFO queue
+      * a goal without a fixed tab gets the tab of a goal that finished with
+        `done`, or a new one (`open_tab`), so a turn never holds more than
+        `max_concurrency` new tabs. Tabs of goals waiting on the user stay theirs;
+        tabs of goals that failed, timed out or were cancelled are closed (`close_tab`)
+      * each goal has a timeout, counted while the session is not paused; a goal
+        that times out or raises becomes a
+        structured result (status, error, steps done so far) and the other goals
+        keep running
+      * each goal can be cancelled on its own through the session's RunControl
+    `run(job, tab)` runs one goal and returns `(result, tab it used)`; results come
+    back in the order of the jobs.
+    """
+
+    def __init__(self, run: Callable[[GoalJob, Any], Awaitable[Tuple[Dict[str, Any], Any]]],
+                 control: Optional[RunControl] = None, max_concurrency: Optional[int] = None,
+                 goal_timeout: Optional[float] = None, open_tab: Optional[Callable[[], Awaitable[Any]]] = None,
+                 close_tab: Optional[Callable[[Any], Awaitable[None]]] = None):
+        self._run = run
+        self._open_tab = open_tab
+        self._close_tab = close_tab
+        self.control = control
+        self.max_concurrency = max_concurrency or SUBAGENT_CONCURRENCY
+        self.goal_timeout = goal_timeout or GOAL_TIMEOUT
+        self._queue: Deque[Tuple[int, GoalJob]] = deque()
+        self._free_tabs: List[Any] = []
+
+    async def run_all(self, jobs: List[GoalJob]) -> List[Dict[str, Any]]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        self._queue = deque(enumerate(jobs))
+        slots = min(self.max_concurrency, len(jobs))
+        for position, (_, job) in enumerate(list(self._queue)[slots:], start=1):
+            report_progress({"progress": job.progress, "goal_id": job.goal_id}, "queued", time.monotonic(),
+                            position=position)
+        metrics.size("subagent.goals_per_turn", len(jobs))
+        await asyncio.gather(*(self._worker(results) for _ in range(slots)))
+        return results
+
+    async def _worker(self, results: List[Optional[Dict[str, Any]]]):
+        while self._queue:
+            index, job = self._queue.popleft()
+            tab = job.tab
+            if tab is None and self._free_tabs:
+                tab = self._free_tabs.pop()
+                metrics.count("subagent.tabs_recycled")
+            elif tab is None and self._open_tab is not None:
+                tab = await self._open_tab()
+            used_tab = None
+            try:
+                result, used_tab = await run_cancellable(self.control, job.goal_id, lambda: self._run_one(job, tab),
+                                                         lambda: (cancelled_goal(job.goal_statement), None))
+                results[index] = result
+            finally:
+                # the user's own tabs (page_index) are never recycled nor closed
+                if job.tab is None:
+                    await self._dispose_tab(results[index], used_tab, tab)
+
+    async def _dispose_tab(self, result: Optional[Dict[str, Any]], used_tab: Any, tab: Any):
+        if used_tab is not None:
+            # the goal ended on its own: reuse its tab only if nothing there is left to do,
+            # a tab where the user has to act (or that shows why a goal is stuck) stays as it is
+            if result["action"] == "done":
+                self._free_tabs.append(used_tab)
+            return
+        # failed, timed out or cancelled: the tab is in an unknown state
+        if tab is not None and self._close_tab is not None:
+            try:
+                await self._close_tab(tab)
+            except Exception as e:
+                logger.debug("closing the tab of a failed goal: %s", e)
+
+    def _paused_time(self) -> float:
+        return self.control.paused_time() if self.control is not None else 0.0
+
+    async def _run_with_timeout(self, job: GoalJob, tab: Any) -> Tuple[Dict[str, Any], Any]:
+        # like asyncio.wait_for, but the clock stops while the session is paused
+        task = asyncio.ensure_future(self._run(job, tab))
+        started, paused_before = time.monotonic(), self._paused_time()
+        try:
+            while True:
+                if self.control is not None and self.control.paused:
+                    resumed = asyncio.ensure_future(self.control.checkpoint())
+                    done, _ = await asyncio.wait({task, resumed}, return_when=asyncio.FIRST_COMPLETED)
+                    resumed.cancel()
+                else:
+                    running = time.monotonic() - started - (self._paused_time() - paused_before)
+                    if running >= self.goal_timeout:
+                        raise asyncio.TimeoutError()
+                    done, _ = await asyncio.wait({task}, timeout=self.goal_timeout - running)
+                if task in done:
+                    return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _run_one(self, job: GoalJob, tab: Any) -> Tuple[Dict[str, Any], Any]:
+        started = time.monotonic()
+        try:
+            return await self._run_with_timeout(job, tab)
+        except asyncio.TimeoutError:
+            metrics.count("subagent.timeouts")
+            result = failed_goal(job, "timeout", f"no result after {self.goal_timeout:g}s")
+        except Exception as e:
+            # asyncio.CancelledError is not an Exception: cancellation still propagates
+            logger.exception("goal %s failed: %s", job.goal_id, e)
+            metrics.count("subagent.failures")
+            result = failed_goal(job, "failed", f"{type(e).__name__}: {e}")
+        report_progress({"progress": job.progress, "goal_id": job.goal_id, "step": len(job.steps)}, "finished",
+                        started, status=result["action"], error=result["action_args"]["error"])
+        # no tab to hand back: the worker closes the one it gave the goal
+        return result, None
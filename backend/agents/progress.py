@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_QUEUE_SIZE = int(os.environ.get("YB_PROGRESS_QUEUE", "64"))
+# messages kept for a session while no client is connected
+PROGRESS_BUFFER_SIZE = int(os.environ.get("YB_PROGRESS_BUFFER", "256"))
+PROGRESS_THUMBNAILS = os.environ.get("YB_PROGRESS_THUMBNAILS", "1") == "1"
+
+
+class ProgressChannel:
+    """
+    Ordered outbound stream of one session. It outlives the websocket: while no
+    client is connected messages are buffered, and `attach` on the next socket
+    replays them in order.
+      * `send` is for messages that must arrive (model responses); it waits while
+        the queue is full, so a slow client slows the producer down (backpressure).
+        Without a client it never waits, the oldest message goes once
+        `max_buffered` are waiting
+      * `publish` is for progress events; it never blocks the agents. When the
+        queue is full the oldest queued progress event is dropped, and thumbnails
+        are left out once the queue is half full
+    A single sender task writes to the websocket, so messages never interleave.
+    Once the channel is closed (session released) both drop everything.
+    """
+
+    def __init__(self, ws: Any = None, max_pending: Optional[int] = None, max_buffered: Optional[int] = None):
+        self.ws = ws
+        self.max_pending = max_pending or PROGRESS_QUEUE_SIZE
+        self.max_buffered = max_buffered or PROGRESS_BUFFER_SIZE
+        self.dropped = 0
+        self._items: Deque[Tuple[bool, Dict[str, Any]]] = deque()   # (lossy, payload)
+        self._wake = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._writing = False
+
+    def attach(self, ws: Any):
+        """Stream to `ws` from now on, starting with what was buffered."""
+        if self._closed:
+            return
+        self.ws = ws
+        self._wake.set()
+        self._ensure_sender()
+
+    def detach(self, ws: Any = None):
+        """The client of `ws` (or any) went away: buffer until the next attach."""
+        if ws is None or self.ws is ws:
+            self.ws = None
+            self._wake.set()
+            # producers waiting on a slow client buffer instead
+            self._room.set()
+
+    def _ensure_sender(self):
+        if self.ws is not None and not self._closed and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    def _append(self, lossy: bool, payload: Any):
+        self._items.append((lossy, payload))
+        self._wake.set()
+        self._ensure_sender()
+
+    def publish(self, event: Dict[str, Any]):
+        if self._closed:
+            return
+        if len(self._items) >= self.max_pending:
+            for i, (lossy, _) in enumerate(self._items):
+                if lossy:
+                    del self._items[i]
+                    break
+            else:
+                self.dropped += 1
+                return
+            self.dropped += 1
+        if "thumbnail" in event and len(self._items) >= self.max_pending // 2:
+            event = {k: v for k, v in event.items() if k != "thumbnail"}
+        self._append(True, event)
+
+    async def send(self, payload: Any):
+        while self.ws is not None and len(self._items) >= self.max_pending and not self._closed:
+            self._room.clear()
+            self._ensure_sender()
+            await self._room.wait()
+        if self._closed:
+            return
+        if self.ws is None and len(self._items) >= self.max_buffered:
+            # nobody has listened for a long time: keep the newest messages
+            self._items.popleft()
+            self.dropped += 1
+        self._append(False, payload)
+
+    async def _run(self):
+        while not self._closed:
+            ws = self.ws
+            if ws is None:
+                return
+            if not self._items:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            item = self._items.popleft()
+            self._room.set()
+            try:
+                self._writing = True
+                await ws.send_json(item[1])
+            except Exception as e:
+                # client went away: keep the message for the next socket, the endpoint handles the disconnect
+                logger.debug("progress channel detached: %s", e)
+                self._items.appendleft(item)
+                self.detach(ws)
+                return
+            finally:
+                self._writing = False
+
+    async def flush(self, timeout: float = 5.0):
+        """Wait (bounded) until everything queued so far was written, if a client is connected."""
+        deadline = time.monotonic() + timeout
+        while (self._items or self._writing) and self.ws is not None and not self._closed \
+                and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def close(self, flush: bool = True):
+        """Stop the sender for good; with `flush`, what is queued is written first (bounded)."""
+        if flush:
+            await self.flush()
+        self._closed = True
+        self.ws = None
+        self._items.clear()
+        self._room.set()
+        if self._task is not None:
+            self._task.cancel()
+
+
+def report_progress(state: Dict[str, Any], phase: str, started: float, **fields):
+    """Publish one step event of a web automation run, if the run has a progress sink."""
+    progress: Optional[Callable[[Dict[str, Any]], None]] = state.get("progress")
+    if progress is None:
+        return
+    event = {
+        "type": "progress",
+        "goal_id": state.get("goal_id"),
+        "step": state.get("step", 0),
+        "phase": phase,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    event.update({k: v for k, v in fields.items() if v is not None})
+    try:
+        progress(event)
+    except Exception as e:
+        # progress is best effort, never fail the run because of it
+        logger.debug("progress event dropped: %s", e)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class RunControl:
+    """
+    Shared between a session's scheduler and the agents it runs.
+    Web automation runs call `checkpoint()` between steps, which holds them while
+    the session is paused. Cancelling a goal cancels its task right away, so its
+    in-flight LLM request and browser slot are released immediately.
+    """
+
+    def __init__(self):
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._paused_since: Optional[float] = None
+        self._paused_seconds = 0.0
+        self.cancelled_goals: Set[str] = set()
+        self.goal_tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def pause(self):
+        if not self.paused:
+            self._paused_since = time.monotonic()
+        self._resumed.clear()
+
+    def resume(self):
+        if self.paused:
+            self._paused_seconds += time.monotonic() - self._paused_since
+        self._resumed.set()
+
+    def paused_time(self) -> float:
+        """Seconds this session has spent paused so far, the current pause included."""
+        if self.paused:
+            return self._paused_seconds + time.monotonic() - self._paused_since
+        return self._paused_seconds
+
+    async def checkpoint(self):
+        await self._resumed.wait()
+
+    def cancel_goal(self, goal_id: str) -> bool:
+        task = self.goal_tasks.get(goal_id)
+        if task is None or task.done():
+            return False
+        self.cancelled_goals.add(goal_id)
+        task.cancel()
+        return True
+
+    def reset(self):
+        self.cancelled_goals.clear()
+        self.goal_tasks.clear()
+
+
+async def run_cancellable(control: Optional[RunControl], goal_id: str, run: Callable[[], Awaitable[Any]],
+                          cancelled_result: Callable[[], Any]) -> Any:
+    """
+    Run one goal as its own cancellable unit. When only this goal is cancelled
+    (RunControl.cancel_goal) the other goals of the turn keep going and this one
+    returns `cancelled_result()`; cancelling the whole run still propagates.
+    """
+    task = asyncio.current_task()
+    if control is not None:
+        control.goal_tasks[goal_id] = task
+    try:
+        return await run()
+    except asyncio.CancelledError:
+        if control is None or goal_id not in control.cancelled_goals:
+            raise
+        if hasattr(task, "uncancel"):
+            task.uncancel()
+        return cancelled_result()
+    finally:
+        if control is not None:
+            control.goal_tasks.pop(goal_id, None)
+
+
+class SessionScheduler:
+    """
+    Runs the coordinator for one websocket session as a background task so the
+    socket keeps being read while agents work.
+      * a message arriving while a run is active is queued; all queued messages are
+        merged into one follow-up turn when the run ends
+      * cancel() stops the whole run (or one goal), pause()/resume() hold web
+        automation runs between steps
+    `run(text)` executes one coordinator turn, `on_cancelled()` repairs the session
+    state after a cancelled run.
+    """
+
+    def __init__(self, run: Callable[[str], Awaitable[None]], on_cancelled: Callable[[], Awaitable[None]],
+                 on_pause: Optional[Callable[[bool], Awaitable[None]]] = None):
+        self._run = run
+        self._on_cancelled = on_cancelled
+        self._on_pause = on_pause
+        self.control = RunControl()
+        self._queued: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, text: str) -> bool:
+        """Start a run, or queue the message as a follow-up. Returns True when queued."""
+        if self.running:
+            self._queued.append(text)
+            return True
+        self._task = asyncio.create_task(self._loop(text))
+        return False
+
+    async def _loop(self, text: Optional[str]):
+        while text:
+            self.control.reset()
+            try:
+                await self._run(text)
+            except asyncio.CancelledError:
+                await self._on_cancelled()
+                raise
+            except Exception as e:
+                logger.exception("session run failed: %s", e)
+            # follow-ups that came in meanwhile become one merged turn
+            text = "\n\n".join(self._queued) if self._queued else None
+            self._queued = []
+
+    async def cancel(self, goal_id: Optional[str] = None) -> bool:
+        if goal_id is not None:
+            return self.control.cancel_goal(goal_id)
+        self._queued = []
+        await self.resume()
+        if not self.running:
+            return False
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        return True
+
+    async def pause(self):
+        self.control.pause()
+        if self._on_pause is not None:
+            await self._on_pause(True)
+
+    async def resume(self):
+        was_paused = self.control.paused
+        self.control.resume()
+        if was_paused and self._on_pause is not None:
+            await self._on_pause(False)
+
+    async def close(self):
+        await self.cancel()
@@ -0,0 +1,175 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, quote, quote_plus
+
+# actions that can be replayed without asking the model
+REPLAYABLE_ACTIONS = {"goto", "click", "type_text", "scroll_page", "scroll_element", "back"}
+FINGERPRINT_ATTRIBUTES = ("id", "name", "placeholder", "role", "type", "title", "aria-label")
+
+_WEBSITE_SUFFIX = re.compile(r"\s+WEBSITE\s+-\s+(\S+)\s*$", re.IGNORECASE)
+
+
+def split_goal(goal_statement: str) -> Tuple[str, str]:
+    """'find X WEBSITE - https://amazon.com' → ('find X', 'https://amazon.com')"""
+    goal = " ".join((goal_statement or "").split())
+    match = _WEBSITE_SUFFIX.search(goal)
+    if match:
+        return goal[:match.start()], match.group(1)
+    return goal, ""
+
+
+def domain_of(url: str) -> str:
+    if url and "://" not in url:
+        url = "https://" + url
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def element_fingerprint(element: Any) -> Optional[Dict[str, Any]]:
+    if element is None:
+        return None
+    return {
+        "type": element.type,
+        "text": (element.text or "")[:200],
+        "aria_label": element.aria_label,
+        "css_selector": element.css_selector,
+        "attributes": {k: element.attributes.get(k) for k in FINGERPRINT_ATTRIBUTES if element.attributes.get(k)},
+    }
+
+
+def match_element(fingerprint: Dict[str, Any], snapshot: Any) -> Optional[Any]:
+    """Best element of the current snapshot for a recorded fingerprint, None when nothing is close enough."""
+    best, best_score = None, 0
+    for element in snapshot or []:
+        if element.type != fingerprint["type"]:
+            continue
+        score = 0
+        if fingerprint["css_selector"] and element.css_selector == fingerprint["css_selector"]:
+            score += 2
+        if fingerprint["aria_label"] and element.aria_label == fingerprint["aria_label"]:
+            score += 3
+        if fingerprint["text"] and (element.text or "")[:200] == fingerprint["text"]:
+            score += 3
+        for k, v in fingerprint["attributes"].items():
+            if element.attributes.get(k) == v:
+                score += 2 if k in ("id", "name", "aria-label") else 1
+        if score > best_score:
+            best, best_score = element, score
+    return best if best_score >= 3 else None
+
+
+class Trajectory:
+    __slots__ = ("domain", "template", "pattern", "steps", "created", "hits")
+
+    def __init__(self, domain: str, template: str, steps: List[Dict[str, Any]]):
+        self.domain = domain
+        self.template = template
+        self.steps = steps
+        self.created = time.time()
+        self.hits = 0
+        # "find {0} under ${1}" → ^find (?P<s0>.+?) under \$(?P<s1>.+?)$
+        pattern = re.escape(template)
+        pattern = re.sub(r"\\\{(\d+)\\\}", lambda m: f"(?P<s{m.group(1)}>.+?)", pattern)
+        self.pattern = re.compile(f"^{pattern}$", re.IGNORECASE)
+
+    def step_args(self, step: Dict[str, Any], slots: List[str]) -> Dict[str, Any]:
+        """Recorded arguments of a step with this goal's slot values filled in."""
+        args = dict(step["args"])
+        if "slot" in step:
+            args["text"] = slots[step["slot"]]
+        if "url_template" in step:
+            encode = quote_plus if step.get("url_encoding") == "quote_plus" else quote
+            url = step["url_template"]
+            for i, value in enumerate(slots):
+                url = url.replace("{" + str(i) + "}", encode(value))
+            args["url"] = url
+        return args
+
+    def match(self, goal: str) -> Optional[List[str]]:
+        found = self.pattern.match(goal)
+        if not found:
+            return None
+        slots = found.groupdict()
+        return [slots[f"s{i}"] for i in range(len(slots))]
+
+
+class TrajectoryCache:
+    """
+    Successful action sequences keyed by domain + normalized goal template.
+    Text typed during a run that also appears in the goal becomes a slot, so
+    "find Dell laptops" and "find HP laptops" on the same site share one entry.
+    LRU-evicted at `max_entries`; an entry is dropped as soon as its replay fails.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.environ.get("YB_TRAJECTORY_CACHE_SIZE", "256"))
+        self._entries: "OrderedDict[Tuple[str, str], Trajectory]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, goal_statement: str, domain: str) -> Optional[Tuple[Trajectory, List[str]]]:
+        goal, _ = split_goal(goal_statement)
+        for key, trajectory in reversed(self._entries.items()):
+            if trajectory.domain != domain:
+                continue
+            slots = trajectory.match(goal)
+            if slots is not None:
+                self._entries.move_to_end(key)
+                trajectory.hits += 1
+                return trajectory, slots
+        return None
+
+    def record(self, goal_statement: str, domain: str, steps: List[Dict[str, Any]]):
+        goal, _ = split_goal(goal_statement)
+        if not domain or not steps or "{" in goal or "}" in goal:
+            return
+
+        # 1. typed text found in the goal becomes a slot of the template
+        template = goal
+        slot_values: List[str] = []
+        stored_steps = [dict(step, args=dict(step["args"])) for step in steps]
+        for step in stored_steps:
+            text = step["args"].get("text") if step["tool"] == "type_text" else None
+            if not text or len(text) < 2:
+                continue
+            if text in slot_values:
+                step["slot"] = slot_values.index(text)
+                continue
+            position = template.lower().find(text.lower())
+            if position >= 0:
+                step["slot"] = len(slot_values)
+                template = template[:position] + "{" + str(len(slot_values)) + "}" + template[position + len(text):]
+                slot_values.append(text)
+
+        # 2. urls carrying a slot value are templated too; other urls with a query
+        #    string are goal specific and end the replay there
+        for step in stored_steps:
+            if step["tool"] != "goto":
+                continue
+            url = step["args"].get("url", "")
+            for i, value in enumerate(slot_values):
+                for encode in (quote_plus, quote):
+                    if encode(value) in url:
+                        url = url.replace(encode(value), "{" + str(i) + "}")
+                        step.setdefault("url_encoding", encode.__name__)
+            if url != step["args"].get("url"):
+                step["url_template"] = url
+            elif urlparse(url).query:
+                step["stop"] = True
+
+        key = (domain, template.lower())
+        self._entries[key] = Trajectory(domain, template, stored_steps)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, trajectory: Trajectory):
+        self._entries.pop((trajectory.domain, trajectory.template.lower()), None)
+
+
+# process-wide cache shared by every web automation run
+trajectory_cache = TrajectoryCache()
@@ -1,76 +1,226 @@
 import asyncio
-import xml.etree.ElementTree as ET
+import os
+import time
 from langgraph.graph import StateGraph, END
 from backend.states.web_automation_states import WebAutomationState
-from backend.model_interactions.web_automation_model import call_gemini
-
+from backend.model_interactions.web_automation_model import call_gemini, BATCH_ACTIONS
+from backend.browser.elements import ElementCache
+from backend.browser.ranking import render_elements, tokenize
+from backend.browser.screenshot import make_thumbnail
+from backend.agents.progress import report_progress, PROGRESS_THUMBNAILS
+from backend.metrics import instrumented, timed
+from backend.agents.trajectory_cache import (trajectory_cache, REPLAYABLE_ACTIONS, split_goal, domain_of,
+                                             element_fingerprint, match_element)
+
+TERMINAL_ACTIONS = ["done", "stuck", "wait_for_input", "wait_for_action"]
+# a batch stops early (and the page is re-snapshotted) once an action caused this many DOM mutations
+BATCH_MAX_MUTATIONS = int(os.environ.get("YB_BATCH_MAX_MUTATIONS", "40"))
+
+
+async def checkpoint(state: WebAutomationState):
+    # holds the run here while the session is paused (see backend/agents/scheduler.py)
+    control = state.get("control")
+    if control is not None:
+        await control.checkpoint()
 
 async def take_snapshot(state: WebAutomationState) -> WebAutomationState:
-    image_bytes, xml_data = await state["browser_manager"].take_snapshot(state["page"])
-    state["last_screenshot"] = image_bytes
-    state["last_elements"] = xml_data
+    await checkpoint(state)
+    started = time.monotonic()
+    state["step"] = state.get("step", 0) + 1
+    # element set of this page, kept across steps so markPage only sends what changed
+    if state.get("element_cache") is None:
+        state["element_cache"] = ElementCache()
+    screenshot, snapshot = await state["browser_manager"].take_snapshot(state["page"], cache=state["element_cache"],
+                                                                       previous_screenshot=state.get("last_screenshot"))
+    state["last_screenshot"] = screenshot
+    state["last_elements"] = snapshot
+    thumbnail = None
+    if PROGRESS_THUMBNAILS and state.get("progress") is not None and not screenshot.unchanged:
+        thumbnail = make_thumbnail(screenshot)
+    report_progress(state, "snapshot", started, url=snapshot.url, elements=len(snapshot), thumbnail=thumbnail)
     return state
 
+def start_replay(state: WebAutomationState):
+    # first decision of the run: look for a recorded trajectory of a similar goal on this site
+    _, url = split_goal(state["goal_statement"])
+    state["replay_domain"] = domain_of(url or state["page"].url)
+    state["trajectory"] = []
+    found = trajectory_cache.lookup(state["goal_statement"], state["replay_domain"])
+    state["replay"] = {"trajectory": found[0], "slots": found[1], "step": 0} if found else None
+    state["replayed_from"] = found[0] if found else None
+
+def record_step(state: WebAutomationState, tool_name, tool_params, summary):
+    if tool_name not in REPLAYABLE_ACTIONS:
+        return
+    args = dict(tool_params or {})
+    element = state["last_elements"].get(args["element_id"]) if "element_id" in args else None
+    state["trajectory"].append({"tool": tool_name, "args": args, "element": element_fingerprint(element), "summary": summary})
+
+def replay_step(state: WebAutomationState) -> bool:
+    """Take the next recorded action instead of asking the model. False → the model decides."""
+    replay = state.get("replay")
+    if not replay:
+        return False
+    trajectory = replay["trajectory"]
+    if replay["step"] >= len(trajectory.steps) or trajectory.steps[replay["step"]].get("stop"):
+        state["replay"] = None
+        return False
+
+    step = trajectory.steps[replay["step"]]
+    args = trajectory.step_args(step, replay["slots"])
+    if step.get("element"):
+        element = match_element(step["element"], state["last_elements"])
+        if element is None:
+            # the page no longer looks like the recording: drop the entry, the model takes over
+            trajectory_cache.invalidate(trajectory)
+            state["replay"] = None
+            return False
+        args["element_id"] = element.index
+
+    replay["step"] += 1
+    summary = f"{step.get('summary') or step['tool']} (replayed)"
+    state["action_history"].append(summary)
+    state["action"] = step["tool"]
+    state["action_args"] = args
+    state["action_summary"] = step.get("summary")
+    state["pending_actions"] = []
+    return True
+
+async def finish_prewarm(task: asyncio.Task, timeout: float = 0.5):
+    # the action must not race a page.evaluate that is still running: wait a moment, then give up on it
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    if not done:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
 async def model_decision(state: WebAutomationState) -> WebAutomationState:
-    response = call_gemini(goal_statement=state['goal_statement'], history=state['action_history'], 
-                           image_bytes=state["last_screenshot"], xml_data=state["last_elements"])
+    started = time.monotonic()
+    if state.get("trajectory") is None:
+        start_replay(state)
+    if replay_step(state):
+        report_progress(state, "decision", started, action=state["action"], summary=state["action_history"][-1], replayed=True)
+        return state
+
+    # pipelined: the browser prepares the next snapshot while the model thinks
+    prewarm = None
+    if state["browser_manager"].pipeline:
+        prewarm = asyncio.create_task(state["browser_manager"].prewarm(state["page"]))
+    try:
+        response = await call_gemini(goal_statement=state['goal_statement'], history=state['action_history'], 
+                               screenshot=state["last_screenshot"],
+                               elements_data=render_elements(state["last_elements"], state["goal_statement"], state["action_history"],
+                                                             query=state.get("element_query"), page=state.get("element_page", 0)),
+                               batched=BATCH_ACTIONS)
+    finally:
+        if prewarm is not None:
+            await finish_prewarm(prewarm)
     
-    summary, function_name, function_params = None, None, None
+    summary, calls = None, []
     for _part in response.parts:
         if _part.text:
             summary = _part.text.strip()
         if _part.function_call:
-            function_name = _part.function_call.name
-            function_params = _part.function_call.args
+            calls.append((_part.function_call.name, _part.function_call.args))
+
+    # a terminal call only counts on its own, it can't be judged before the batch ran
+    if len(calls) > 1:
+        calls = [call for call in calls if call[0] not in TERMINAL_ACTIONS] or calls[:1]
+    function_name, function_params = calls[0] if calls else (None, None)
     
     if summary is not None:
         state["action_history"].append(summary)
     
     state["action"] = function_name
     state["action_args"] = function_params
+    state["action_summary"] = summary
+    state["pending_actions"] = calls[1:]
+
+    if function_name == "done":
+        trajectory_cache.record(state["goal_statement"], state["replay_domain"], state["trajectory"])
+    elif function_name == "stuck" and state.get("replayed_from") is not None:
+        trajectory_cache.invalidate(state["replayed_from"])
+    report_progress(state, "decision", started, action=function_name, summary=summary,
+                    batched=len(calls) if len(calls) > 1 else None)
     return state
 
-async def execute_action(state: WebAutomationState) -> WebAutomationState:
-    def extract_cordinates(xml_data, element_id):
-        root = ET.fromstring(xml_data)
-        target_element = root.find(f".//element[@index='{element_id}']")
-
-        center_node = target_element.find('center')
-        x = float(center_node.find('x').text)
-        y = float(center_node.find('y').text)
-        return x, y
-
-    tool_name = state["action"]
-    tool_params = state["action_args"]
+async def run_action(state: WebAutomationState, tool_name, tool_params):
     page = state["page"]
     session = state["browser_manager"]
-    xml_data = state["last_elements"]
+    snapshot = state["last_elements"]
 
     if tool_name == "goto":
         await session.goto(page, tool_params["url"])
     elif tool_name == "click":
-        x, y = extract_cordinates(xml_data, tool_params["element_id"])
+        x, y = await session.element_center(page, snapshot, tool_params["element_id"])
         await session.action_click(page, x, y)
     elif tool_name == "type_text":
-        x, y = extract_cordinates(xml_data, tool_params["element_id"])
-        await session.action_typetext(page, x, y, tool_params["text"])
+        x, y = await session.element_center(page, snapshot, tool_params["element_id"])
+        await session.action_typetext(page, x, y, tool_params["text"], element=snapshot.get(tool_params["element_id"]),
+                                      press_enter=tool_params.get("press_enter", True))
     elif tool_name == "scroll_page":
         direction = tool_params["direction"]
         await session.action_scroll(page=page, direction=direction)
     elif tool_name == "scroll_element":
         direction = tool_params["direction"]
-        x, y = extract_cordinates(xml_data, tool_params["element_id"])
+        x, y = await session.element_center(page, snapshot, tool_params["element_id"])
         await session.action_scroll(page=page, direction=direction, whole_page=False, x=x, y=y)
     elif tool_name == "back":
         await session.back(page=page)
     elif tool_name == "wait":
         await asyncio.sleep(3)
+    elif tool_name == "more_elements":
+        # no browser action: the next decision sees the next page of ranked elements, or the query's matches
+        query = tool_params.get("query") or None
+        if query and not tokenize(query):
+            # nothing searchable in it: same as paging the ranked list
+            query = None
+        same_listing = query == state.get("element_query")
+        state["element_page"] = state.get("element_page", 0) + 1 if same_listing else 0
+        state["element_query"] = query
+
+def page_changed(state: WebAutomationState, before) -> bool:
+    # the element set the batch was planned against is no longer valid
+    page = state["page"]
+    if page.url != state["last_elements"].url:
+        return True
+    report = state["browser_manager"].settler.last_report(page)
+    if report is None or report is before:
+        # the action did not settle (scroll), nothing to judge
+        return False
+    return report.navigated or report.mutations > BATCH_MAX_MUTATIONS
+
+async def execute_action(state: WebAutomationState) -> WebAutomationState:
+    actions = [(state["action"], state["action_args"])] + list(state.get("pending_actions") or [])
+    state["pending_actions"] = []
+
+    settler = state["browser_manager"].settler
+    before = None
+    for position, (tool_name, tool_params) in enumerate(actions):
+        await checkpoint(state)
+        if position > 0 and page_changed(state, before):
+            skipped = ", ".join(name for name, _ in actions[position:])
+            state["action_history"].append(f"page changed, skipped remaining batched actions: {skipped}")
+            break
+        if tool_name == "type_text" and "press_enter" not in (tool_params or {}):
+            # Enter submits the form: in a batch only the last action presses it, unless the model asked
+            tool_params = {**tool_params, "press_enter": position == len(actions) - 1}
+        record_step(state, tool_name, tool_params, state.get("action_summary") if position == 0 else None)
+        if tool_name != "more_elements":
+            # any page action starts the element listing over from the top-ranked page
+            state["element_page"], state["element_query"] = 0, None
+        before = settler.last_report(state["page"])
+        settler.action_started(state["page"])
+        started = time.monotonic()
+        with timed(f"action.{tool_name}"):
+            await run_action(state, tool_name, tool_params)
+        report_progress(state, "action", started, action=tool_name,
+                        summary=state.get("action_summary") if position == 0 else None)
 
     return state
 
 def decide_next_step(state: WebAutomationState) -> str:
     action = state["action"]
-    if action in ["done", "stuck", "wait_for_input", "wait_for_action"]:
+    if action in TERMINAL_ACTIONS:
         return END
     else:
         return "execute_action"
@@ -78,9 +228,9 @@ def decide_next_step(state: WebAutomationState) -> str:
 
 graph = StateGraph(WebAutomationState)
 
-graph.add_node("take_snapshot", take_snapshot)
-graph.add_node("model_decision", model_decision)
-graph.add_node("execute_action", execute_action)
+graph.add_node("take_snapshot", instrumented("node.web.take_snapshot")(take_snapshot))
+graph.add_node("model_decision", instrumented("node.web.model_decision")(model_decision))
+graph.add_node("execute_action", instrumented("node.web.execute_action")(execute_action))
 
 # Entry
 graph.set_entry_point("take_snapshot")
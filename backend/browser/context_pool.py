@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from playwright.async_api import BrowserContext
+
+
+@dataclass
+class _Lease:
+    context: BrowserContext
+    last_used: float = field(default_factory=time.monotonic)
+    active: int = 0
+
+
+class ContextPool:
+    """
+    Hands out one BrowserContext per session (websocket uid) so that users never
+    see or index each other's tabs. A few contexts are created ahead of time so a
+    new session does not pay context-creation latency; idle sessions are evicted
+    after `idle_ttl` seconds and the pool never holds more than `max_size` sessions.
+    Pinned sessions (a client is connected) are never evicted for being idle.
+    """
+
+    def __init__(self, context_factory: Callable[[], Awaitable[BrowserContext]],
+                 warm_size: Optional[int] = None, max_size: Optional[int] = None,
+                 idle_ttl: Optional[float] = None):
+        self._factory = context_factory
+        self.warm_size = warm_size if warm_size is not None else int(os.environ.get("YB_CONTEXT_POOL_WARM", "2"))
+        self.max_size = max_size if max_size is not None else int(os.environ.get("YB_CONTEXT_POOL_MAX", "16"))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.environ.get("YB_CONTEXT_IDLE_TTL", "900"))
+        self._warm: List[BrowserContext] = []
+        self._sessions: Dict[Any, _Lease] = {}
+        self._pinned: Set[Any] = set()
+        self._lock = asyncio.Lock()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._evict_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self._refill()
+        self._evict_task = asyncio.create_task(self._evict_loop())
+
+    async def stop(self):
+        for task in (self._refill_task, self._evict_task):
+            if task:
+                task.cancel()
+        contexts = self._warm + [lease.context for lease in self._sessions.values()]
+        self._warm, self._sessions = [], {}
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def _refill(self):
+        while len(self._warm) < self.warm_size and len(self._warm) + len(self._sessions) < self.max_size:
+            self._warm.append(await self._factory())
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def acquire(self, session_id: Any) -> BrowserContext:
+        """Context of this session, taken from the warm pool on first use."""
+        async with self._lock:
+            lease = self._sessions.get(session_id)
+            if lease is None:
+                if len(self._sessions) >= self.max_size:
+                    await self._evict_lru()
+                context = self._warm.pop() if self._warm else await self._factory()
+                lease = _Lease(context=context)
+                self._sessions[session_id] = lease
+                self._schedule_refill()
+            lease.last_used = time.monotonic()
+            return lease.context
+
+    def peek(self, session_id: Any) -> Optional[BrowserContext]:
+        """Context of this session if it already has one, without creating it."""
+        lease = self._sessions.get(session_id)
+        return lease.context if lease else None
+
+    def pin(self, session_id: Any, pinned: bool = True):
+        """While pinned, the session's tabs are still referenced (page_index, page summaries): keep them."""
+        if pinned:
+            self._pinned.add(session_id)
+        else:
+            self._pinned.discard(session_id)
+
+    @asynccontextmanager
+    async def lease(self, session_id: Any):
+        """Hold the session's context; it is never evicted while leased."""
+        context = await self.acquire(session_id)
+        lease = self._sessions[session_id]
+        lease.active += 1
+        try:
+            yield context
+        finally:
+            lease.active -= 1
+            lease.last_used = time.monotonic()
+
+    async def release(self, session_id: Any):
+        lease = self._sessions.pop(session_id, None)
+        self._pinned.discard(session_id)
+        if lease is not None:
+            try:
+                await lease.context.close()
+            except Exception:
+                pass
+
+    async def _evict_lru(self):
+        # disconnected sessions go first, a connected one only when the pool is full of them
+        idle = [(sid in self._pinned, lease.last_used, sid) for sid, lease in self._sessions.items() if lease.active == 0]
+        if not idle:
+            raise RuntimeError(f"browser context pool exhausted ({self.max_size} active sessions)")
+        _, _, session_id = min(idle, key=lambda item: item[:2])
+        await self.release(session_id)
+
+    async def _evict_loop(self):
+        interval = max(1.0, min(60.0, self.idle_ttl / 4))
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            expired = [sid for sid, lease in self._sessions.items()
+                       if lease.active == 0 and sid not in self._pinned and now - lease.last_used > self.idle_ttl]
+            for session_id in expired:
+                await self.release(session_id)
+            if expired:
+                self._schedule_refill()
@@ -0,0 +1,47 @@
+from typing import Any, Dict, List, Optional
+
+
+class ElementCache:
+    """
+    Python-side copy of the in-page element registry (see markPageIncremental in
+    extract_elements.js). Holds the last known element set of one page and
+    applies the deltas returned by markPage({incremental: true, ...}).
+    """
+
+    def __init__(self):
+        self.document_id: Optional[str] = None
+        self.generation: int = 0
+        self.elements: Dict[int, Dict[str, Any]] = {}
+        self.order: List[int] = []
+        self.last_changed: int = 0
+        self.last_removed: int = 0
+
+    def request_args(self) -> Dict[str, Any]:
+        """Arguments for markPage so that it only returns what changed since our copy."""
+        return {"incremental": True, "documentId": self.document_id, "sinceGeneration": self.generation}
+
+    def apply(self, delta: Dict[str, Any]):
+        changed = delta.get("elements") or []
+        removed = delta.get("removed") or []
+
+        if delta.get("full"):
+            self.elements = {}
+
+        for el in changed:
+            self.elements[el["index"]] = el
+        for key in removed:
+            self.elements.pop(key, None)
+
+        if delta.get("order") is not None:
+            self.order = [key for key in delta["order"] if key in self.elements]
+
+        self.document_id = delta.get("documentId")
+        self.generation = delta.get("generation", 0)
+        self.last_changed = len(changed)
+        self.last_removed = len(removed)
+
+    def ordered(self) -> List[Dict[str, Any]]:
+        return [self.elements[key] for key in self.order]
+
+    def reset(self):
+        self.__init__()
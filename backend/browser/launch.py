@@ -0,0 +1,97 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Union
+
+from playwright.async_api import Route
+
+from backend.metrics import metrics
+
+# Third-party trackers a browsing agent never needs; matched against the request URL
+ANALYTICS_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com", "mixpanel.com",
+    "amplitude.com", "fullstory.com", "clarity.ms", "newrelic.com", "nr-data.net", "scorecardresearch.com",
+    "criteo.com", "taboola.com", "outbrain.com", "adsrvr.org", "bat.bing.com",
+)
+FONT_EXTENSIONS = ("woff", "woff2", "ttf", "otf", "eot")
+MEDIA_EXTENSIONS = ("mp4", "webm", "ogg", "ogv", "mp3", "wav", "m4a", "m4v", "mov", "m3u8")
+FONT_HOSTS = ("fonts.gstatic.com", "use.typekit.net")
+
+
+@dataclass
+class LaunchProfile:
+    name: str
+    headless: bool
+    args: List[str] = field(default_factory=list)
+    # None → the page follows the window size (no_viewport), only sensible with a visible window
+    viewport: Optional[Dict[str, int]] = None
+    block_fonts: bool = False
+    block_media: bool = False
+    block_analytics: bool = False
+    reduced_motion: Optional[str] = None
+    service_workers: str = "allow"
+
+    def context_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"service_workers": self.service_workers}
+        if self.viewport is None:
+            options["no_viewport"] = True
+        else:
+            options["viewport"] = dict(self.viewport)
+            options["device_scale_factor"] = 1
+        if self.reduced_motion:
+            options["reduced_motion"] = self.reduced_motion
+        return options
+
+    def blocked_url_pattern(self) -> Optional[Pattern[str]]:
+        """
+        One URL regex for everything this profile blocks. Only matching requests
+        are routed through Python; routing every request (to look at its resource
+        type) would cost a round-trip per request. Any active route still turns
+        off Playwright's HTTP cache for the context, so blocking is a trade.
+        """
+        alternatives = []
+        if self.block_fonts:
+            alternatives.append(r"\.(?:%s)(?:[?#]|$)" % "|".join(FONT_EXTENSIONS))
+            alternatives.append(r"^[a-z]+://(?:[^/]*\.)?(?:%s)/" % "|".join(re.escape(h) for h in FONT_HOSTS))
+        if self.block_media:
+            alternatives.append(r"\.(?:%s)(?:[?#]|$)" % "|".join(MEDIA_EXTENSIONS))
+        if self.block_analytics:
+            alternatives.append(r"^[a-z]+://(?:[^/]*\.)?(?:%s)[:/]" % "|".join(re.escape(h) for h in ANALYTICS_HOSTS))
+        return re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+
+PROFILES: Dict[str, LaunchProfile] = {
+    # a visible, maximized window: local use and debugging
+    "interactive": LaunchProfile("interactive", headless=False, args=["--start-maximized"]),
+    # servers without a display: same pages as interactive, fixed viewport so screenshots are comparable
+    "headless": LaunchProfile(
+        "headless", headless=True, viewport={"width": 1280, "height": 800},
+        args=["--disable-dev-shm-usage", "--disable-background-timer-throttling", "--disable-renderer-backgrounding"],
+    ),
+    # many concurrent agents per host: smaller viewport, no GPU / extensions, no fonts, media or trackers.
+    # Blocking needs a route, which disables the HTTP cache: repeat visits refetch scripts and images
+    "lean": LaunchProfile(
+        "lean", headless=True, viewport={"width": 1024, "height": 768},
+        args=["--disable-gpu", "--disable-extensions", "--disable-component-extensions-with-background-pages",
+              "--disable-dev-shm-usage", "--disable-background-networking", "--disable-component-update",
+              "--disable-default-apps", "--disable-sync", "--no-first-run", "--mute-audio",
+              "--disable-background-timer-throttling", "--disable-renderer-backgrounding"],
+        block_fonts=True, block_media=True, block_analytics=True,
+        reduced_motion="reduce", service_workers="block",
+    ),
+}
+
+
+def get_launch_profile(profile: Union[LaunchProfile, str, None] = None) -> LaunchProfile:
+    if isinstance(profile, LaunchProfile):
+        return profile
+    name = profile or os.environ.get("YB_BROWSER_PROFILE", "interactive")
+    if name not in PROFILES:
+        raise ValueError(f"unknown browser profile {name!r}, expected one of {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+async def abort_blocked(route: Route):
+    metrics.count(f"browser.blocked.{route.request.resource_type}")
+    await route.abort("blockedbyclient")
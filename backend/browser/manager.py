@@ -1,17 +1,56 @@
-from typing import TypedDict, List, Literal, Optional, Any, Dict, Tuple
+from typing import TypedDict, List, Literal, Optional, Any, Dict, Tuple, Union
+import os
 import random
 import time
 import asyncio
 import platform
-import xml.etree.ElementTree as ET
-from playwright.async_api import async_playwright, Browser, Playwright, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright, Page
+from backend.browser.settle import PageSettler, SettleConfig, SettleReport
+from backend.browser.elements import ElementCache
+from backend.browser.snapshot import ElementSnapshot
+from backend.browser.context_pool import ContextPool
+from backend.browser.launch import LaunchProfile, get_launch_profile, abort_blocked
+from backend.browser.screenshot import ScreenshotPipeline, ScreenshotConfig, Screenshot
+from backend.browser.text_input import choose_strategy, FILL_FOCUSED_JS, FOCUSED_VALUE_JS
+from backend.metrics import metrics, instrumented, timed
 
 EXTRACT_ELEMENTS_JS_PATH = "./extract_elements.js"
+
+# One round-trip per tab: returns tag/text summary of the first 30 candidates,
+# or only the version when the caller already has the summary of this DOM version
+PAGE_SUMMARY_JS = """
+(known) => {
+  var version = window.pageVersion ? window.pageVersion() : null;
+  if (version !== null && version === known) return { version: version, unchanged: true };
+  var nodes = document.querySelectorAll('button, a, input, h1, h2, h3');
+  var summary = [];
+  for (var i = 0; i < nodes.length && i < 30; i++) {
+    var el = nodes[i];
+    var text = (el.innerText || el.placeholder || '').trim();
+    if (text) summary.push({ tag: el.tagName.toLowerCase(), text: text.slice(0, 100) });
+  }
+  return { version: version, title: document.title, summary: summary };
+}
+"""
 class BrowserManager:
-    def __init__(self):
+    def __init__(self, settle_config: Optional[SettleConfig] = None, screenshot_config: Optional[ScreenshotConfig] = None,
+                 launch_profile: Union[LaunchProfile, str, None] = None, pipeline: Optional[bool] = None):
+        # interactive | headless | lean, see backend/browser/launch.py (YB_BROWSER_PROFILE)
+        self.profile = get_launch_profile(launch_profile)
+        self._blocked_urls = self.profile.blocked_url_pattern()
+        # pipelined steps: prewarm while the model thinks, overlap extraction and screenshot,
+        # skip the snapshot settle when the action's settle still holds
+        self.pipeline = pipeline if pipeline is not None else os.environ.get("YB_PIPELINE", "0") == "1"
         self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
         self._extract_elements_script: Optional[str] = None
+        self.settler = PageSettler(settle_config)
+        self.screenshots = ScreenshotPipeline(screenshot_config)
+        if self.pipeline:
+            self.screenshots.config.offload_encoding = True
+        self.last_settle: Optional[SettleReport] = None
+        self.contexts: Optional[ContextPool] = None
+        self._summary_cache: Dict[Page, Tuple[str, str, Dict[str, Any]]] = {}  # page → (url, dom version, summary)
 
         try:
             with open(EXTRACT_ELEMENTS_JS_PATH, "r", encoding="utf-8") as f:
@@ -21,155 +60,243 @@ class BrowserManager:
 
     async def start(self):
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=False)
-        self.context = await self.browser.new_context()
+        self.browser = await self.playwright.chromium.launch(headless=self.profile.headless, args=self.profile.args)
 
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=False, args=["--start-maximized"])
-        self.context = await self.browser.new_context(no_viewport=True)
+        # One context per websocket session, handed out from a pre-warmed pool
+        self.contexts = ContextPool(self._new_context)
+        await self.contexts.start()
+
+    async def _new_context(self) -> BrowserContext:
+        context = await self.browser.new_context(**self.profile.context_options())
+        if self._blocked_urls is not None:
+            await context.route(self._blocked_urls, abort_blocked)
+
+        # Install markPage / settle observers at document start on every page
+        if self._extract_elements_script:
+            await context.add_init_script(self._extract_elements_script)
+        context.on("page", self.settler.attach)
 
         # Open a default tab
-        await self.context.new_page()
+        await context.new_page()
+        return context
+
+    async def context_for(self, session_id: Any) -> BrowserContext:
+        return await self.contexts.acquire(session_id)
 
     async def stop(self):
+        if self.contexts:
+            await self.contexts.stop()
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
 
-    async def get_page_summaries(self) -> List[Dict[str, Any]]:
-        return_data = []
-
-        for _page in self.context.pages:
-            elements = await _page.query_selector_all("button, a, input, h1, h2, h3")
-            summary = []
-
-            for el in elements[:30]:  # limit element count
-                tag = await el.evaluate("(element) => element.tagName.toLowerCase()")
-                text = await el.evaluate(
-                    "(element) => element.innerText || element.placeholder || ''"
-                )
-                text = text.strip()
-
-                if text:
-                    summary.append({"tag": tag, "text": text[:100]})
-
-            try:
-                _url = _page.url.split("/")[2]
-            except:
-                _url = ""
-
-            return_data.append({
-                "url": _page.url,
-                "title": await _page.title(),
-                "domain": _url,
-                "elements_summary": summary
-            })
-
-        return return_data
-
-
-    async def take_snapshot(self, page: Page) -> Tuple[bytes, str]:
-        await asyncio.sleep(3)
-        def _safe_text(parent, tag, value):
-            """Helper: add a child with text (handle None)."""
-            child = ET.SubElement(parent, tag)
-            if value is None:
-                child.text = ""
-            else:
-                # Convert non-string to string safely
-                child.text = str(value)
-            return child
-        
-        def _add_attributes(parent, attributes):
-            attrs_node = ET.SubElement(parent, "attributes")
-            if not attributes:
-                return attrs_node
-            for k, v in attributes.items():
-                # attribute value might be None
-                child = ET.SubElement(attrs_node, "attr", attrib={"name": str(k)})
-                child.text = "" if v is None else str(v)
-            return attrs_node
-
-        # Inject script (defines window.markPage)
+    @instrumented("browser.page_summaries")
+    async def get_page_summaries(self, context: BrowserContext) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*(self._page_summary(_page) for _page in context.pages)))
+
+    async def _page_summary(self, page: Page) -> Dict[str, Any]:
+        cached = self._summary_cache.get(page)
+        known = cached[1] if cached is not None and cached[0] == page.url else None
+
+        try:
+            result = await page.evaluate(PAGE_SUMMARY_JS, known)
+        except Exception:
+            # page is navigating / closed
+            result = {"version": None, "title": "", "summary": []}
+
+        if result.get("unchanged"):
+            return cached[2]
+
+        try:
+            _url = page.url.split("/")[2]
+        except:
+            _url = ""
+
+        page_summary = {
+            "url": page.url,
+            "title": result.get("title", ""),
+            "domain": _url,
+            "elements_summary": result.get("summary", [])
+        }
+        if result.get("version") is not None:
+            if page not in self._summary_cache:
+                page.on("close", lambda _page: self._summary_cache.pop(page, None))
+            self._summary_cache[page] = (page.url, result["version"], page_summary)
+        return page_summary
+
+    @instrumented("browser.settle")
+    async def settle(self, page: Page, reason: str = "", timeout: Optional[float] = None) -> SettleReport:
+        """Wait until the page is stable (or the configured ceiling is hit)."""
+        report = await self.settler.settle(page, script=self._extract_elements_script, reason=reason, timeout=timeout)
+        self.last_settle = report
+        metrics.timing(f"browser.settle.{reason or 'other'}", report.elapsed_ms)
+        if report.timed_out:
+            metrics.count("browser.settle.timeouts")
+        return report
+
+    @instrumented("browser.extract")
+    async def extract_elements(self, page: Page, cache: Optional[ElementCache] = None) -> List[Dict[str, Any]]:
+        """
+        Run markPage on the page. With a cache, only the delta since the cached
+        generation is transferred and applied; without one, a full extraction is done.
+        """
+        # Inject script (defines window.markPage), no-op when already installed
         await page.evaluate(self._extract_elements_script)
 
-        result = await page.evaluate("markPage()")
+        if cache is None:
+            result = await page.evaluate("markPage()")
+            return result.get("elements", []) or []
 
-        elements = result.get("elements", [])
+        delta = await page.evaluate("(opts) => markPage(opts)", cache.request_args())
+        cache.apply(delta)
+        metrics.size("browser.extract.changed_elements", cache.last_changed)
+        return cache.ordered()
 
-        # Save a clean screenshot (NO overlays)
-        screenshot_bytes: bytes = await page.screenshot(full_page=False)
+    @instrumented("browser.snapshot")
+    async def take_snapshot(self, page: Page, cache: Optional[ElementCache] = None,
+                            previous_screenshot: Optional[Screenshot] = None) -> Tuple[Screenshot, ElementSnapshot]:
+        if self.pipeline and self.settler.still_settled(page):
+            # the action's own settle still holds; the frames let observers deliver what the action changed
+            metrics.count("browser.settle.skipped")
+            await self.settler.wait_frames(page)
+        else:
+            await self.settle(page, reason="snapshot")
 
-        elements_node = ET.Element("elements")
+        # always go through a cache so the snapshot knows which document its element ids belong to
+        cache = cache if cache is not None else ElementCache()
 
-        for el in (elements or []):
-            el_node = ET.SubElement(elements_node, "element", attrib={"index": str(el.get("index", ""))})
-            _safe_text(el_node, "type", el.get("type"))
-            _safe_text(el_node, "text", el.get("text"))
-            _safe_text(el_node, "ariaLabel", el.get("ariaLabel"))
-            _safe_text(el_node, "cssSelector", el.get("cssSelector"))
-            _safe_text(el_node, "computedCursor", el.get("computedCursor"))
-            _add_attributes(el_node, el.get("attributes"))
-            center = el.get("center", {})
-            center_node = ET.SubElement(el_node, "center")
-            _safe_text(center_node, "x", center.get("x"))
-            _safe_text(center_node, "y", center.get("y"))
+        async def capture(snapshot: Optional[ElementSnapshot]) -> Screenshot:
+            # Save a clean screenshot (NO overlays), encoded/downscaled and compared with the previous step
+            with timed("browser.screenshot"):
+                return await self.screenshots.capture(page, snapshot=snapshot, previous=previous_screenshot)
+
+        if self.pipeline and not self.screenshots.config.clip_to_elements:
+            # the screenshot does not depend on the elements: capture and encode while markPage runs
+            elements, screenshot = await asyncio.gather(self.extract_elements(page, cache), capture(None))
+            snapshot = ElementSnapshot.from_mark_page(elements, url=page.url, document_id=cache.document_id)
+        else:
+            elements = await self.extract_elements(page, cache)
+            snapshot = ElementSnapshot.from_mark_page(elements, url=page.url, document_id=cache.document_id)
+            screenshot = await capture(snapshot)
 
-        # indent for readability (Python 3.9+)
+        metrics.size("browser.snapshot.elements", len(snapshot))
+        metrics.size("browser.screenshot.bytes", len(screenshot.data))
+        if screenshot.unchanged:
+            metrics.count("browser.screenshot.unchanged")
+
+        return screenshot, snapshot
+
+    @instrumented("browser.prewarm")
+    async def prewarm(self, page: Page, lookahead: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Cheap preparation for the next snapshot, run while the model decides: makes sure
+        the extraction script and its observers are installed, applies pending DOM changes
+        to the element registry and precomputes element paths `lookahead` viewports
+        above and below (a scroll is the most common next action).
+        """
+        try:
+            await page.evaluate(self._extract_elements_script)
+            return await page.evaluate("(opts) => window.prewarmPage ? window.prewarmPage(opts) : null",
+                                       {"lookahead": lookahead})
+        except Exception:
+            # navigating / closed: the snapshot after the action does the work instead
+            return None
+
+    @instrumented("browser.locate")
+    async def element_center(self, page: Page, snapshot: ElementSnapshot, index: Any) -> Tuple[float, float]:
+        """
+        Live center of a snapshot element, re-resolved right before acting on it:
+        by its stable id while the document is the same, else by fingerprint.
+        Falls back to the coordinates captured with the snapshot.
+        """
+        query = snapshot.locate_query(index)
         try:
-            import xml.dom.minidom as minidom
-            rough_string = ET.tostring(elements_node, 'utf-8')
-            reparsed = minidom.parseString(rough_string)
-            pretty_xml_string = reparsed.toprettyxml(indent="  ")
-            return screenshot_bytes, pretty_xml_string.decode('utf-8')
+            found = await page.evaluate("(q) => window.locateElement ? window.locateElement(q) : null", query)
         except Exception:
-            # Fallback for older Python or if minidom fails
-            pretty_xml_string = ET.tostring(elements_node, encoding="utf-8", xml_declaration=True).decode('utf-8')
-            return screenshot_bytes, pretty_xml_string
+            # execution context gone (navigation in progress)
+            found = None
+        if found and found.get("x") is not None:
+            return float(found["x"]), float(found["y"])
+        return snapshot.center(index)
 
     async def take_screenshot(self, page: Page, full_page: Optional[bool] = True) -> Tuple[bytes, List[dict[str, Any]]]:
         await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(1)
+        await self.settle(page, reason="screenshot_scroll_bottom")
         await page.evaluate("window.scrollTo(0, 0)")
-        await asyncio.sleep(1)
+        await self.settle(page, reason="screenshot_scroll_top")
         screenshot_bytes: bytes = await page.screenshot(full_page=full_page)
         return(screenshot_bytes)
     
+    @instrumented("browser.goto")
     async def goto(self, page: Page, url: str):
-        await page.goto(url)
-        await asyncio.sleep(1)  
+        await page.goto(url, wait_until="commit")
+        await self.settle(page, reason="goto")
 
+    @instrumented("browser.click")
     async def action_click(self, page: Page, x: int, y:int):
         await page.mouse.click(x, y)
-        await asyncio.sleep(0.5)
-        
-    async def action_typetext(self, page: Page, x:int, y:int, text: str):
+        await self.settle(page, reason="click")
+
+    @instrumented("browser.type_text")
+    async def action_typetext(self, page: Page, x:int, y:int, text: str, element: Any = None,
+                              strategy: Optional[str] = None, press_enter: bool = True) -> Dict[str, Any]:
         """
         Clicks the center of the bounding box to focus the element, 
-        clears existing text, and types the new text content.
+        clears existing text, and enters the new text content, then presses Enter
+        unless `press_enter` is False (a form field that is not the last one).
+        The typing strategy comes from the call, a per-site override or the target
+        element's markPage attributes (see text_input.choose_strategy). The field value is
+        verified afterwards; a fast fill that did not stick is retried with key events.
         """
+        chosen = choose_strategy(element, page.url, strategy)
 
         # 1. Click to focus the input field
         await page.mouse.click(x, y)
-        
-        # 2. Select all existing text
+
+        attempts = [chosen, "type"] if chosen == "fast" else [chosen]
+        verified = None
+        for attempt in attempts:
+            # 2. Clear existing text
+            await self._clear_focused(page)
+
+            # 3. Enter the new text content
+            await self._enter_text(page, text, attempt)
+
+            # 4. Verify the field holds the text (None → focused element is not a field)
+            value = await page.evaluate(FOCUSED_VALUE_JS)
+            verified = None if value is None else " ".join(value.split()) == " ".join(text.split())
+            chosen = attempt
+            if verified is not False:
+                break
+            metrics.count("browser.type_text.retries")
+
+        # 5. Press Enter to submit/confirm
+        if press_enter:
+            await page.keyboard.press("Enter")
+        await self.settle(page, reason="type_text")
+        return {"strategy": chosen, "verified": verified}
+
+    async def _clear_focused(self, page: Page):
+        # Select all existing text and delete the selection
         select_all = "Meta+A" if platform.system() == "Darwin" else "Control+A"
         await page.keyboard.press(select_all)
-        
-        # 3. Delete the selection
         await page.keyboard.press("Backspace")
-        
-        # 4. Type the new text content with a human-like delay
-        for char in text:
-            await page.keyboard.press(char)
-            # Use random delay for less robotic interaction
-            await asyncio.sleep(random.uniform(0.08, 0.15))
-            
-        # 5. Press Enter to submit/confirm
-        await page.keyboard.press("Enter")
-        await asyncio.sleep(0.5)
 
+    async def _enter_text(self, page: Page, text: str, strategy: str):
+        if strategy == "fast":
+            # one round-trip: value setter + input/change events, insert_text for contenteditable
+            if not await page.evaluate(FILL_FOCUSED_JS, text):
+                await page.keyboard.insert_text(text)
+        elif strategy == "human":
+            for char in text:
+                await page.keyboard.press(char)
+                # Use random delay for less robotic interaction
+                await asyncio.sleep(random.uniform(0.08, 0.15))
+        else:
+            await page.keyboard.type(text, delay=0)
+
+    @instrumented("browser.scroll")
     async def action_scroll(self, page: Page, direction, whole_page=True, x=None, y=None):   
         if whole_page:
             # Not sure the best value for this:
@@ -185,7 +312,8 @@ class BrowserManager:
 
         return f"Scrolled {direction} in whole page {whole_page} or x={x}, y={y}"
     
+    @instrumented("browser.back")
     async def back(self, page: Page):
-        await page.go_back()
-        await asyncio.sleep(0.5)
+        await page.go_back(wait_until="commit")
+        await self.settle(page, reason="back")
 
@@ -0,0 +1,167 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.browser.snapshot import ElementSnapshot, SnapshotElement, serialize_snapshot
+from backend.metrics import metrics, timed
+
+# elements sent to the model per step, 0 → all of them
+ELEMENT_TOP_K = int(os.environ.get("YB_ELEMENT_TOP_K", "80"))
+ELEMENT_TEXT_MAX = int(os.environ.get("YB_ELEMENT_TEXT_MAX", "80"))
+# CSS selectors cost many tokens and the model acts on element ids, so they are left out by default
+ELEMENT_SELECTORS = os.environ.get("YB_ELEMENT_SELECTORS", "0") == "1"
+
+# attributes worth sending, with their maximum length
+KEPT_ATTRIBUTES = {"name": 40, "type": 20, "value": 40, "placeholder": 60, "title": 60, "role": 20,
+                   "alt": 60, "href": 60, "aria-autocomplete": 10, "contenteditable": 10, "id": 30}
+# attributes whose words count when matching the goal
+MATCHED_ATTRIBUTES = ("name", "placeholder", "title", "alt", "value", "id", "href")
+INPUT_TYPES = {"input", "textarea", "select"}
+# elements centered above this y (px) are on the first screen
+FIRST_SCREEN_Y = 900
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "at", "by", "from", "is", "are",
+    "be", "it", "this", "that", "as", "me", "my", "i", "you", "your", "find", "get", "go", "open", "page",
+    "website", "http", "https", "www", "com", "then", "all", "some", "any", "into", "out", "up", "s",
+}
+_WORD = re.compile(r"[a-z0-9]+")
+_URL = re.compile(r"https?://\S+|www\.\S+")
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ies", "es", "ed", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(w) for w in _WORD.findall((text or "").lower()) if w not in STOPWORDS]
+
+
+def goal_terms(goal_statement: str, history: Iterable[str] = (), query: Optional[str] = None) -> Dict[str, float]:
+    """Term weights: an explicit query counts most, then the goal, then the last few action summaries."""
+    terms: Dict[str, float] = {}
+    sources = [(h, 0.5) for h in list(history)[-3:]] + [(_URL.sub(" ", goal_statement or ""), 1.0)]
+    if query:
+        sources.append((query, 2.0))
+    for text, weight in sources:
+        for term in tokenize(text):
+            terms[term] = max(terms.get(term, 0.0), weight)
+    return terms
+
+
+def _fields(el: SnapshotElement) -> Tuple[set, set]:
+    primary = set(tokenize(f"{el.text[:300]} {el.aria_label}"))
+    secondary = set(tokenize(" ".join(str(el.attributes.get(k) or "") for k in MATCHED_ATTRIBUTES)))
+    return primary, secondary
+
+
+def score_elements(snapshot: ElementSnapshot, terms: Dict[str, float]) -> List[float]:
+    """Relevance of each element (in snapshot order): goal term matches weighted by rarity, plus small priors."""
+    fields = [_fields(el) for el in snapshot]
+    df = Counter(term for primary, secondary in fields for term in (primary | secondary) if term in terms)
+    texts = Counter(" ".join(el.text.split())[:80] for el in snapshot)
+    count = len(fields)
+    scores = []
+    for position, (el, (primary, secondary)) in enumerate(zip(snapshot, fields)):
+        score = 0.0
+        for term, weight in terms.items():
+            if term in primary:
+                score += weight * math.log(1 + count / (1 + df[term]))
+            elif term in secondary:
+                score += 0.6 * weight * math.log(1 + count / (1 + df[term]))
+        if el.type in INPUT_TYPES:
+            score += 0.6
+        elif el.type == "button":
+            score += 0.2
+        if el.y is not None and 0 <= el.y <= FIRST_SCREEN_Y:
+            score += 0.4
+        if not primary and not secondary:
+            score -= 0.5
+        repeats = texts[" ".join(el.text.split())[:80]]
+        if repeats > 3:
+            # one of many identical "Add to cart" / "More" links
+            score -= 0.1 * math.log(repeats)
+        # earlier in document order breaks ties
+        scores.append(score - position * 1e-6)
+    return scores
+
+
+def _truncate(value: str, limit: int) -> str:
+    value = " ".join(str(value).split())
+    return value if len(value) <= limit else value[:limit - 1] + "…"
+
+
+def compact_element(el: SnapshotElement) -> SnapshotElement:
+    """Copy for the prompt: short texts, only useful attributes. Same index, so actions still map."""
+    attributes = {k: _truncate(v, KEPT_ATTRIBUTES[k]) for k, v in el.attributes.items()
+                  if k in KEPT_ATTRIBUTES and v not in (None, "")}
+    return SnapshotElement(index=el.index, type=el.type, text=_truncate(el.text, ELEMENT_TEXT_MAX),
+                           aria_label=_truncate(el.aria_label, ELEMENT_TEXT_MAX),
+                           css_selector=el.css_selector if ELEMENT_SELECTORS else "",
+                           attributes=attributes, x=el.x, y=el.y)
+
+
+def rank_snapshot(snapshot: ElementSnapshot, goal_statement: str, history: Iterable[str] = (),
+                  query: Optional[str] = None, page: int = 0,
+                  top_k: Optional[int] = None) -> Tuple[ElementSnapshot, int, int, int]:
+    """
+    Page `page` of the elements ranked by relevance, `top_k` per page, in
+    document order. With a `query` only the elements matching one of its words
+    are listed. Returns (compacted snapshot, page shown, number of pages,
+    number of elements listed over all pages).
+    """
+    top_k = ELEMENT_TOP_K if top_k is None else top_k
+    elements = list(snapshot)
+    wanted = set(tokenize(query)) if query else set()
+    if not wanted:
+        # only stopwords / punctuation: nothing to filter on, the plain ranked list
+        query = None
+    if not query and (top_k <= 0 or len(elements) <= top_k):
+        return ElementSnapshot([compact_element(el) for el in elements], snapshot.url, snapshot.title,
+                               snapshot.document_id), 0, 1, len(elements)
+
+    scores = score_elements(snapshot, goal_terms(goal_statement, history, query))
+    if wanted:
+        candidates = [i for i, el in enumerate(elements) if wanted & set.union(*_fields(el))]
+        pinned = []
+    else:
+        candidates = list(range(len(elements)))
+        # form fields on the first screen (search boxes, logins) lead the first page whatever they match
+        pinned = [i for i, el in enumerate(elements)
+                  if el.type in INPUT_TYPES and el.y is not None and 0 <= el.y <= FIRST_SCREEN_Y][:top_k // 4]
+    pinned_set = set(pinned)
+    ranked = pinned + sorted((i for i in candidates if i not in pinned_set), key=lambda i: scores[i], reverse=True)
+    per_page = top_k if top_k > 0 else max(1, len(ranked))
+    pages = max(1, math.ceil(len(ranked) / per_page))
+    page = min(max(page, 0), pages - 1)
+    chosen = sorted(ranked[page * per_page:(page + 1) * per_page])
+    return ElementSnapshot([compact_element(elements[i]) for i in chosen], snapshot.url, snapshot.title,
+                           snapshot.document_id), page, pages, len(ranked)
+
+
+def render_elements(snapshot: Optional[ElementSnapshot], goal_statement: str, history: Iterable[str] = (),
+                    query: Optional[str] = None, page: int = 0, fmt: Optional[str] = None) -> str:
+    """WebElements text for the model: ranked, compacted, with a header when elements are left out."""
+    if snapshot is None:
+        return ""
+    if query and not tokenize(query):
+        query = None
+    with timed("snapshot.rank"):
+        shown, page, pages, listed = rank_snapshot(snapshot, goal_statement, history, query=query, page=page)
+    metrics.size("snapshot.elements_sent", len(shown))
+    text = serialize_snapshot(shown, fmt)
+    if query:
+        header = (f"# {len(shown)} of the {listed} elements matching \"{query}\" ({len(snapshot)} on the page, "
+                  f"page {page + 1} of {pages}). Call more_elements with the same query for the next page, "
+                  f"or without a query to go back to the full list.")
+    elif len(shown) == len(snapshot):
+        return text
+    else:
+        header = (f"# {len(shown)} of {len(snapshot)} elements, ranked by relevance to the goal (page {page + 1} of {pages}). "
+                  f"Call more_elements for the next page, or more_elements with a query to search all elements.")
+    return f"{header}\n{text}"
@@ -0,0 +1,149 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from playwright.async_api import Page
+
+try:
+    from PIL import Image
+except ImportError:  # resizing / webp / perceptual hashing need Pillow
+    Image = None
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass
+class ScreenshotConfig:
+    format: str = os.environ.get("YB_SCREENSHOT_FORMAT", "jpeg")        # png | jpeg | webp
+    quality: int = int(os.environ.get("YB_SCREENSHOT_QUALITY", "70"))    # jpeg / webp only
+    max_width: int = int(os.environ.get("YB_SCREENSHOT_MAX_WIDTH", "1280"))
+    max_height: int = int(os.environ.get("YB_SCREENSHOT_MAX_HEIGHT", "0"))  # 0 → keep aspect from width
+    # crop to the bounding box of the extracted interactive elements
+    clip_to_elements: bool = os.environ.get("YB_SCREENSHOT_CLIP", "0") == "1"
+    clip_padding: int = 16
+    # perceptual hash distance (bits out of 64) under which two frames count as unchanged
+    change_threshold: int = 3
+    # what the model gets for an unchanged frame: "mark" → image + note, "skip" → note only
+    on_unchanged: str = os.environ.get("YB_SCREENSHOT_ON_UNCHANGED", "mark")
+    # decode / resize / encode / hash in a worker thread so the event loop keeps going (pipelined mode)
+    offload_encoding: bool = False
+
+
+@dataclass
+class Screenshot:
+    data: bytes
+    mime_type: str
+    width: int = 0
+    height: int = 0
+    fingerprint: Optional[int] = None       # 64-bit dHash, or exact digest without Pillow
+    perceptual: bool = False
+    unchanged: bool = False
+    skip_upload: bool = False
+    clip: Optional[Dict[str, float]] = None
+
+
+def _dhash(image) -> int:
+    small = image.convert("L").resize((9, 8))
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+class ScreenshotPipeline:
+    """
+    Capture → (clip) → downscale → encode → fingerprint.
+    The fingerprint of the previous step decides whether the frame changed.
+    """
+
+    def __init__(self, config: Optional[ScreenshotConfig] = None):
+        self.config = config or ScreenshotConfig()
+
+    def _clip_region(self, snapshot) -> Optional[Dict[str, float]]:
+        rects = [r for el in (snapshot or []) for r in el.rects]
+        if not rects:
+            return None
+        pad = self.config.clip_padding
+        left = max(0, min(r["left"] for r in rects) - pad)
+        top = max(0, min(r["top"] for r in rects) - pad)
+        right = max(r["right"] for r in rects) + pad
+        bottom = max(r["bottom"] for r in rects) + pad
+        return {"x": left, "y": top, "width": right - left, "height": bottom - top}
+
+    async def capture(self, page: Page, snapshot: Any = None, previous: Optional[Screenshot] = None) -> Screenshot:
+        fmt = self.config.format if self.config.format in MIME_TYPES else "jpeg"
+        if fmt == "webp" and Image is None:
+            fmt = "jpeg"
+
+        clip = self._clip_region(snapshot) if self.config.clip_to_elements else None
+        options: Dict[str, Any] = {"full_page": False, "scale": "css"}
+        if clip:
+            options["clip"] = clip
+        # webp is re-encoded from a lossless capture
+        if fmt == "jpeg":
+            options.update(type="jpeg", quality=self.config.quality)
+        else:
+            options.update(type="png")
+
+        raw: bytes = await page.screenshot(**options)
+
+        if Image is None:
+            return self._finish(Screenshot(data=raw, mime_type=MIME_TYPES[fmt], clip=clip,
+                                           fingerprint=int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")),
+                                previous)
+        if self.config.offload_encoding:
+            return self._finish(await asyncio.to_thread(self._encode, raw, fmt, clip), previous)
+        return self._finish(self._encode(raw, fmt, clip), previous)
+
+    def _encode(self, raw: bytes, fmt: str, clip: Optional[Dict[str, float]]) -> Screenshot:
+        image = Image.open(io.BytesIO(raw))
+        captured_size = image.size
+        max_height = self.config.max_height or None
+        if image.width > self.config.max_width or (max_height and image.height > max_height):
+            image.thumbnail((self.config.max_width, max_height or image.height))
+
+        # a png/jpeg capture that did not need resizing is already final
+        if fmt == "webp" or image.size != captured_size:
+            buffer = io.BytesIO()
+            if fmt == "png":
+                image.save(buffer, format="PNG", optimize=False)
+            else:
+                image.convert("RGB").save(buffer, format=fmt.upper(), quality=self.config.quality)
+            data = buffer.getvalue()
+        else:
+            data = raw
+
+        return Screenshot(data=data, mime_type=MIME_TYPES[fmt], width=image.width, height=image.height,
+                          fingerprint=_dhash(image), perceptual=True, clip=clip)
+
+    def _finish(self, shot: Screenshot, previous: Optional[Screenshot]) -> Screenshot:
+        if previous is None or previous.fingerprint is None or shot.fingerprint is None:
+            return shot
+        if shot.perceptual and previous.perceptual:
+            shot.unchanged = bin(shot.fingerprint ^ previous.fingerprint).count("1") <= self.config.change_threshold
+        else:
+            shot.unchanged = shot.fingerprint == previous.fingerprint
+        shot.skip_upload = shot.unchanged and self.config.on_unchanged == "skip"
+        return shot
+
+
+def make_thumbnail(shot: Optional[Screenshot], width: int = 320, quality: int = 50) -> Optional[str]:
+    """Small base64 jpeg of a captured frame for progress updates, None without Pillow."""
+    if shot is None or Image is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(shot.data))
+        image.thumbnail((width, width * 4))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+    except Exception:
+        return None
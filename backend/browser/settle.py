@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from playwright.async_api import Page, Request, Frame
+
+logger = logging.getLogger(__name__)
+
+# Requests that never "finish" in the usual sense and would keep the page busy forever
+# ("ping" covers navigator.sendBeacon / <a ping>, which analytics fire continuously)
+LONG_LIVED_RESOURCE_TYPES = {"websocket", "eventsource", "manifest", "other", "ping"}
+
+
+@dataclass
+class SettleConfig:
+    # hard ceiling for a single settle wait (seconds)
+    timeout: float = float(os.environ.get("YB_SETTLE_TIMEOUT", "8"))
+    # network is idle once at most `max_inflight` requests are pending for this long (ms);
+    # 2 like puppeteer's networkidle2, so a long-poll or a stuck tracker does not hold every action
+    network_idle_ms: int = 300
+    max_inflight: int = int(os.environ.get("YB_SETTLE_MAX_INFLIGHT", "2"))
+    # DOM is quiet once no mutation was observed for this long (ms)
+    dom_quiet_ms: int = 200
+    # how often the python side re-checks network state (seconds)
+    poll_interval: float = 0.025
+
+
+@dataclass
+class SettleReport:
+    reason: str = ""
+    elapsed_ms: float = 0.0
+    navigated: bool = False
+    network_idle: bool = False
+    dom_quiet: bool = False
+    mutations: int = 0
+    timed_out: bool = False
+    started_at: float = 0.0    # time.monotonic() when the wait began
+    finished_at: float = 0.0   # time.monotonic() when the wait ended
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "reason": self.reason,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "navigated": self.navigated,
+            "network_idle": self.network_idle,
+            "dom_quiet": self.dom_quiet,
+            "mutations": self.mutations,
+            "timed_out": self.timed_out,
+        }
+
+
+@dataclass
+class _PageActivity:
+    inflight: Set[Request] = field(default_factory=set)
+    last_activity: float = field(default_factory=time.monotonic)
+    navigation_pending: bool = False
+    navigations: int = 0
+    last_report: Optional["SettleReport"] = None
+    action_started: float = 0.0   # time.monotonic() when the latest agent action began
+
+
+class PageSettler:
+    """
+    Waits for a page to become stable after an action using real signals
+    (navigation commit, network idle, DOM mutation quiescence, animation frames)
+    instead of fixed sleeps. Every wait is bounded by `SettleConfig.timeout`.
+    """
+
+    def __init__(self, config: Optional[SettleConfig] = None):
+        self.config = config or SettleConfig()
+        self._activity: Dict[Page, _PageActivity] = {}
+
+    def attach(self, page: Page):
+        """Start tracking network/navigation activity of a page. Safe to call twice."""
+        if page in self._activity:
+            return
+        activity = _PageActivity()
+        self._activity[page] = activity
+
+        def _touch():
+            activity.last_activity = time.monotonic()
+
+        def on_request(request: Request):
+            if request.is_navigation_request() and request.frame == page.main_frame:
+                activity.navigation_pending = True
+            if request.resource_type not in LONG_LIVED_RESOURCE_TYPES:
+                activity.inflight.add(request)
+            _touch()
+
+        def on_request_done(request: Request):
+            activity.inflight.discard(request)
+            if request.is_navigation_request() and request.frame == page.main_frame and request.failure:
+                activity.navigation_pending = False
+            _touch()
+
+        def on_frame_navigated(frame: Frame):
+            if frame == page.main_frame:
+                activity.navigation_pending = False
+                activity.navigations += 1
+                _touch()
+
+        page.on("request", on_request)
+        page.on("requestfinished", on_request_done)
+        page.on("requestfailed", on_request_done)
+        page.on("framenavigated", on_frame_navigated)
+        page.on("close", lambda _page: self._activity.pop(page, None))
+
+    def _network_idle(self, activity: _PageActivity) -> bool:
+        if len(activity.inflight) > self.config.max_inflight:
+            return False
+        return (time.monotonic() - activity.last_activity) * 1000 >= self.config.network_idle_ms
+
+    async def _wait_network_idle(self, activity: _PageActivity, deadline: float) -> bool:
+        while not self._network_idle(activity):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.config.poll_interval)
+        return True
+
+    async def _wait_navigation(self, page: Page, activity: _PageActivity, deadline: float) -> bool:
+        while activity.navigation_pending:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.config.poll_interval)
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=remaining * 1000)
+        except Exception:
+            return False
+        return True
+
+    async def _wait_dom_quiet(self, page: Page, script: str, deadline: float) -> Dict[str, object]:
+        remaining_ms = int(max(0.0, deadline - time.monotonic()) * 1000)
+        try:
+            # the script is idempotent, it only (re)defines helpers when missing
+            if script:
+                await page.evaluate(script)
+            return await page.evaluate(
+                "(opts) => window.settlePage ? window.settlePage(opts) : {timedOut: false, mutations: 0}",
+                {"quietMs": self.config.dom_quiet_ms, "timeoutMs": remaining_ms},
+            )
+        except Exception:
+            # execution context destroyed by a navigation, caller will loop
+            return {"timedOut": True, "mutations": 0, "destroyed": True}
+
+    async def settle(self, page: Page, script: str = "", reason: str = "", timeout: Optional[float] = None) -> SettleReport:
+        self.attach(page)
+        activity = self._activity.get(page) or _PageActivity()
+        start = time.monotonic()
+        deadline = start + (self.config.timeout if timeout is None else timeout)
+        start_navigations = activity.navigations
+        report = SettleReport(reason=reason, started_at=start)
+
+        while True:
+            if activity.navigation_pending:
+                await self._wait_navigation(page, activity, deadline)
+
+            dom = await self._wait_dom_quiet(page, script, deadline)
+            report.mutations += int(dom.get("mutations") or 0)
+            report.dom_quiet = not dom.get("timedOut") and not dom.get("destroyed")
+
+            report.network_idle = await self._wait_network_idle(activity, deadline)
+
+            # anything new since the DOM check (late navigation / fresh requests) → check again
+            stable = report.dom_quiet and report.network_idle and not activity.navigation_pending
+            if stable or time.monotonic() >= deadline:
+                break
+
+        report.navigated = activity.navigations != start_navigations
+        report.timed_out = not (report.dom_quiet and report.network_idle)
+        report.finished_at = time.monotonic()
+        report.elapsed_ms = (report.finished_at - start) * 1000
+        activity.last_report = report
+        logger.debug("settle %s", report.as_dict())
+        return report
+
+    def action_started(self, page: Page):
+        """Mark the start of an agent action on the page, see `still_settled`."""
+        self.attach(page)
+        self._activity[page].action_started = time.monotonic()
+
+    def still_settled(self, page: Page) -> bool:
+        """
+        The latest action on this page settled by itself (its settle wait began
+        after the action did and succeeded) and no navigation or request happened
+        since, so waiting again would only cost the DOM quiet period. Actions
+        that do not settle (scroll, wait) never qualify.
+        """
+        activity = self._activity.get(page)
+        report = activity.last_report if activity else None
+        if report is None or not activity.action_started or report.started_at < activity.action_started:
+            return False
+        if report.timed_out or activity.navigation_pending or activity.inflight:
+            return False
+        return activity.last_activity <= report.finished_at
+
+    async def wait_frames(self, page: Page, count: int = 2):
+        """Let pending paints, observer callbacks and scroll handlers run (the first step of every settle)."""
+        try:
+            await page.evaluate("(count) => window.waitFrames ? window.waitFrames(count) : null", count)
+        except Exception:
+            pass
+
+    def last_report(self, page: Page) -> Optional[SettleReport]:
+        """Report of the most recent settle wait on this page."""
+        activity = self._activity.get(page)
+        return activity.last_report if activity else None
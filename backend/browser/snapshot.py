@@ -0,0 +1,144 @@
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_SNAPSHOT_FORMAT = os.environ.get("YB_SNAPSHOT_FORMAT", "tsv")
+
+
+class SnapshotElement:
+    __slots__ = ("index", "type", "text", "aria_label", "css_selector", "xpath",
+                 "cursor", "attributes", "x", "y", "area", "rects")
+
+    def __init__(self, index: int, type: str = "", text: str = "", aria_label: str = "",
+                 css_selector: str = "", xpath: str = "", cursor: str = "",
+                 attributes: Optional[Dict[str, str]] = None, x: Optional[float] = None,
+                 y: Optional[float] = None, area: float = 0, rects: Optional[List[Dict[str, Any]]] = None):
+        self.index = index
+        self.type = type
+        self.text = text
+        self.aria_label = aria_label
+        self.css_selector = css_selector
+        self.xpath = xpath
+        self.cursor = cursor
+        self.attributes = attributes or {}
+        self.x = x
+        self.y = y
+        self.area = area
+        self.rects = rects or []
+
+    @classmethod
+    def from_mark_page(cls, el: Dict[str, Any]) -> "SnapshotElement":
+        """Build from one element returned by markPage() in extract_elements.js."""
+        center = el.get("center") or {}
+        return cls(
+            index=int(el.get("index", 0)),
+            type=el.get("type") or "",
+            text=el.get("text") or "",
+            aria_label=el.get("ariaLabel") or "",
+            css_selector=el.get("cssSelector") or "",
+            xpath=el.get("xpath") or "",
+            cursor=el.get("computedCursor") or "",
+            attributes=el.get("attributes") or {},
+            x=center.get("x"),
+            y=center.get("y"),
+            area=el.get("area") or 0,
+            rects=el.get("rects") or [],
+        )
+
+
+class ElementSnapshot:
+    """
+    In-memory element table of one page state, keyed by element index.
+    The agent reads coordinates from it directly; it is only turned into
+    text for the model by one of the serializers below.
+    """
+    __slots__ = ("elements", "url", "title", "document_id", "_by_index")
+
+    def __init__(self, elements: List[SnapshotElement], url: str = "", title: str = "",
+                 document_id: Optional[str] = None):
+        self.elements = elements
+        self.url = url
+        self.title = title
+        # element indexes are stable ids within this in-page document (see keyFor in extract_elements.js)
+        self.document_id = document_id
+        self._by_index = {el.index: el for el in elements}
+
+    @classmethod
+    def from_mark_page(cls, elements: List[Dict[str, Any]], url: str = "", title: str = "",
+                       document_id: Optional[str] = None) -> "ElementSnapshot":
+        return cls([SnapshotElement.from_mark_page(el) for el in (elements or [])], url=url, title=title,
+                   document_id=document_id)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def __iter__(self) -> Iterator[SnapshotElement]:
+        return iter(self.elements)
+
+    def get(self, index: Any) -> Optional[SnapshotElement]:
+        try:
+            return self._by_index.get(int(index))
+        except (TypeError, ValueError):
+            return None
+
+    def center(self, index: Any) -> Tuple[float, float]:
+        element = self.get(index)
+        if element is None or element.x is None or element.y is None:
+            raise KeyError(f"element {index} not found in snapshot")
+        return float(element.x), float(element.y)
+
+    def locate_query(self, index: Any) -> Dict[str, Any]:
+        """Arguments for window.locateElement: the id plus a fingerprint for when the id is gone."""
+        element = self.get(index)
+        if element is None:
+            raise KeyError(f"element {index} not found in snapshot")
+        return {"index": element.index, "documentId": self.document_id, "type": element.type,
+                "text": element.text, "ariaLabel": element.aria_label,
+                "cssSelector": element.css_selector, "xpath": element.xpath}
+
+
+# ---- Serializers: ElementSnapshot -> model input text ----
+
+def _clean(value: Any) -> str:
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def _compact_attributes(attributes: Dict[str, str]) -> str:
+    return ";".join(f"{k}={_clean(v)}" for k, v in attributes.items() if v not in (None, ""))
+
+
+def serialize_tsv(snapshot: ElementSnapshot) -> str:
+    lines = ["id\ttype\ttext\taria\tselector\tx\ty\tattrs"]
+    for el in snapshot:
+        lines.append("\t".join([
+            str(el.index), el.type, _clean(el.text), _clean(el.aria_label), _clean(el.css_selector),
+            "" if el.x is None else str(el.x), "" if el.y is None else str(el.y),
+            _compact_attributes(el.attributes),
+        ]))
+    return "\n".join(lines)
+
+
+def serialize_jsonl(snapshot: ElementSnapshot) -> str:
+    lines = []
+    for el in snapshot:
+        row = {"id": el.index, "type": el.type, "text": _clean(el.text), "aria": el.aria_label,
+               "selector": el.css_selector, "x": el.x, "y": el.y,
+               "attrs": {k: v for k, v in el.attributes.items() if v not in (None, "")}}
+        lines.append(json.dumps({k: v for k, v in row.items() if v not in ("", None, {})}, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines)
+
+
+SERIALIZERS: Dict[str, Callable[[ElementSnapshot], str]] = {
+    "tsv": serialize_tsv,
+    "jsonl": serialize_jsonl,
+}
+
+
+def register_serializer(name: str, serializer: Callable[[ElementSnapshot], str]):
+    SERIALIZERS[name] = serializer
+
+
+def serialize_snapshot(snapshot: Optional[ElementSnapshot], fmt: Optional[str] = None) -> str:
+    if snapshot is None:
+        return ""
+    return SERIALIZERS[fmt or DEFAULT_SNAPSHOT_FORMAT](snapshot)
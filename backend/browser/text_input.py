@@ -0,0 +1,85 @@
+import os
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+# Typing strategies for BrowserManager.action_typetext:
+#   fast  → set the value in one round-trip (native value setter + input/change events,
+#           insert_text for contenteditable)
+#   type  → keyboard.type with no delay, real key events for every character
+#   human → one key press at a time with a random 80-150ms pause (opt-in)
+STRATEGIES = ("fast", "type", "human")
+
+# Inputs that usually react to individual key events (autocomplete, masks)
+KEY_EVENT_INPUT_TYPES = {"date", "time", "datetime-local", "month", "week", "number", "tel"}
+
+# Sets the focused field's value the way a user edit would, so frameworks (React, Vue)
+# see the change. Returns false when the focused element is not a text field.
+FILL_FOCUSED_JS = """
+(text) => {
+  var el = document.activeElement;
+  if (!el) return false;
+  var tag = el.tagName;
+  if (tag !== 'INPUT' && tag !== 'TEXTAREA') return false;
+  var proto = tag === 'INPUT' ? HTMLInputElement.prototype : HTMLTextAreaElement.prototype;
+  var setter = Object.getOwnPropertyDescriptor(proto, 'value').set;
+  setter.call(el, text);
+  el.dispatchEvent(new Event('input', { bubbles: true }));
+  el.dispatchEvent(new Event('change', { bubbles: true }));
+  return true;
+}
+"""
+
+FOCUSED_VALUE_JS = """
+() => {
+  var el = document.activeElement;
+  if (!el) return null;
+  if (el.isContentEditable) return el.innerText;
+  return el.value != null ? String(el.value) : null;
+}
+"""
+
+
+def _parse_site_strategies(value: str) -> Dict[str, str]:
+    # "example.com=human,shop.example.org=type"
+    strategies = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        domain, _, strategy = item.partition("=")
+        if strategy in STRATEGIES:
+            strategies[domain.strip().lower()] = strategy
+    return strategies
+
+
+DEFAULT_STRATEGY = os.environ.get("YB_TYPING_STRATEGY", "auto")
+SITE_STRATEGIES = _parse_site_strategies(os.environ.get("YB_TYPING_STRATEGIES", ""))
+
+
+def choose_strategy(element: Any = None, url: str = "", strategy: Optional[str] = None,
+                    site_strategies: Optional[Dict[str, str]] = None) -> str:
+    """
+    Pick the typing strategy: explicit per-call value → per-site override →
+    configured default → derived from the target element captured by markPage.
+    """
+    if strategy in STRATEGIES:
+        return strategy
+
+    host = (urlparse(url).hostname or "").lower()
+    for domain, site_strategy in (site_strategies if site_strategies is not None else SITE_STRATEGIES).items():
+        if host == domain or host.endswith("." + domain):
+            return site_strategy
+
+    if DEFAULT_STRATEGY in STRATEGIES:
+        return DEFAULT_STRATEGY
+
+    if element is None:
+        return "type"
+    attributes = getattr(element, "attributes", None) or {}
+    if attributes.get("contenteditable") not in (None, "false"):
+        return "fast"
+    if attributes.get("role") == "combobox" or attributes.get("aria-autocomplete") not in (None, "none"):
+        # suggestion lists listen to key events
+        return "type"
+    if element.type == "textarea":
+        return "fast"
+    if element.type == "input":
+        return "type" if (attributes.get("type") or "text").lower() in KEY_EVENT_INPUT_TYPES else "fast"
+    return "type"
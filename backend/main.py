@@ -1,53 +1,164 @@
 # uvicorn backend.main:app --host 0.0.0.0 --port 8000
 
-from contextlib import asynccontextmanager
-from typing import Set, Any
+from contextlib import asynccontextmanager, nullcontext
+from typing import Set, Any, Dict
 import json
+import os
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from backend.browser.manager import BrowserManager
 from backend.states.coordinator_states import CoordinatorState
-from backend.agents.coordinator_agent import coordinator_agent_graph
+from backend.states.session_store import SessionStore
+from backend.agents.coordinator_agent import coordinator_agent_graph, close_pending_tool_calls
+from backend.agents.scheduler import SessionScheduler
+from backend.model_interactions.llm_client import close_model_client, get_model_client
+from backend.model_interactions.history import HistoryManager
+from backend.agents.progress import ProgressChannel
+from backend.workers.pool import WorkerPool
+from backend.metrics import metrics
 
 # --- Lifespan / app startup-shutdown using asynccontextmanager ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Start the persistent Playwright browser once and store it on app.state.
+    With YB_BROWSER_WORKERS=N the browsers live in N worker processes instead.
     Stop it cleanly on shutdown.
     """
-    app.state.browser_manager = BrowserManager()
-    print("LIFESPAN: starting browser manager...")
-    await app.state.browser_manager.start()
+    app.state.browser_manager = None
+    app.state.worker_pool = None
+    workers = int(os.environ.get("YB_BROWSER_WORKERS", "0"))
+    if workers > 0:
+        app.state.worker_pool = WorkerPool(workers)
+        print(f"LIFESPAN: starting {workers} browser workers...")
+        await app.state.worker_pool.start()
+    else:
+        app.state.browser_manager = BrowserManager()
+        print("LIFESPAN: starting browser manager...")
+        await app.state.browser_manager.start()
+    # sessions: LRU / idle TTL in memory, optional SQLite spill (YB_SESSION_DB) to resume after a restart
+    app.state.sessions = SessionStore(
+        create=create_ui_state,
+        dump=lambda ui_state: ui_state['history'].to_dict(),
+        restore=lambda ui_state, data: ui_state['history'].load_dict(data),
+        is_busy=session_busy,
+        on_evict=release_session,
+        is_connected=session_connected,
+    )
+    await app.state.sessions.start()
     try:
         yield
     finally:
-        print("LIFESPAN: stopping browser manager...")
-        await app.state.browser_manager.stop()
+        print("LIFESPAN: saving sessions...")
+        await app.state.sessions.stop()
+        if app.state.worker_pool is not None:
+            print("LIFESPAN: stopping browser workers...")
+            await app.state.worker_pool.stop()
+        else:
+            print("LIFESPAN: stopping browser manager...")
+            await app.state.browser_manager.stop()
+        await close_model_client()
 
 app = FastAPI(lifespan=lifespan)
 
 # Keep track of active websockets
 active_connections: Set[WebSocket] = set()
-ui_states = {}
 
-def get_ui_state(uid, message, ws):
-    if uid not in ui_states:
-        ui_state = CoordinatorState()
+def create_ui_state(uid):
+    ui_state = CoordinatorState()
+    ui_state['ws'] = None
+    ui_state['browser_manager'] = app.state.browser_manager
+    ui_state['worker_pool'] = app.state.worker_pool
+    ui_state['session_id'] = uid
+    ui_state['conversation_history'] = []
+    ui_state['history'] = HistoryManager(ui_state['conversation_history'])
+    ui_state['tool_call'] = False
+    ui_state['subgraph_states'] = []
+    # outlives the socket: buffers while the client is away, replays when it reconnects
+    ui_state['progress'] = ProgressChannel()
+    return ui_state
+
+def session_busy(ui_state):
+    return ui_state.get('scheduler') is not None and ui_state['scheduler'].running
+
+def session_connected(ui_state):
+    return ui_state.get('ws') is not None
+
+async def release_session(uid, ui_state):
+    # evicted from memory: stop its scheduler and outbound stream, give its browser context back
+    if ui_state.get('scheduler') is not None:
+        await ui_state['scheduler'].close()
+    if ui_state.get('progress') is not None:
+        await ui_state['progress'].close(flush=False)
+    if app.state.worker_pool is not None:
+        await app.state.worker_pool.close_session(uid)
+    elif app.state.browser_manager is not None:
+        await app.state.browser_manager.contexts.release(uid)
+
+async def set_connected(uid, connected):
+    # a connected client still refers to its tabs: its browser context is not evicted for being idle
+    if app.state.worker_pool is not None:
+        await app.state.worker_pool.set_pinned(uid, connected)
+    elif app.state.browser_manager is not None:
+        app.state.browser_manager.contexts.pin(uid, connected)
+
+async def get_ui_state(uid, ws):
+    ui_state = await app.state.sessions.get(uid)
+    # a reconnecting client gets its session back on the new socket, with what it missed
+    if ui_state['progress'].ws is not ws:
         ui_state['ws'] = ws
-        ui_state['browser_manager'] = ws.app.state.browser_manager
-        ui_state['conversation_history'] = []
-        ui_state['tool_call'] = False
-        ui_states[uid] = ui_state
-    else:
-        ui_state = ui_states[uid]
-    ui_state['last_user_message'] = message
-    return ui_states[uid]
+        ui_state['progress'].attach(ws)
+        await set_connected(uid, True)
+    return ui_state
+
+def get_scheduler(uid, ui_state):
+    """One scheduler per session: coordinator turns run as tasks, the socket keeps being read."""
+    if ui_state.get('scheduler') is not None:
+        return ui_state['scheduler']
+
+    async def run(text):
+        ui_state['last_user_message'] = text
+        try:
+            # keep the session's browser context from being evicted while the agent runs
+            async with (app.state.browser_manager.contexts.lease(uid) if app.state.browser_manager is not None else nullcontext()):
+                await coordinator_agent_graph.ainvoke(ui_state)
+        except Exception as e:
+            print("Agent error:", e)
+            await ui_state['progress'].send({"error": str(e)})
+        await app.state.sessions.save(uid)
+
+    async def on_cancelled():
+        ui_state['last_user_message'] = None
+        close_pending_tool_calls(ui_state)
+        await ui_state['progress'].send([{"role": "model", "text": "Stopped."}])
+        await app.state.sessions.save(uid)
+
+    async def on_pause(paused):
+        if app.state.worker_pool is not None:
+            await app.state.worker_pool.set_paused(uid, paused)
+
+    scheduler = SessionScheduler(run, on_cancelled, on_pause)
+    ui_state['scheduler'] = scheduler
+    ui_state['control'] = scheduler.control
+    return scheduler
 
 @app.get("/", response_class=HTMLResponse)
 def index():
     return "<h3>Playwright WebSocket server is running. Connect to /ws</h3>"
 
+@app.get("/metrics")
+async def get_metrics(reset: bool = False):
+    """Timings (ms), payload sizes and counters of this process, plus every browser worker."""
+    snapshot = metrics.snapshot()
+    snapshot["sessions"] = len(app.state.sessions)
+    snapshot["active_connections"] = len(active_connections)
+    snapshot["llm_limiter"] = get_model_client().limiter_stats()
+    if app.state.worker_pool is not None:
+        snapshot["workers"] = await app.state.worker_pool.metrics()
+    if reset:
+        metrics.reset()
+    return snapshot
+
 # --- WebSocket endpoint ---
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
@@ -65,9 +176,16 @@ async def websocket_endpoint(ws: WebSocket):
         await ws.close()
         return
 
+    # sessions served on this socket, their progress channels buffer again once it closes
+    sessions: Dict[str, Any] = {}
     try:
+        # the client names its session when connecting: rebind right away, so a client that
+        # reconnects and only listens still gets the rest of a running turn
+        uid = ws.query_params.get("uid")
+        if uid:
+            sessions[uid] = await get_ui_state(uid, ws)
         while True:
-            # Expect JSON messages like: {"action":"goto","url":"https://example.com","page_index":0}
+            # Expect JSON messages like: {"uid": "...", "text": "find X on amazon"} or {"uid": "...", "action": "cancel"}
             data = await ws.receive_text()
             try:
                 payload = json.loads(data)
@@ -76,12 +194,24 @@ async def websocket_endpoint(ws: WebSocket):
                 continue
             
             uid = payload.get("uid")
-            message = payload["text"]
-            ui_state = get_ui_state(uid, message, ws)
-            await coordinator_agent_graph.ainvoke(ui_state)
+            ui_state = await get_ui_state(uid, ws)
+            sessions[uid] = ui_state
+            scheduler = get_scheduler(uid, ui_state)
 
-            # else:
-            #     await ws.send_json({"error": f"unknown action '{action}'"})
+            # control messages: {"uid", "action": "cancel" | "pause" | "resume", "goal_id"?}
+            action = payload.get("action")
+            if action == "cancel":
+                stopped = await scheduler.cancel(payload.get("goal_id"))
+                await ui_state['progress'].send({"type": "status", "action": action, "ok": stopped, "goal_id": payload.get("goal_id")})
+            elif action in ("pause", "resume"):
+                await (scheduler.pause() if action == "pause" else scheduler.resume())
+                await ui_state['progress'].send({"type": "status", "action": action, "ok": True})
+            elif payload.get("text"):
+                # runs in the background; while busy the message is queued as a follow-up
+                if scheduler.submit(payload["text"]):
+                    await ui_state['progress'].send({"type": "status", "action": "queued", "ok": True})
+            else:
+                await ws.send_json({"error": "expected 'text' or 'action'"})
 
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -94,6 +224,12 @@ async def websocket_endpoint(ws: WebSocket):
             pass
     finally:
         active_connections.discard(ws)
+        for uid, ui_state in sessions.items():
+            if ui_state['progress'].ws is ws:
+                # a running turn keeps going, its messages wait for the client to reconnect
+                ui_state['progress'].detach(ws)
+                ui_state['ws'] = None
+                await set_connected(uid, False)
         try:
             await ws.close()
         except Exception:
@@ -0,0 +1,175 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+# per-goal Chrome trace files (chrome://tracing, ui.perfetto.dev) are written here when set
+TRACE_DIR = os.environ.get("YB_TRACE_DIR", "")
+SAMPLE_WINDOW = 1024
+
+
+class _Series:
+    __slots__ = ("count", "total", "min", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+        return {
+            "count": self.count,
+            "total": round(self.total, 3),
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "min": round(self.min, 3) if self.count else 0.0,
+            "p50": round(pct(0.5), 3),
+            "p95": round(pct(0.95), 3),
+            "max": round(self.max, 3) if self.count else 0.0,
+        }
+
+
+class Metrics:
+    """
+    Process-wide timings (ms), sizes and counters. `timings` and `sizes` keep a
+    running total plus a window of recent samples for percentiles.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: Dict[str, _Series] = {}
+        self.sizes: Dict[str, _Series] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.time()
+
+    def timing(self, name: str, ms: float):
+        with self._lock:
+            self.timings.setdefault(name, _Series()).add(ms)
+
+    def size(self, name: str, value: float):
+        with self._lock:
+            self.sizes.setdefault(name, _Series()).add(value)
+        trace_counter(name, value)
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "timings_ms": {k: v.summary() for k, v in sorted(self.timings.items())},
+                "sizes": {k: v.summary() for k, v in sorted(self.sizes.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.timings, self.sizes, self.counters = {}, {}, {}
+            self.started = time.time()
+
+
+metrics = Metrics()
+
+
+# ---- Chrome trace-event recording ----
+
+class GoalTrace:
+    def __init__(self, goal_id: str, label: str = ""):
+        self.goal_id = goal_id
+        self.label = label
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+
+    def _ts(self, at: float) -> float:
+        return round((at - self.origin) * 1e6, 1)
+
+    def complete(self, name: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+        event = {"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": 1, "tid": 1,
+                 "ts": self._ts(start), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def counter(self, name: str, value: float):
+        self.events.append({"name": name, "ph": "C", "pid": 1, "tid": 1,
+                            "ts": self._ts(time.perf_counter()), "args": {"value": value}})
+
+    def write(self, directory: str) -> Path:
+        path = Path(directory) / f"{self.goal_id}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": self.label or self.goal_id}}]
+        path.write_text(json.dumps({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}))
+        return path
+
+
+_current_trace: contextvars.ContextVar[Optional[GoalTrace]] = contextvars.ContextVar("yb_goal_trace", default=None)
+
+
+@contextmanager
+def goal_trace(goal_id: Optional[str], label: str = ""):
+    """Collect the spans of one goal (tasks started inside inherit it) and write them to YB_TRACE_DIR."""
+    if not TRACE_DIR or not goal_id:
+        yield None
+        return
+    trace = GoalTrace(goal_id, label)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        try:
+            trace.write(TRACE_DIR)
+        except OSError:
+            pass
+
+
+def trace_counter(name: str, value: float):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.counter(name, value)
+
+
+# ---- instrumentation helpers ----
+
+@contextmanager
+def timed(name: str, **args):
+    """Time a block: recorded as `name` in the metrics and as a span of the current goal trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        metrics.timing(name, (end - start) * 1000)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.complete(name, start, end, args or None)
+
+
+def instrumented(name: str):
+    """Decorator form of `timed` for async functions (agent nodes, BrowserManager methods)."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,9 +1,11 @@
 import json
 import os
 from typing import List, Dict, Any, Optional, Tuple
-from google import genai
 from google.genai import types # Import the types module
 from google.genai.errors import APIError # Import for specific error handling
+from backend.model_interactions.llm_client import get_model_client
+from backend.model_interactions.rate_limiter import PRIORITY_INTERACTIVE
+from backend.metrics import metrics, timed
 
 tool_declarations = [
         {
@@ -85,28 +87,46 @@ The `web_interaction` tool will return specific status messages. You must interc
 """
 
 
-def call_gemini(input_content: types.Content = None, conversation_history: list[types.Content] = []) -> Tuple[str, List[Dict[str, Any]]]:
-    client = genai.Client(api_key=os.environ.get("GENAI_API_KEY"))
+async def call_gemini(input_content: types.Content = None, conversation_history: list[types.Content] = []) -> Tuple[str, List[Dict[str, Any]]]:
     model = "gemini-flash-lite-latest" 
 
-    generate_content_config = types.GenerateContentConfig(
-        temperature=0.3,
-        thinking_config = types.ThinkingConfig(thinking_budget=-1,),
-        tools=[types.Tool(function_declarations=tool_declarations)],
-        automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
-        system_instruction=[types.Part.from_text(text=generate_system_prompt())],
-    )
+    # the system prompt and tools never change: keep them in a provider-side cache when possible
+    system_instruction = [types.Part.from_text(text=generate_system_prompt())]
+    tools = [types.Tool(function_declarations=tool_declarations)]
+    cached_prompt = await get_model_client().cached_prompt(model, "coordinator", system_instruction, tools)
+
+    if cached_prompt:
+        generate_content_config = types.GenerateContentConfig(
+            temperature=0.3,
+            thinking_config = types.ThinkingConfig(thinking_budget=-1,),
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+            cached_content=cached_prompt,
+        )
+    else:
+        generate_content_config = types.GenerateContentConfig(
+            temperature=0.3,
+            thinking_config = types.ThinkingConfig(thinking_budget=-1,),
+            tools=tools,
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+            system_instruction=system_instruction,
+        )
 
     _contents = [x for x in conversation_history]
     if input_content:
         _contents.append(input_content)
 
+    metrics.size("llm.coordinator.prompt_chars", sum(len(p.text or "") for c in _contents for p in c.parts or []))
+    if cached_prompt:
+        metrics.count("llm.coordinator.cached_prompt")
+
     try:
-        response = client.models.generate_content(
-                model=model,
-                contents=_contents,
-                config=generate_content_config
-            )
+        with timed("llm.coordinator", messages=len(_contents)):
+            response = await get_model_client().generate_content(
+                    model=model,
+                    contents=_contents,
+                    config=generate_content_config,
+                    priority=PRIORITY_INTERACTIVE,
+                )
     except APIError as e:
         raise
     except Exception as e:
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+from backend.model_interactions.llm_client import get_model_client
+from backend.model_interactions.rate_limiter import PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = os.environ.get("YB_HISTORY_SUMMARY_MODEL", "gemini-flash-lite-latest")
+PAGE_DATA_HEADER = "PAGE DATA IN JSON"
+PAGE_DATA_UNCHANGED = "PAGE DATA unchanged since the previous message"
+PAGE_DATA_OMITTED = "[page data of an earlier message omitted, see the latest PAGE DATA]"
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a user and a web browsing assistant.
+Merge the existing summary and the new conversation excerpt into one updated summary.
+Keep: the user's goals and preferences, results returned by web_interaction calls (prices, names, links, numbers),
+open questions and information the user still has to provide. Drop greetings and repetition.
+Answer with the summary only, at most {max_words} words.
+
+Existing summary:
+{summary}
+
+Conversation excerpt:
+{excerpt}
+"""
+
+
+def estimate_tokens(content: types.Content) -> int:
+    # ~4 characters per token; good enough to keep the budget, no API round-trip
+    chars = 0
+    for part in content.parts or []:
+        if part.text:
+            chars += len(part.text)
+        elif part.function_call:
+            chars += len(part.function_call.name or "") + len(json.dumps(part.function_call.args or {}, default=str))
+        elif part.function_response:
+            chars += len(part.function_response.name or "") + len(json.dumps(part.function_response.response or {}, default=str))
+        else:
+            chars += 1000  # inline data etc.
+    return chars // 4 + 4
+
+
+def _is_user_turn(content: types.Content) -> bool:
+    # a real user message (not a function response) starts a new turn
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def _render(content: types.Content) -> str:
+    lines = []
+    for part in content.parts or []:
+        if part.text:
+            if part.text.startswith("```json") or part.text in (PAGE_DATA_UNCHANGED, PAGE_DATA_OMITTED):
+                continue
+            lines.append(f"{content.role}: {part.text.replace(PAGE_DATA_HEADER, '').strip()}")
+        elif part.function_call:
+            lines.append(f"{content.role} called {part.function_call.name}({json.dumps(part.function_call.args or {}, default=str)})")
+        elif part.function_response:
+            lines.append(f"{part.function_response.name} returned {json.dumps(part.function_response.response or {}, default=str)}")
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """
+    Owns the coordinator conversation and keeps what is sent to the model bounded:
+      * token budget: once the history exceeds `token_budget`, the oldest turns
+        (never the last `keep_recent`) are folded into a rolling summary
+      * page data: only the latest browser-tabs JSON block is kept verbatim,
+        earlier ones are replaced by a placeholder and an identical block is not resent
+    `messages` is the raw history list (CoordinatorState.conversation_history).
+    """
+
+    def __init__(self, messages: Optional[List[types.Content]] = None, token_budget: Optional[int] = None,
+                 keep_recent: Optional[int] = None, summary_words: int = 250):
+        self.messages: List[types.Content] = messages if messages is not None else []
+        self.token_budget = token_budget or int(os.environ.get("YB_HISTORY_TOKEN_BUDGET", "24000"))
+        self.keep_recent = keep_recent or int(os.environ.get("YB_HISTORY_KEEP_RECENT", "6"))
+        self.summary_words = summary_words
+        self.summary: str = ""
+        self.summarized_turns = 0
+        self._page_digest: Optional[str] = None
+        self._page_content: Optional[types.Content] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Resumable part of the history (plain JSON), see backend/states/session_store.py."""
+        return {
+            "summary": self.summary,
+            "summarized_turns": self.summarized_turns,
+            "messages": [c.model_dump(mode="json", exclude_none=True) for c in self.messages],
+        }
+
+    def load_dict(self, data: Dict[str, Any]):
+        self.summary = data.get("summary") or ""
+        self.summarized_turns = data.get("summarized_turns") or 0
+        # in place: the list is shared with CoordinatorState.conversation_history
+        self.messages[:] = [types.Content.model_validate(c) for c in data.get("messages") or []]
+        self._page_digest, self._page_content = None, None
+
+    def add(self, content: types.Content):
+        self.messages.append(content)
+
+    def add_user_message(self, text: str, pages: Optional[List[Dict[str, Any]]] = None) -> types.Content:
+        """Append the user's message with the current browser tabs, deduplicated against the last block sent."""
+        parts = [types.Part.from_text(text=text)]
+        if pages is not None:
+            digest = hashlib.sha1(json.dumps(pages, sort_keys=True, default=str).encode()).hexdigest()
+            if digest == self._page_digest and self._page_content is not None and any(c is self._page_content for c in self.messages):
+                parts.append(types.Part.from_text(text=PAGE_DATA_UNCHANGED))
+            else:
+                self._drop_page_block()
+                parts[0] = types.Part.from_text(text=f"{text}\n\n {PAGE_DATA_HEADER}")
+                parts.append(types.Part.from_text(text=f"```json\n{json.dumps(pages)}\n```"))
+                self._page_digest = digest
+        content = types.Content(role="user", parts=parts)
+        if pages is not None and parts[-1].text.startswith("```json"):
+            self._page_content = content
+        self.messages.append(content)
+        return content
+
+    def _drop_page_block(self):
+        old = self._page_content
+        if old is None:
+            return
+        for i, content in enumerate(self.messages):
+            if content is old:
+                parts = [types.Part.from_text(text=PAGE_DATA_OMITTED) if (p.text or "").startswith("```json") else p
+                         for p in content.parts]
+                self.messages[i] = types.Content(role=content.role, parts=parts)
+                break
+        self._page_content = None
+
+    def tokens(self) -> int:
+        return sum(estimate_tokens(c) for c in self.messages) + len(self.summary) // 4
+
+    async def contents(self) -> List[types.Content]:
+        """History to send to the model: rolling summary first, then the recent turns."""
+        if self.tokens() > self.token_budget:
+            await self.compact()
+        if not self.summary:
+            return list(self.messages)
+        prefix = [
+            types.Content(role="user", parts=[types.Part.from_text(text=f"Summary of the earlier conversation:\n{self.summary}")]),
+            types.Content(role="model", parts=[types.Part.from_text(text="Noted, I will use this summary as context.")]),
+        ]
+        return prefix + list(self.messages)
+
+    async def compact(self):
+        turn_starts = [i for i, c in enumerate(self.messages) if _is_user_turn(c)]
+        if len(turn_starts) <= self.keep_recent:
+            return
+
+        # fold whole turns until the rest fits in half the budget (hysteresis), keep `keep_recent` turns
+        target = self.token_budget // 2
+        total = self.tokens()
+        cut, turns = 0, 0
+        for start, end in zip(turn_starts, turn_starts[1:len(turn_starts) - self.keep_recent + 1]):
+            total -= sum(estimate_tokens(c) for c in self.messages[start:end])
+            cut, turns = end, turns + 1
+            if total <= target:
+                break
+        if cut == 0:
+            return
+
+        folded = self.messages[:cut]
+        excerpt = "\n".join(filter(None, (_render(c) for c in folded)))
+        self.summary = await self._summarize(excerpt)
+        if self._page_content is not None and any(c is self._page_content for c in folded):
+            self._page_content, self._page_digest = None, None
+        del self.messages[:cut]
+        self.summarized_turns += turns
+
+    async def _summarize(self, excerpt: str) -> str:
+        prompt = SUMMARY_PROMPT.format(max_words=self.summary_words, summary=self.summary or "(none)", excerpt=excerpt)
+        try:
+            response = await get_model_client().generate_content(
+                model=SUMMARY_MODEL,
+                contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt)])],
+                config=types.GenerateContentConfig(temperature=0.1),
+                priority=PRIORITY_INTERACTIVE,
+            )
+            if response.text:
+                return response.text.strip()
+        except Exception as e:
+            logger.warning("history summarization failed, keeping a truncated excerpt: %s", e)
+        # the turns are dropped anyway, keep their tail as plain text so the budget still holds
+        budget_chars = self.summary_words * 6
+        return (f"{self.summary}\n{excerpt}" if self.summary else excerpt)[-budget_chars:]
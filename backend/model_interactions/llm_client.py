@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from google import genai
+from google.genai import types
+from google.genai.errors import APIError
+from backend.metrics import metrics, timed
+from backend.model_interactions.rate_limiter import (PrioritySlots, PRIORITY_BACKGROUND, is_retryable,
+                                                     retry_after, backoff_delay)
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHE_ENABLED = os.environ.get("YB_PROMPT_CACHE", "1") == "1"
+PROMPT_CACHE_TTL = int(os.environ.get("YB_PROMPT_CACHE_TTL", "3600"))
+
+
+class ModelClient:
+    """
+    Shared, non-blocking access to the Gemini API.
+    One pooled `genai.Client` is reused by every agent, calls go through the
+    SDK's native async API (`client.aio`) so the event loop keeps serving other
+    websockets and parallel sub-agents while a request is in flight.
+    Every request goes through the rate limiter (backend/model_interactions/rate_limiter.py):
+      * concurrency is capped globally and per model; the per-model cap adapts
+        (halved on 429, grows back on success)
+      * optional requests-per-minute token bucket per model (YB_LLM_RPM, 0 = off)
+      * waiting requests are served by priority, interactive coordinator turns
+        before background sub-agent steps
+      * 429 / 5xx are retried with jittered exponential backoff, honouring the
+        server's retry delay
+    The limits are per process; browser worker processes have their own.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 per_model_concurrency: Optional[Dict[str, int]] = None,
+                 per_model_rpm: Optional[Dict[str, float]] = None, max_retries: Optional[int] = None):
+        self._api_key = api_key or os.environ.get("GENAI_API_KEY")
+        self._client: Optional[genai.Client] = None
+        self.max_concurrency = max_concurrency or int(os.environ.get("YB_LLM_MAX_CONCURRENCY", "8"))
+        self.per_model_concurrency = per_model_concurrency or {}
+        self.rpm = float(os.environ.get("YB_LLM_RPM", "0"))
+        self.per_model_rpm = per_model_rpm or {}
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("YB_LLM_MAX_RETRIES", "4"))
+        self.backoff_base = float(os.environ.get("YB_LLM_BACKOFF_BASE", "1.0"))
+        self.backoff_max = float(os.environ.get("YB_LLM_BACKOFF_MAX", "30"))
+        self._global_slots = PrioritySlots(self.max_concurrency)
+        self._model_slots: Dict[str, PrioritySlots] = {}
+        # (model, key) -> (cached content name or None when caching is not possible, expiry)
+        self._prompt_caches: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+        self._prompt_cache_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            self._client = genai.Client(api_key=self._api_key)
+        return self._client
+
+    def _slots_for(self, model: str) -> PrioritySlots:
+        if model not in self._model_slots:
+            limit = self.per_model_concurrency.get(model, self.max_concurrency)
+            self._model_slots[model] = PrioritySlots(limit, self.per_model_rpm.get(model, self.rpm))
+        return self._model_slots[model]
+
+    @asynccontextmanager
+    async def _slot(self, model: str, priority: int):
+        # model slot first, then the global one: always the same order
+        queued = time.perf_counter()
+        model_slots = self._slots_for(model)
+        await model_slots.acquire(priority)
+        try:
+            await self._global_slots.acquire(priority)
+            try:
+                metrics.timing("llm.queue_wait", (time.perf_counter() - queued) * 1000)
+                yield
+            finally:
+                self._global_slots.release()
+        finally:
+            model_slots.release()
+
+    async def generate_content(self, model: str, contents: Any, config: types.GenerateContentConfig,
+                               priority: int = PRIORITY_BACKGROUND) -> types.GenerateContentResponse:
+        model_slots = self._slots_for(model)
+        for attempt in itertools.count():
+            try:
+                async with self._slot(model, priority):
+                    with timed(f"llm.request.{model}"):
+                        response = await self.client.aio.models.generate_content(
+                            model=model,
+                            contents=contents,
+                            config=config
+                        )
+            except APIError as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    metrics.count(f"llm.errors.{e.code}")
+                    raise
+                hint = retry_after(e)
+                if e.code == 429:
+                    # slow the whole model down, not just this request
+                    model_slots.throttled(hint if hint is not None else self.backoff_base)
+                    metrics.count("llm.throttled")
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, hint)
+                metrics.count("llm.retries")
+                metrics.count(f"llm.retries.{e.code}")
+                logger.info("%s returned %s, retry %d in %.1fs", model, e.code, attempt + 1, delay)
+                with timed("llm.backoff"):
+                    await asyncio.sleep(delay)
+                continue
+            model_slots.succeeded()
+            break
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            metrics.size("llm.prompt_tokens", usage.prompt_token_count or 0)
+            metrics.size("llm.output_tokens", usage.candidates_token_count or 0)
+            if getattr(usage, "cached_content_token_count", None):
+                metrics.size("llm.cached_tokens", usage.cached_content_token_count)
+        return response
+
+    async def cached_prompt(self, model: str, key: str, system_instruction: List[types.Part],
+                            tools: Optional[List[types.Tool]] = None, ttl: Optional[int] = None) -> Optional[str]:
+        """
+        Name of a provider-side cache holding a static system prompt (+ tools), created on first
+        use and renewed before it expires. None when caching is disabled or not possible
+        (e.g. the prompt is below the model's minimum cacheable size); the caller then
+        sends the prompt inline. A failed attempt is not retried before `ttl` passes.
+        """
+        if not PROMPT_CACHE_ENABLED:
+            return None
+        ttl = ttl or PROMPT_CACHE_TTL
+        async with self._prompt_cache_lock:
+            name, expires = self._prompt_caches.get((model, key), (None, 0.0))
+            now = time.monotonic()
+            if now < expires - 60:
+                return name
+            try:
+                cache = await self.client.aio.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=key,
+                        system_instruction=types.Content(role="system", parts=system_instruction),
+                        tools=tools,
+                        ttl=f"{ttl}s",
+                    ),
+                )
+                name = cache.name
+            except Exception as e:
+                logger.info("prompt cache for %s/%s not available, sending the prompt inline: %s", model, key, e)
+                name = None
+            self._prompt_caches[(model, key)] = (name, now + ttl)
+            return name
+
+    def limiter_stats(self) -> Dict[str, Any]:
+        return {"global": self._global_slots.stats(),
+                "models": {model: slots.stats() for model, slots in self._model_slots.items()}}
+
+    async def close(self):
+        if self._client is None:
+            return
+        for name, _ in self._prompt_caches.values():
+            if name:
+                try:
+                    await self._client.aio.caches.delete(name=name)
+                except Exception:
+                    pass
+        self._prompt_caches = {}
+        aclose = getattr(self._client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        self._client = None
+
+
+_model_client: Optional[ModelClient] = None
+
+
+def get_model_client() -> ModelClient:
+    global _model_client
+    if _model_client is None:
+        _model_client = ModelClient()
+    return _model_client
+
+
+async def close_model_client():
+    global _model_client
+    if _model_client is not None:
+        await _model_client.close()
+        _model_client = None
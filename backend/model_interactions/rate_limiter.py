@@ -0,0 +1,143 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from typing import List, Optional, Tuple
+
+from google.genai.errors import APIError
+
+# Lower value is served first: a user waiting on a coordinator turn beats sub-agent steps
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """`rate_per_minute` requests per minute on average, bursts of up to `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1.0, rate_per_minute / 60.0)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class PrioritySlots:
+    """
+    Concurrency slots (optionally rate limited) handed out in priority order,
+    FIFO within a priority. The limit is adaptive: it is halved when the API
+    throttles (429) and grows back by one slot per `limit` successes, never above
+    `max_limit`. After a 429 no new request starts until the cool-down ends.
+    """
+
+    def __init__(self, max_limit: int, rate_per_minute: float = 0, burst: Optional[float] = None):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.active = 0
+        self.bucket = TokenBucket(rate_per_minute, burst) if rate_per_minute > 0 else None
+        self.cooldown_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _blocked_for(self) -> float:
+        # seconds until a request may start if a slot is free, 0 → now
+        delay = self.cooldown_until - time.monotonic()
+        if delay > 0:
+            return delay
+        if self.bucket is not None and not self.bucket.take():
+            return self.bucket.wait_time()
+        return 0.0
+
+    async def acquire(self, priority: int = PRIORITY_BACKGROUND):
+        if not self._waiters and self.active < int(self.limit) and self._blocked_for() == 0:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # granted while being cancelled: hand the slot on
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.active >= int(self.limit):
+                return
+            delay = self._blocked_for()
+            if delay > 0:
+                self._wake_in(delay)
+                return
+            heapq.heappop(self._waiters)
+            self.active += 1
+            future.set_result(None)
+
+    def _wake_in(self, delay: float):
+        if self._timer is not None and not self._timer.cancelled():
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def succeeded(self):
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    def throttled(self, cooldown: float):
+        self.limit = max(1.0, self.limit / 2)
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + cooldown)
+
+    def stats(self):
+        return {"limit": round(self.limit, 2), "max_limit": self.max_limit, "active": self.active, "waiting": self.waiting}
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, APIError) and error.code in RETRYABLE_STATUS
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    # Gemini puts a RetryInfo ("retryDelay": "17s") into the details of a 429
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", str(getattr(error, "details", "") or error))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, hint: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; a server hint is the floor, jitter spreads the retries after it."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if hint is not None:
+        delay = min(cap, hint) + random.uniform(0, base)
+    return delay
@@ -1,9 +1,13 @@
 import json
 import os
 from typing import List, Dict, Any, Optional, Tuple
-from google import genai
 from google.genai import types # Import the types module
 from google.genai.errors import APIError # Import for specific error handling
+from backend.model_interactions.llm_client import get_model_client
+from backend.metrics import metrics, timed
+
+# Batched mode: the model may return several tool calls per turn (e.g. a whole form)
+BATCH_ACTIONS = os.environ.get("YB_BATCH_ACTIONS", "0") == "1"
 
 tool_declarations = [
         {
@@ -28,7 +32,7 @@ tool_declarations = [
                 "properties": {
                     "element_id": {
                         "type": "INTEGER",
-                        "description": "The unique integer ID of the element to be clicked, corresponding to the ID found in the provided element list XML."
+                        "description": "The unique integer ID of the element to be clicked, corresponding to the `id` column of the provided WebElements table."
                     },
                 },
                 "required": ["element_id"],
@@ -42,12 +46,16 @@ tool_declarations = [
                 "properties": {
                     "element_id": {
                         "type": "INTEGER",
-                        "description": "The unique integer ID of the element to be clicked, corresponding to the ID found in the provided element list XML."
+                        "description": "The unique integer ID of the element to be clicked, corresponding to the `id` column of the provided WebElements table."
                     },
                     "text": {
                         "type": "STRING",
                         "description": "The string content to be entered into the element."
                     },
+                    "press_enter": {
+                        "type": "BOOLEAN",
+                        "description": "Press Enter after typing, which usually submits the form or search. Set it to false for a form field that is followed by other fields; defaults to true, except for a `type_text` that is not the last call of a batch."
+                    },
                 },
                 "required": ["element_id", "text"],
             },
@@ -75,7 +83,7 @@ tool_declarations = [
                 "properties": {
                     "element_id": {
                         "type": "INTEGER",
-                        "description": "The unique integer ID of the element to be clicked, corresponding to the ID found in the provided element list XML."
+                        "description": "The unique integer ID of the element to be clicked, corresponding to the `id` column of the provided WebElements table."
                     },
                     "direction": {
                         "type": "STRING",
@@ -100,6 +108,20 @@ tool_declarations = [
                 "required": ["output"],
             },
         },
+        {
+            "name": "more_elements",
+            "description": "Shows more of the page's interactive elements when the WebElements list is partial. Without a query it shows the next page of the ranked list; with a query it lists only the elements whose text, label or attributes contain one of its words.",
+            "parameters": {
+                "type": "OBJECT",
+                "properties": {
+                    "query": {
+                        "type": "STRING",
+                        "description": "optional words to look for, e.g. the label of the button you need."
+                    },
+                },
+                "required": [],
+            },
+        },
         {
             "name": "wait",
             "description": "Wait for page to load. Use this when content is expected to load before the next interaction.",
@@ -111,7 +133,7 @@ tool_declarations = [
         },
         {
             "name": "stuck",
-            "description": "Signals that the automation process is blocked, lost, or the available inputs (screenshot/XML) are insufficient or invalid to continue working toward the goal. This should be used when the model cannot proceed.",
+            "description": "Signals that the automation process is blocked, lost, or the available inputs (screenshot/WebElements) are insufficient or invalid to continue working toward the goal. This should be used when the model cannot proceed.",
             "parameters": {
                 "type": "OBJECT",
                 "properties": {},
@@ -149,20 +171,25 @@ tool_declarations = [
         },
     ]
 
-def generate_system_prompt(goal_statement):
+def generate_system_prompt(goal_statement, batched=False):
+    if batched:
+        action_mandate = """* **Action Mandate:** Select the ordered list of tool calls to perform on the **current** page, one function call per action (e.g. every `type_text` of a form followed by the submit `click`). Only batch actions whose elements are all in the current `WebElements` list; anything after a navigation belongs to the next turn. `done`, `stuck`, `wait_for_input` and `wait_for_action` must be the only call of their turn."""
+    else:
+        action_mandate = """* **Action Mandate:** You **MUST** select exactly one tool call."""
+    selection = "the best sequence of tools" if batched else "the single, best tool"
     return f"""
 ### 1. Persona and Goal (P & T)
 You are an expert **Web Automation Agent** tasked with navigating and interacting with a single web browser tab. 
-Your sole function is to analyze the current state and select the single, best tool to take the next action toward the {goal_statement}.
+Your sole function is to analyze the current state and select {selection} to take the next action toward the {goal_statement}.
 
 ### 2. Context and State (C)
 You are in an iterative agent loop. For every turn, you are provided with:
 1.  **Screenshot:** A visual reference of the current page (if current page exists).
-2.  **WebElements:** A structured list of all interactive elements, containing their unique integer `element_id` (if current page exists).
+2.  **WebElements:** A compact table of the interactive elements most relevant to the goal, one per line; the `id` column is the unique integer `element_id` (if current page exists). On large pages a header line says how many elements are left out; use `more_elements` when the element you need is not listed.
 3.  **History:** A summary of past actions taken.
 
 ### 3. Constraints and Logic
-* **Action Mandate:** You **MUST** select exactly one tool call.
+{action_mandate}
 * **Summary Mandate:** You **MUST** provide a concise natural language action_summary (2-10 words) describing the action taken before the function call.
 * **Element IDs:** All `click`, `type_text`, and `scroll_element` calls **MUST** use a valid `element_id` from the provided `WebElements` list.
 * **Goal Completion:**
@@ -171,8 +198,7 @@ You are in an iterative agent loop. For every turn, you are provided with:
 * **Navigation:** Use `scroll_page` if the target element is likely off-screen. Use `back` only if the goal requires returning to a previous page state.
 """
 
-def call_gemini(goal_statement: str, history: list[str] = [], image_bytes: bytes = None, xml_data: str = "") -> Tuple[str, List[Dict[str, Any]]]:
-    client = genai.Client(api_key=os.environ.get("GENAI_API_KEY"))
+async def call_gemini(goal_statement: str, history: list[str] = [], screenshot: Any = None, elements_data: str = "", batched: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
     model = "gemini-flash-lite-latest" 
 
     generate_content_config = types.GenerateContentConfig(
@@ -180,7 +206,7 @@ def call_gemini(goal_statement: str, history: list[str] = [], image_bytes: bytes
         thinking_config = types.ThinkingConfig(thinking_budget=-1,),
         tools=[types.Tool(function_declarations=tool_declarations)],
         automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
-        system_instruction=[types.Part.from_text(text=generate_system_prompt(goal_statement))],
+        system_instruction=[types.Part.from_text(text=generate_system_prompt(goal_statement, batched=batched))],
     )
 
     user_parts = []
@@ -188,23 +214,35 @@ def call_gemini(goal_statement: str, history: list[str] = [], image_bytes: bytes
         user_parts.append(types.Part.from_text(text="PAST ACTIONS:\n"+"\n".join(history)))
     else:
         user_parts.append(types.Part.from_text(text="No history, start of action."))
-    if image_bytes:
-        user_parts.append(types.Part.from_bytes(data=image_bytes, mime_type='image/png'))
-    if xml_data:
-        user_parts.append(types.Part.from_text(text="XML Data:\n"+xml_data))
+    if screenshot is not None:
+        if screenshot.unchanged:
+            user_parts.append(types.Part.from_text(text="Screenshot: page is visually unchanged since the previous step."))
+        if screenshot.clip:
+            user_parts.append(types.Part.from_text(text=f"Screenshot is cropped to the region x={screenshot.clip['x']}, y={screenshot.clip['y']} of the viewport."))
+        if not screenshot.skip_upload:
+            user_parts.append(types.Part.from_bytes(data=screenshot.data, mime_type=screenshot.mime_type))
+    if elements_data:
+        user_parts.append(types.Part.from_text(text="WebElements:\n"+elements_data))
 
     contents = [types.Content(role="user", parts=user_parts)]
+    metrics.size("llm.web_automation.prompt_chars", sum(len(p.text or "") for p in user_parts))
+    if screenshot is not None and not screenshot.skip_upload:
+        metrics.size("llm.web_automation.image_bytes", len(screenshot.data))
 
     try:
-        response = client.models.generate_content(
-                model=model,
-                contents=contents,
-                config=generate_content_config
-            )
+        with timed("llm.web_automation", batched=batched):
+            response = await get_model_client().generate_content(
+                    model=model,
+                    contents=contents,
+                    config=generate_content_config
+                )
     except APIError as e:
-        raise
-    except Exception as e:
-        raise
+        # retries are exhausted (see ModelClient.generate_content): end this sub-agent as stuck
+        # instead of failing the coordinator turn and every sibling goal with it
+        return types.Content(role="model", parts=[
+            types.Part.from_text(text=f"Model unavailable ({e.code}), stopping"),
+            types.Part.from_function_call(name="stuck", args={}),
+        ])
     try:
         return response.candidates[0].content
     except Exception as e:
@@ -2,10 +2,17 @@ from typing import List, Dict, Any, TypedDict, Optional, Literal
 
 class CoordinatorState(TypedDict):
     ws: Any = None
+    progress: Any = None   # ProgressChannel of the session's websocket
+    scheduler: Any = None  # SessionScheduler running this session's turns
+    control: Any = None    # RunControl of the session's scheduler
     browser_manager: Any = None
+    session_id: Any = None
+    worker_pool: Any = None
     conversation_history: List[Any] = []
+    history: Any = None   # HistoryManager over conversation_history
     last_user_message: str = None
     model_response: Any = None
     tool_call: bool = False
     subgraph_states: List[Any] = []
+    goal_ids: List[str] = []
     url: str = ""
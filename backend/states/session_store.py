@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteSpill:
+    """
+    Durable copy of evicted / finished sessions: only what is needed to resume the
+    conversation (history + rolling summary), never sockets, pages or screenshots.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sessions (uid TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)")
+        self._conn.commit()
+        self._lock = asyncio.Lock()
+
+    def _save(self, uid: str, data: Dict[str, Any]):
+        self._conn.execute("INSERT OR REPLACE INTO sessions (uid, data, updated) VALUES (?, ?, ?)",
+                           (uid, json.dumps(data), time.time()))
+        self._conn.commit()
+
+    def _load(self, uid: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT data FROM sessions WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _purge(self, older_than: float):
+        self._conn.execute("DELETE FROM sessions WHERE updated < ?", (older_than,))
+        self._conn.commit()
+
+    async def save(self, uid: str, data: Dict[str, Any]):
+        async with self._lock:
+            await asyncio.to_thread(self._save, uid, data)
+
+    async def load(self, uid: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            return await asyncio.to_thread(self._load, uid)
+
+    async def purge(self, older_than: float):
+        async with self._lock:
+            await asyncio.to_thread(self._purge, older_than)
+
+    def close(self):
+        self._conn.close()
+
+
+class SessionStore:
+    """
+    In-memory sessions (CoordinatorState per websocket uid) with LRU + idle TTL
+    eviction. Busy sessions (a turn is running) are never evicted, and sessions
+    whose client is still connected do not expire. With a spill
+    path, sessions are written to SQLite after every turn and on eviction, and a
+    session that is not in memory is restored from there (also after a restart).
+
+    `create(uid)` builds a fresh session, `dump(state)` / `restore(state, data)`
+    convert the resumable part, `is_busy(state)`, `is_connected(state)` and
+    `on_evict(uid, state)` let the app keep running turns and open sockets alive
+    and release browser resources.
+    """
+
+    def __init__(self, create: Callable[[str], Dict[str, Any]],
+                 dump: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 restore: Callable[[Dict[str, Any], Dict[str, Any]], None],
+                 is_busy: Callable[[Dict[str, Any]], bool],
+                 on_evict: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+                 is_connected: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 max_sessions: Optional[int] = None, ttl: Optional[float] = None,
+                 spill_path: Optional[str] = None):
+        self._create = create
+        self._dump = dump
+        self._restore = restore
+        self._is_busy = is_busy
+        self._on_evict = on_evict
+        self._is_connected = is_connected
+        self.max_sessions = max_sessions or int(os.environ.get("YB_SESSION_MAX", "500"))
+        self.ttl = ttl or float(os.environ.get("YB_SESSION_TTL", "3600"))
+        spill_path = spill_path if spill_path is not None else os.environ.get("YB_SESSION_DB", "")
+        self.spill = SqliteSpill(spill_path) if spill_path else None
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._evict_task: Optional[asyncio.Task] = None
+        self._create_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._sessions
+
+    async def start(self):
+        self._evict_task = asyncio.create_task(self._evict_loop())
+
+    async def stop(self):
+        if self._evict_task:
+            self._evict_task.cancel()
+        for uid in list(self._sessions):
+            await self.evict(uid, force=True)
+        if self.spill:
+            self.spill.close()
+
+    async def get(self, uid: str) -> Dict[str, Any]:
+        """Session of `uid`: from memory, else resumed from disk, else new."""
+        state = self._sessions.get(uid)
+        if state is None:
+            async with self._create_lock:
+                state = self._sessions.get(uid)
+                if state is None:
+                    state = self._create(uid)
+                    if self.spill:
+                        data = await self.spill.load(uid)
+                        if data:
+                            self._restore(state, data)
+                    self._sessions[uid] = state
+            await self._enforce_size()
+        self._sessions.move_to_end(uid)
+        self._last_used[uid] = time.monotonic()
+        return state
+
+    async def save(self, uid: str):
+        """Persist the resumable part of a session (called after each turn)."""
+        state = self._sessions.get(uid)
+        if state is not None and self.spill:
+            try:
+                await self.spill.save(uid, self._dump(state))
+            except Exception as e:
+                logger.warning("could not persist session %s: %s", uid, e)
+
+    async def evict(self, uid: str, force: bool = False) -> bool:
+        state = self._sessions.get(uid)
+        if state is None or (not force and self._is_busy(state)):
+            return False
+        await self.save(uid)
+        self._sessions.pop(uid, None)
+        self._last_used.pop(uid, None)
+        if self._on_evict is not None:
+            try:
+                await self._on_evict(uid, state)
+            except Exception as e:
+                logger.warning("releasing session %s failed: %s", uid, e)
+        return True
+
+    async def _enforce_size(self):
+        # least recently used first, skipping sessions that are mid-turn
+        for uid in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            await self.evict(uid)
+
+    async def _evict_loop(self):
+        interval = max(5.0, min(60.0, self.ttl / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._expire()
+            except Exception:
+                # keep the loop alive, the next round tries again
+                logger.exception("session eviction failed")
+
+    async def _expire(self):
+        now = time.monotonic()
+        for uid in [uid for uid, used in self._last_used.items() if now - used > self.ttl]:
+            state = self._sessions.get(uid)
+            if state is not None and self._is_connected is not None and self._is_connected(state):
+                # an open socket without messages is an idle user, not an abandoned session
+                self._last_used[uid] = now
+                continue
+            await self.evict(uid)
+        if self.spill:
+            # disk copies live longer than memory, but not forever
+            await self.spill.purge(time.time() - self.ttl * 24)
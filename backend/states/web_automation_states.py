@@ -6,7 +6,23 @@ class WebAutomationState(TypedDict):
     page: Any = None
     last_screenshot: Any = None
     last_elements: Any = None
+    element_cache: Any = None
     action: Any = None
     action_args: Dict[str, Any] = {}
     action_history: List[Any] = []
+    action_summary: Optional[str] = None
+    pending_actions: List[Any] = []   # further tool calls of a batched model turn
+    # page / search through the ranked element list (see backend/browser/ranking.py)
+    element_page: int = 0
+    element_query: Optional[str] = None
+    # trajectory cache / replay (see backend/agents/trajectory_cache.py)
+    trajectory: List[Dict[str, Any]] = []
+    replay: Optional[Dict[str, Any]] = None
+    replay_domain: str = ""
+    replayed_from: Any = None
+    # streaming progress (see backend/agents/progress.py)
+    goal_id: Optional[str] = None
+    step: int = 0
+    progress: Any = None   # callable(event) or None
+    control: Any = None    # RunControl of the session (pause between steps)
     
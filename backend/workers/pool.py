@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.workers.worker import worker_main
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class _WorkerHandle:
+    def __init__(self, worker_id: int, process, conn):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.inflight = 0
+        self.ready = asyncio.Event()
+
+
+class WorkerPool:
+    """
+    Coordinator-side view of a set of browser worker processes
+    (see backend/workers/worker.py). Goals are dispatched over a Pipe per worker:
+      * goals on an existing page go to the worker that owns the page (page affinity)
+      * new goals go to the worker with the fewest goals in flight (least loaded)
+    """
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or int(os.environ.get("YB_BROWSER_WORKERS", "0")) or os.cpu_count() or 1
+        self._workers: List[_WorkerHandle] = []
+        self._pending: Dict[int, Tuple[int, asyncio.Future]] = {}
+        # request id → callback for the progress events a worker streams while serving it
+        self._listeners: Dict[int, Callable[[Dict[str, Any]], None]] = {}
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # session_id → page_id list in the order last shown to the model, resolves `page_index`
+        self._page_order: Dict[Any, List[str]] = {}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        ctx = multiprocessing.get_context("spawn")
+        for worker_id in range(self.size):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=worker_main, args=(worker_id, child_conn), daemon=True,
+                                  name=f"yb-browser-worker-{worker_id}")
+            process.start()
+            handle = _WorkerHandle(worker_id, process, parent_conn)
+            self._workers.append(handle)
+            threading.Thread(target=self._reader, args=(handle,), daemon=True).start()
+        await asyncio.gather(*(handle.ready.wait() for handle in self._workers))
+
+    async def stop(self):
+        for handle in self._workers:
+            try:
+                with handle.send_lock:
+                    handle.conn.send({"op": "shutdown"})
+            except Exception:
+                pass
+        for handle in self._workers:
+            await asyncio.to_thread(handle.process.join, 10)
+            if handle.process.is_alive():
+                handle.process.terminate()
+        self._workers = []
+
+    # ---- IPC ----
+    def _reader(self, handle: _WorkerHandle):
+        while True:
+            try:
+                message = handle.conn.recv()
+            except (EOFError, OSError):
+                self._loop.call_soon_threadsafe(self._worker_lost, handle)
+                return
+            self._loop.call_soon_threadsafe(self._dispatch_reply, handle, message)
+
+    def _dispatch_reply(self, handle: _WorkerHandle, message: Dict[str, Any]):
+        if message.get("op") == "ready":
+            handle.ready.set()
+            return
+        if message.get("op") == "event":
+            listener = self._listeners.get(message.get("request_id"))
+            if listener is not None:
+                listener(message["event"])
+            return
+        _, future = self._pending.pop(message.get("id"), (None, None))
+        if future is None or future.done():
+            return
+        if message.get("ok"):
+            future.set_result(message.get("result"))
+        else:
+            future.set_exception(WorkerError(f"worker {handle.worker_id}: {message.get('error')}"))
+
+    def _worker_lost(self, handle: _WorkerHandle):
+        handle.ready.set()
+        for request_id, (worker_id, future) in list(self._pending.items()):
+            if worker_id == handle.worker_id:
+                self._pending.pop(request_id, None)
+                if not future.done():
+                    future.set_exception(WorkerError(f"worker {handle.worker_id} exited"))
+
+    async def _request(self, handle: _WorkerHandle, message: Dict[str, Any],
+                       listener: Optional[Callable[[Dict[str, Any]], None]] = None) -> Any:
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = (handle.worker_id, future)
+        if listener is not None:
+            self._listeners[request_id] = listener
+        try:
+            with handle.send_lock:
+                handle.conn.send(dict(message, id=request_id))
+            return await future
+        except asyncio.CancelledError:
+            # stop the work in the worker too, so its browser / LLM capacity is freed
+            self._pending.pop(request_id, None)
+            try:
+                with handle.send_lock:
+                    handle.conn.send({"op": "cancel", "target": request_id, "id": next(self._ids)})
+            except Exception:
+                pass
+            raise
+        finally:
+            self._listeners.pop(request_id, None)
+
+    # ---- Scheduling ----
+    def _pick_worker(self, page_id: Optional[str] = None) -> _WorkerHandle:
+        alive = [handle for handle in self._workers if handle.process.is_alive()]
+        if not alive:
+            raise WorkerError("no browser worker available")
+        if page_id is not None:
+            owner = int(str(page_id).split(":", 1)[0])
+            for handle in alive:
+                if handle.worker_id == owner:
+                    return handle
+        return min(alive, key=lambda handle: handle.inflight)
+
+    def resolve_page_index(self, session_id: Any, page_index: int) -> Optional[str]:
+        order = self._page_order.get(session_id) or []
+        if 0 <= page_index < len(order):
+            return order[page_index]
+        return None
+
+    async def run_goal(self, session_id: Any, goal_statement: str, page_id: Optional[str] = None,
+                       recursion_limit: int = 80, goal_id: Optional[str] = None,
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        handle = self._pick_worker(page_id)
+        handle.inflight += 1
+        try:
+            return await self._request(handle, {
+                "op": "run_goal", "session_id": session_id, "goal_statement": goal_statement,
+                "page_id": page_id, "recursion_limit": recursion_limit, "goal_id": goal_id,
+            }, listener=progress)
+        finally:
+            handle.inflight -= 1
+
+    async def get_page_summaries(self, session_id: Any) -> List[Dict[str, Any]]:
+        results = await asyncio.gather(*(
+            self._request(handle, {"op": "page_summaries", "session_id": session_id})
+            for handle in self._workers if handle.process.is_alive()
+        ))
+        summaries = [summary for worker_summaries in results for summary in worker_summaries]
+        self._page_order[session_id] = [summary["page_id"] for summary in summaries]
+        return summaries
+
+    async def metrics(self) -> List[Dict[str, Any]]:
+        """Metrics snapshot of every live worker process."""
+        alive = [handle for handle in self._workers if handle.process.is_alive()]
+        results = await asyncio.gather(*(self._request(handle, {"op": "metrics"}) for handle in alive),
+                                       return_exceptions=True)
+        return [dict(result, worker_id=handle.worker_id) for handle, result in zip(alive, results)
+                if isinstance(result, dict)]
+
+    async def set_paused(self, session_id: Any, paused: bool):
+        """Hold (or release) the session's goals between steps in every worker."""
+        await asyncio.gather(*(
+            self._request(handle, {"op": "pause" if paused else "resume", "session_id": session_id})
+            for handle in self._workers if handle.process.is_alive()
+        ), return_exceptions=True)
+
+    async def set_pinned(self, session_id: Any, pinned: bool):
+        """Keep (or stop keeping) the session's browser context while its client is connected."""
+        await asyncio.gather(*(
+            self._request(handle, {"op": "pin", "session_id": session_id, "pinned": pinned})
+            for handle in self._workers if handle.process.is_alive()
+        ), return_exceptions=True)
+
+    async def close_session(self, session_id: Any):
+        self._page_order.pop(session_id, None)
+        await asyncio.gather(*(
+            self._request(handle, {"op": "close_session", "session_id": session_id})
+            for handle in self._workers if handle.process.is_alive()
+        ), return_exceptions=True)
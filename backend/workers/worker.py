@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional
+
+from playwright.async_api import Page
+from backend.browser.manager import BrowserManager
+from backend.states.web_automation_states import WebAutomationState
+from backend.agents.web_automation_agent import web_automation_agent_graph
+from backend.agents.progress import report_progress
+from backend.agents.scheduler import RunControl
+from backend.model_interactions.llm_client import get_model_client
+from backend.metrics import metrics, goal_trace
+
+
+class BrowserWorker:
+    """
+    Runs inside a worker process: owns one Chromium (through BrowserManager) and
+    executes web automation goals sent by the coordinator process over a Pipe.
+    Pages are addressed across processes by `page_id` ("<worker_id>:<n>").
+    """
+
+    def __init__(self, worker_id: int, conn):
+        self.worker_id = worker_id
+        self._conn = conn
+        self._send_lock = threading.Lock()
+        self.browser_manager = BrowserManager()
+        self._pages: Dict[str, Page] = {}
+        self._page_ids: Dict[Page, str] = {}
+        self._counter = itertools.count(1)
+        # request id → task serving it (for cancel), session id → pause control
+        self._running: Dict[int, asyncio.Task] = {}
+        self._controls: Dict[Any, RunControl] = {}
+
+    def _page_id(self, page: Page) -> str:
+        if page not in self._page_ids:
+            page_id = f"{self.worker_id}:{next(self._counter)}"
+            self._page_ids[page] = page_id
+            self._pages[page_id] = page
+            page.on("close", lambda _page: self._forget(page_id))
+        return self._page_ids[page]
+
+    def _forget(self, page_id: str):
+        page = self._pages.pop(page_id, None)
+        if page is not None:
+            self._page_ids.pop(page, None)
+
+    def _send(self, message: Dict[str, Any]):
+        with self._send_lock:
+            self._conn.send(message)
+
+    async def run_goal(self, session_id: Any, goal_statement: str, page_id: Optional[str] = None,
+                       recursion_limit: int = 80, request_id: Optional[int] = None,
+                       goal_id: Optional[str] = None) -> Dict[str, Any]:
+        context = await self.browser_manager.context_for(session_id)
+        page = self._pages.get(page_id) if page_id else None
+        opened = page is None
+        if opened:
+            page = await context.new_page()
+
+        _state = WebAutomationState()
+        _state["browser_manager"] = self.browser_manager
+        _state["goal_statement"] = goal_statement
+        _state["page"] = page
+        _state["action_history"] = []
+        _state["action"] = None
+        _state["goal_id"] = goal_id
+        _state["control"] = self._controls.setdefault(session_id, RunControl())
+        if request_id is not None:
+            # progress events travel back over the pipe, tagged with the request they belong to
+            _state["progress"] = lambda event: self._send({"op": "event", "request_id": request_id, "event": event})
+
+        started = time.monotonic()
+        try:
+            async with self.browser_manager.contexts.lease(session_id):
+                with goal_trace(goal_id, goal_statement):
+                    result = await web_automation_agent_graph.ainvoke(_state, {"recursion_limit": recursion_limit})
+        except BaseException:
+            # failed, timed out or cancelled: the coordinator never learns this tab's page_id, don't leave it open
+            if opened:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            raise
+        report_progress(result, "finished", started, status=result.get("action"))
+
+        # only plain data goes back over the pipe
+        return {
+            "goal_statement": goal_statement,
+            "action": result.get("action"),
+            "action_args": dict(result.get("action_args") or {}),
+            "action_history": list(result.get("action_history") or []),
+            "page_id": self._page_id(page),
+            "url": page.url,
+        }
+
+    async def page_summaries(self, session_id: Any) -> list:
+        # only report tabs this worker actually holds for the session
+        context = self.browser_manager.contexts.peek(session_id)
+        if context is None:
+            return []
+        summaries = await self.browser_manager.get_page_summaries(context)
+        for _page, summary in zip(context.pages, summaries):
+            summary["page_id"] = self._page_id(_page)
+        return summaries
+
+    async def close_session(self, session_id: Any):
+        self._controls.pop(session_id, None)
+        await self.browser_manager.contexts.release(session_id)
+
+    async def _handle(self, message: Dict[str, Any]):
+        op = message.get("op")
+        try:
+            if op == "run_goal":
+                result = await self.run_goal(message["session_id"], message["goal_statement"],
+                                             message.get("page_id"), message.get("recursion_limit", 80),
+                                             request_id=message["id"], goal_id=message.get("goal_id"))
+            elif op == "page_summaries":
+                result = await self.page_summaries(message["session_id"])
+            elif op == "close_session":
+                result = await self.close_session(message["session_id"])
+            elif op == "metrics":
+                result = metrics.snapshot()
+                result["llm_limiter"] = get_model_client().limiter_stats()
+            elif op == "cancel":
+                task = self._running.get(message["target"])
+                result = task is not None and task.cancel()
+            elif op == "pin":
+                self.browser_manager.contexts.pin(message["session_id"], message["pinned"])
+                result = True
+            elif op in ("pause", "resume"):
+                control = self._controls.setdefault(message["session_id"], RunControl())
+                control.pause() if op == "pause" else control.resume()
+                result = True
+            else:
+                raise ValueError(f"unknown op '{op}'")
+            self._send({"id": message["id"], "ok": True, "result": result})
+        except Exception as e:
+            self._send({"id": message["id"], "ok": False, "error": f"{type(e).__name__}: {e}",
+                        "traceback": traceback.format_exc()})
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        inbox: asyncio.Queue = asyncio.Queue()
+
+        # Pipe.recv blocks, read it on a thread and hand messages to the loop
+        def _reader():
+            while True:
+                try:
+                    message = self._conn.recv()
+                except (EOFError, OSError):
+                    message = {"op": "shutdown"}
+                loop.call_soon_threadsafe(inbox.put_nowait, message)
+                if message.get("op") == "shutdown":
+                    break
+
+        threading.Thread(target=_reader, daemon=True).start()
+
+        await self.browser_manager.start()
+        self._send({"op": "ready", "worker_id": self.worker_id})
+        tasks = set()
+        try:
+            while True:
+                message = await inbox.get()
+                if message.get("op") == "shutdown":
+                    break
+                task = asyncio.create_task(self._handle(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self._running[message["id"]] = task
+                task.add_done_callback(lambda _task, request_id=message["id"]: self._running.pop(request_id, None))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.browser_manager.stop()
+
+
+def worker_main(worker_id: int, conn):
+    """Entry point of a worker process."""
+    asyncio.run(BrowserWorker(worker_id, conn).serve())
@@ -0,0 +1,315 @@
+# python -m benchmarks.agent_benchmark --scenarios form,spa,infinite,catalog --repeats 3
+#
+# End-to-end runs of web_automation_agent_graph against the local fixture sites in
+# benchmarks/fixtures/sites, headless (--profile), with a scripted stand-in for call_gemini:
+# each scenario is a fixed list of tool calls whose targets are looked up in the
+# element table the agent would send to the model, so runs are deterministic and
+# need neither an API key nor network access.
+# Reports end-to-end and per-step latency, the time spent in each phase (settle,
+# markPage, screenshot, action), snapshot sizes and memory. --json writes the
+# results, --baseline compares against such a file and exits non-zero on a regression.
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import re
+import resource
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+
+import backend.agents.web_automation_agent as web_agent
+from backend.agents.trajectory_cache import TrajectoryCache, split_goal
+from backend.browser.manager import BrowserManager
+from backend.metrics import metrics, timed
+
+SITES_PATH = Path(__file__).parent / "fixtures" / "sites"
+
+# metrics reported per scenario: (label, metric name)
+PHASES = [
+    ("step", "node.web.take_snapshot"),
+    ("settle", "browser.settle"),
+    ("markPage", "browser.extract"),
+    ("screenshot", "browser.screenshot"),
+    ("model", "llm.scripted"),
+    ("action", "node.web.execute_action"),
+]
+
+
+@dataclass
+class Step:
+    tool: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    target: Optional[str] = None   # text / label / placeholder of the element to act on
+    until: Optional[str] = None    # repeat the step until an element with this text is listed
+    max_repeats: int = 15
+
+
+@dataclass
+class Scenario:
+    path: str
+    goal: str
+    steps: List[Step]
+    check: str   # JS expression that is true once the goal was reached
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "form": Scenario(
+        "form.html", "Create an account for Ada Lovelace",
+        # Enter in a field submits the form, like on any real site
+        [Step("type_text", {"text": "Ada Lovelace", "press_enter": False}, target="Full name"),
+         Step("type_text", {"text": "ada@example.com", "press_enter": False}, target="Email"),
+         Step("type_text", {"text": "London", "press_enter": False}, target="City"),
+         Step("click", target="Create account")],
+        "document.body.innerText.includes('Thanks, Ada Lovelace')"),
+    "spa": Scenario(
+        "spa.html", "Open the details of item 42",
+        [Step("click", target="Products"),
+         Step("click", target="Item 42")],
+        "!!document.getElementById('detail') && document.getElementById('detail').textContent.includes('Item 42')"),
+    "infinite": Scenario(
+        "infinite.html", "Open post 60 of the feed",
+        [Step("scroll_page", {"direction": "down"}, until="Post 60"),
+         Step("click", target="Post 60")],
+        "document.getElementById('opened').textContent === 'Opened post 60'"),
+    "catalog": Scenario(
+        "catalog.html?items=5000", "Find camera model 2 in the catalog",
+        [Step("type_text", {"text": "camera"}, target="Search products"),
+         Step("click", target="camera model 2")],
+        "location.hash === '#p2'"),
+}
+
+
+def parse_elements(elements_data: str) -> List[Dict[str, str]]:
+    """Rows of the serialized element table (tsv or jsonl, see backend/browser/snapshot.py)."""
+    # "#" lines are the ranking header of backend/browser/ranking.py
+    lines = [line for line in elements_data.splitlines() if line and not line.startswith("#")]
+    if not lines:
+        return []
+    if lines[0].startswith("id\t"):
+        header = lines[0].split("\t")
+        return [dict(zip(header, line.split("\t"))) for line in lines[1:]]
+    rows = []
+    for line in lines:
+        row = json.loads(line)
+        attrs = row.pop("attrs", {}) or {}
+        row["attrs"] = ";".join(f"{k}={v}" for k, v in attrs.items())
+        rows.append({k: str(v) for k, v in row.items()})
+    return rows
+
+
+def find_element(rows: List[Dict[str, str]], target: str) -> Optional[Dict[str, str]]:
+    # exact text wins over a whole-word match in text / aria label / attributes (placeholder)
+    wanted = target.lower()
+    pattern = re.compile(r"(?<!\w)" + re.escape(wanted) + r"(?!\w)")
+    partial = None
+    for row in rows:
+        if row.get("text", "").lower() == wanted or row.get("aria", "").lower() == wanted:
+            return row
+        haystack = " ".join((row.get("text", ""), row.get("aria", ""), row.get("attrs", ""))).lower()
+        if partial is None and pattern.search(haystack):
+            partial = row
+    return partial
+
+
+class ScriptedModel:
+    """Drop-in for web_automation_model.call_gemini that plays back a scenario."""
+
+    def __init__(self, scenario: Scenario, latency: float = 0.0):
+        self.steps = scenario.steps
+        self.latency = latency
+        self.position = -1   # -1: open the website first
+        self.repeats = 0
+        self.snapshot_chars: List[int] = []
+        self.failure: Optional[str] = None
+
+    async def __call__(self, goal_statement: str, history: list = [], screenshot: Any = None,
+                       elements_data: str = "", batched: bool = False) -> types.Content:
+        with timed("llm.scripted"):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self.snapshot_chars.append(len(elements_data))
+            name, args, text = self._next(goal_statement, parse_elements(elements_data))
+        return types.Content(role="model", parts=[types.Part.from_text(text=text),
+                                                  types.Part.from_function_call(name=name, args=args)])
+
+    def _next(self, goal_statement: str, rows: List[Dict[str, str]]):
+        if self.position < 0:
+            self.position = 0
+            _, url = split_goal(goal_statement)
+            return "goto", {"url": url}, f"Opening {url}"
+        while self.position < len(self.steps):
+            step = self.steps[self.position]
+            if step.until is not None:
+                if find_element(rows, step.until) is not None or self.repeats >= step.max_repeats:
+                    self.position, self.repeats = self.position + 1, 0
+                    continue
+                self.repeats += 1
+                return step.tool, dict(step.args), f"{step.tool} until '{step.until}' is listed"
+            self.position += 1
+            args = dict(step.args)
+            if step.target is not None:
+                row = find_element(rows, step.target)
+                if row is None:
+                    self.failure = f"no element matching '{step.target}' ({len(rows)} elements listed)"
+                    return "stuck", {}, self.failure
+                args["element_id"] = int(row["id"])
+            return step.tool, args, f"{step.tool} {step.target or ''}".strip()
+        return "done", {"output": "scenario finished"}, "Goal reached"
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_sites() -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(_QuietHandler, directory=str(SITES_PATH))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+async def run_once(manager: BrowserManager, base_url: str, scenario: Scenario, latency: float) -> Dict[str, Any]:
+    model = ScriptedModel(scenario, latency)
+    web_agent.call_gemini = model
+    context = await manager.context_for("benchmark")
+    page = await context.new_page()
+    state = {"browser_manager": manager, "goal_statement": f"{scenario.goal} WEBSITE - {base_url}/{scenario.path}",
+             "page": page, "action_history": [], "action": None}
+    started = time.perf_counter()
+    result = await web_agent.web_automation_agent_graph.ainvoke(state, {"recursion_limit": 200})
+    elapsed = (time.perf_counter() - started) * 1000
+    try:
+        await page.wait_for_function(scenario.check, timeout=3000)
+        ok = True
+    except Exception:
+        ok = False
+    js_heap = await page.evaluate("performance.memory ? performance.memory.usedJSHeapSize : null")
+    await page.close()
+    return {"ms": elapsed, "steps": result.get("step", 0), "ok": ok and result.get("action") == "done",
+            "failure": model.failure, "snapshot_chars": model.snapshot_chars,
+            "js_heap_mb": js_heap / 2**20 if js_heap else None}
+
+
+async def run(names: List[str], repeats: int, latency: float, replay: bool, profile: str,
+              pipeline: bool = False) -> Dict[str, Any]:
+    server = serve_sites()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    manager = BrowserManager(launch_profile=profile, pipeline=pipeline)
+    await manager.start()
+    original_model, original_cache = web_agent.call_gemini, web_agent.trajectory_cache
+    results = {}
+    try:
+        for name in names:
+            scenario = SCENARIOS[name]
+            metrics.reset()
+            web_agent.trajectory_cache = TrajectoryCache()
+            runs = []
+            for _ in range(repeats):
+                if not replay:
+                    # every repeat asks the (scripted) model; --replay measures the trajectory cache path instead
+                    web_agent.trajectory_cache = TrajectoryCache()
+                runs.append(await run_once(manager, base_url, scenario, latency))
+            results[name] = summarize(runs, metrics.snapshot())
+    finally:
+        web_agent.call_gemini, web_agent.trajectory_cache = original_model, original_cache
+        await manager.stop()
+        server.shutdown()
+    return results
+
+
+def summarize(runs: List[Dict[str, Any]], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    timings, sizes = snapshot["timings_ms"], snapshot["sizes"]
+    chars = [c for run in runs for c in run["snapshot_chars"]]
+    heaps = [run["js_heap_mb"] for run in runs if run["js_heap_mb"] is not None]
+    steps = [run["steps"] for run in runs]
+    return {
+        "ok": sum(run["ok"] for run in runs),
+        "runs": len(runs),
+        "failures": sorted({run["failure"] for run in runs if run["failure"]}),
+        "e2e_ms": round(statistics.median(run["ms"] for run in runs), 1),
+        "steps": round(statistics.mean(steps), 1),
+        "step_ms": round(statistics.median(run["ms"] / max(1, run["steps"]) for run in runs), 1),
+        "phases_ms": {label: {k: timings[metric][k] for k in ("mean", "p95")}
+                      for label, metric in PHASES if metric in timings},
+        "elements": sizes.get("browser.snapshot.elements", {}).get("mean", 0),
+        "changed_elements": sizes.get("browser.extract.changed_elements", {}).get("mean", 0),
+        "snapshot_chars": round(statistics.mean(chars)) if chars else 0,
+        "screenshot_kb": round(sizes.get("browser.screenshot.bytes", {}).get("mean", 0) / 1024, 1),
+        "js_heap_mb": round(max(heaps), 1) if heaps else None,
+        "rss_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def report(results: Dict[str, Any]):
+    print(f"{'scenario':<10} {'ok':>5} {'steps':>6} {'e2e ms':>9} {'ms/step':>8} {'elements':>9} "
+          f"{'changed':>8} {'chars':>8} {'shot KB':>8} {'heap MB':>8} {'rss MB':>7}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['ok']:>2}/{r['runs']:<2} {r['steps']:>6} {r['e2e_ms']:>9} {r['step_ms']:>8} "
+              f"{r['elements']:>9} {r['changed_elements']:>8} {r['snapshot_chars']:>8} {r['screenshot_kb']:>8} "
+              f"{r['js_heap_mb'] if r['js_heap_mb'] is not None else '-':>8} {r['rss_mb']:>7}")
+    print()
+    print(f"{'scenario':<10} " + " ".join(f"{label + ' ms':>17}" for label, _ in PHASES) + "   (mean / p95)")
+    for name, r in results.items():
+        cells = []
+        for label, _ in PHASES:
+            phase = r["phases_ms"].get(label)
+            cells.append(f"{phase['mean']:>8.1f}/{phase['p95']:<8.1f}" if phase else f"{'-':>17}")
+        print(f"{name:<10} " + " ".join(cells))
+    for name, r in results.items():
+        for failure in r["failures"]:
+            print(f"{name}: {failure}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if r["ok"] < r["runs"] and base["ok"] == base["runs"]:
+            regressions.append(f"{name}: {r['runs'] - r['ok']} of {r['runs']} runs failed")
+        for key in ("e2e_ms", "step_ms", "snapshot_chars", "screenshot_kb"):
+            if base.get(key) and r[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {base[key]} -> {r[key]}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end agent benchmark on local fixture sites")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--model-latency", type=float, default=0.0, help="simulated model response time in seconds")
+    parser.add_argument("--profile", default="headless", help="browser launch profile (backend/browser/launch.py)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="pipelined snapshots (YB_PIPELINE), best seen with --model-latency")
+    parser.add_argument("--replay", action="store_true", help="keep the trajectory cache between repeats")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.scenarios.split(","), args.repeats, args.model_latency, args.replay, args.profile,
+                            args.pipeline))
+    report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,31 @@
+# python -m benchmarks.extraction_benchmark --nodes 1000,5000,20000,50000
+import argparse
+import asyncio
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "large_dom.html"
+
+
+async def run(nodes: str, repeats: int, headless: bool = True):
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=headless)
+        page = await browser.new_page(viewport={"width": 1280, "height": 720})
+        await page.goto(f"{FIXTURE_PATH.as_uri()}?nodes={nodes}&repeats={repeats}")
+        await page.wait_for_function("window.benchmarkResults", timeout=0)
+        results = await page.evaluate("window.benchmarkResults")
+        await browser.close()
+
+    print(f"{'DOM nodes':>10} {'elements':>10} {'markPage ms':>12}")
+    for row in results:
+        print(f"{row['nodes']:>10} {row['elements']:>10} {row['medianMs']:>12}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="markPage extraction time against DOM size")
+    parser.add_argument("--nodes", default="1000,5000,10000,20000,50000")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.nodes, args.repeats, headless=not args.headed))
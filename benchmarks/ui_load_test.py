@@ -0,0 +1,163 @@
+# python -m benchmarks.ui_load_test --sessions 50 --turns 3 --events 40
+#
+# Many concurrent UI sessions against a fake backend that streams progress
+# events like the coordinator does. Each session uses the real
+# frontend WebSocketManager and emulates the UI's render loop:
+#   push → a tick every 500 ms like the app's live fragment: the queue is drained only
+#          when the manager's version changed, the live part is redrawn on every tick
+#   poll → full re-render of the message list every 500 ms (st_autorefresh)
+# Reports lost messages, delivery latency and how much rendering each mode did.
+import argparse
+import asyncio
+import queue
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "frontend"))
+from ws_manager import WebSocketManager  # noqa: E402
+
+
+def make_backend(events: int, event_interval: float, thumbnail_bytes: int) -> FastAPI:
+    app = FastAPI()
+    thumbnail = "A" * thumbnail_bytes
+
+    @app.websocket("/ws")
+    async def ws_endpoint(ws: WebSocket):
+        await ws.accept()
+        seq = 0
+        try:
+            while True:
+                payload = await ws.receive_json()
+                goal_id = f"{payload['uid']}-{seq}"
+                await ws.send_json([{"role": "model", "goal_id": goal_id, "seq": seq, "sent": time.time(),
+                                     "function_call": {"name": "web_interaction", "args": {"goal": payload["text"]}}}])
+                seq += 1
+                for step in range(events):
+                    event = {"type": "progress", "goal_id": goal_id, "step": step, "phase": "action",
+                             "seq": seq, "sent": time.time()}
+                    if thumbnail_bytes and step % 3 == 0:
+                        event["thumbnail"] = thumbnail
+                    await ws.send_json(event)
+                    seq += 1
+                    await asyncio.sleep(event_interval)
+                await ws.send_json([{"role": "model", "text": "done", "seq": seq, "sent": time.time()}])
+                seq += 1
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Session:
+    def __init__(self, url: str, mode: str, interval: float):
+        self.manager = WebSocketManager(url=url)
+        self.mode = mode
+        self.interval = interval
+        self.received = []
+        self.latencies = []
+        self.renders = 0
+        self.rendered_items = 0
+        self.stop = False
+
+    def _drain(self):
+        while True:
+            try:
+                data = self.manager._message_queue.get_nowait()
+            except queue.Empty:
+                return
+            now = time.time()
+            for item in data if isinstance(data, list) else [data]:
+                self.received.append(item["seq"])
+                self.latencies.append(now - item["sent"])
+
+    def ui_loop(self):
+        version = 0
+        while not self.stop:
+            time.sleep(self.interval)
+            if self.mode == "push":
+                # frontend/app.py live_updates
+                if self.manager.version != version:
+                    version = self.manager.version
+                    self._drain()
+                self.renders += 1
+                self.rendered_items += 1          # live part only
+            else:
+                self._drain()
+                self.renders += 1
+                self.rendered_items += len(self.received)   # whole history
+        self._drain()
+
+
+def run(sessions: int, turns: int, events: int, mode: str, event_interval: float, thumbnail_bytes: int):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(make_backend(events, event_interval, thumbnail_bytes),
+                                           host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    clients = [Session(f"ws://127.0.0.1:{port}/ws", mode, 0.5) for _ in range(sessions)]
+    threads = []
+    for client in clients:
+        client.manager.start()
+        thread = threading.Thread(target=client.ui_loop, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    expected = turns * (events + 2)
+    started = time.time()
+    for turn in range(turns):
+        for client in clients:
+            client.manager.send({"role": "user", "text": f"goal {turn}"})
+    deadline = started + turns * events * event_interval * 4 + 30
+    while time.time() < deadline and any(len(c.received) < expected for c in clients):
+        time.sleep(0.2)
+    elapsed = time.time() - started
+
+    for client in clients:
+        client.stop = True
+        client.manager.stop()
+    for thread in threads:
+        thread.join(timeout=2)
+    server.should_exit = True
+
+    received = sum(len(set(c.received)) for c in clients)
+    out_of_order = sum(1 for c in clients if c.received != sorted(c.received))
+    latencies = sorted(l for c in clients for l in c.latencies)
+    renders = sum(c.renders for c in clients)
+    items = sum(c.rendered_items for c in clients)
+
+    print(f"mode={mode} sessions={sessions} turns={turns} events/turn={events} elapsed={elapsed:.1f}s")
+    print(f"  messages  expected={expected * sessions} received={received} lost={expected * sessions - received} "
+          f"sessions out of order={out_of_order}")
+    if latencies:
+        print(f"  latency   p50={statistics.median(latencies) * 1000:.1f}ms "
+              f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms")
+    print(f"  rendering reruns/session/s={renders / sessions / elapsed:.2f} "
+          f"items rendered/session={items / sessions:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent UI sessions against a streaming websocket backend")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--events", type=int, default=40)
+    parser.add_argument("--event-interval", type=float, default=0.02)
+    parser.add_argument("--thumbnail-bytes", type=int, default=12000)
+    parser.add_argument("--mode", choices=["push", "poll", "both"], default="both")
+    args = parser.parse_args()
+    for mode in (["push", "poll"] if args.mode == "both" else [args.mode]):
+        run(args.sessions, args.turns, args.events, mode, args.event_interval, args.thumbnail_bytes)
@@ -3,14 +3,8 @@
 // Does NOT create any DOM overlays.
 
 (function () {
-  // utility: escape XML text
-  function xmlEscape(str) {
-    if (str == null) return "";
-    return String(str)
-      .replace(/&/g, "&amp;")
-      .replace(/</g, "&lt;")
-      .replace(/>/g, "&gt;");
-  }
+  // the script is injected both as an init script and on demand, keep the first install
+  if (window.markPage && window.settlePage) return;
 
   // Create a simple CSS selector for element
   function makeCssSelector(el) {
@@ -46,9 +40,9 @@
   }
 
   // Check if element is visible in the viewport (some heuristics)
-  function isVisible(el) {
+  function isVisible(el, style) {
     try {
-      var style = window.getComputedStyle(el);
+      style = style || window.getComputedStyle(el);
       if (style.display === 'none' || style.visibility === 'hidden' || parseFloat(style.opacity || '1') === 0) return false;
       var rect = el.getBoundingClientRect();
       if (rect.width <= 0 || rect.height <= 0) return false;
@@ -71,7 +65,7 @@
   function collectAttributes(el) {
     var attrs = {};
     try {
-      var attrList = ['id', 'name', 'href', 'type', 'value', 'placeholder', 'title', 'role', 'tabindex', 'aria-label', 'aria-hidden', 'alt', 'src'];
+      var attrList = ['id', 'name', 'href', 'type', 'value', 'placeholder', 'title', 'role', 'tabindex', 'aria-label', 'aria-hidden', 'aria-autocomplete', 'contenteditable', 'alt', 'src'];
       attrList.forEach(function (k) {
         var v = el.getAttribute && el.getAttribute(k);
         if (v != null) attrs[k] = v;
@@ -82,137 +76,594 @@
     return attrs;
   }
 
-  // Main function
-  function markPage() {
-    var vw = Math.max(document.documentElement.clientWidth || 0, window.innerWidth || 0);
-    var vh = Math.max(document.documentElement.clientHeight || 0, window.innerHeight || 0);
+  // Tags that never render a box, rejected before any style/layout work
+  var SKIP_TAGS = {
+    HEAD: 1, TITLE: 1, META: 1, LINK: 1, BASE: 1, SCRIPT: 1, STYLE: 1, NOSCRIPT: 1,
+    TEMPLATE: 1, BR: 1, WBR: 1, SOURCE: 1, TRACK: 1, PARAM: 1
+  };
 
-    var elements = Array.prototype.slice.call(document.querySelectorAll('*'));
+  // Tags that are interactive by themselves, no computed style needed
+  var INTERACTIVE_TAGS = {
+    INPUT: 1, TEXTAREA: 1, SELECT: 1, BUTTON: 1, A: 1, IFRAME: 1, VIDEO: 1
+  };
 
-    var items = elements.map(function (element) {
-      var textualContent = (element.textContent || '').trim().replace(/\s{2,}/g, ' ');
-      var elementType = element.tagName ? element.tagName.toLowerCase() : '';
-      var ariaLabel = element.getAttribute && (element.getAttribute('aria-label') || element.getAttribute('aria-labelledby')) || '';
+  function isInteractive(element, style) {
+    if (INTERACTIVE_TAGS[element.tagName] || element.onclick != null) return true;
+    style = style || window.getComputedStyle(element);
+    return style.cursor === 'pointer';
+  }
 
-      // get rects (some elements have many client rects)
-      var rects = [];
-      try {
-        var clientRects = Array.prototype.slice.call(element.getClientRects() || []);
-        clientRects.forEach(function (bb) {
-          // clip to viewport bounds
-          var left = Math.max(0, bb.left);
-          var top = Math.max(0, bb.top);
-          var right = Math.min(vw, bb.right);
-          var bottom = Math.min(vh, bb.bottom);
-          var width = Math.max(0, right - left);
-          var height = Math.max(0, bottom - top);
-          if (width > 0 && height > 0) {
-            rects.push({
-              left: Math.round(left),
-              top: Math.round(top),
-              right: Math.round(right),
-              bottom: Math.round(bottom),
-              width: Math.round(width),
-              height: Math.round(height)
-            });
-          }
-        });
-      } catch (e) {
-        // ignore rect errors
+  // get rects (some elements have many client rects), clipped to the viewport
+  function clippedRects(element, vw, vh) {
+    var rects = [];
+    try {
+      var clientRects = element.getClientRects() || [];
+      for (var i = 0; i < clientRects.length; i++) {
+        var bb = clientRects[i];
+        var left = Math.max(0, bb.left);
+        var top = Math.max(0, bb.top);
+        var right = Math.min(vw, bb.right);
+        var bottom = Math.min(vh, bb.bottom);
+        var width = Math.max(0, right - left);
+        var height = Math.max(0, bottom - top);
+        if (width > 0 && height > 0) {
+          rects.push({
+            left: Math.round(left),
+            top: Math.round(top),
+            right: Math.round(right),
+            bottom: Math.round(bottom),
+            width: Math.round(width),
+            height: Math.round(height)
+          });
+        }
+      }
+    } catch (e) {
+      // ignore rect errors
+    }
+    return rects;
+  }
+
+  // Run the filters from cheapest to most expensive (tag → style → rects → hit test).
+  // Returns null for elements that can't end up in the snapshot.
+  function measureElement(element, vw, vh) {
+    if (SKIP_TAGS[element.tagName]) return null;
+
+    var style;
+    try { style = window.getComputedStyle(element); } catch (e) { return null; }
+    if (!isInteractive(element, style)) return null;
+
+    var rects = clippedRects(element, vw, vh);
+    var area = rects.reduce(function (acc, r) { return acc + (r.width * r.height); }, 0);
+    if (area < 20) return null;
+
+    if (!isVisible(element, style)) return null;
+
+    return { element: element, style: style, rects: rects, area: area };
+  }
+
+  // Build the full per-element record, only done for elements that survived all filters
+  function describeElement(measured) {
+    var element = measured.element;
+    return {
+      element: element,
+      include: true,
+      area: measured.area,
+      rects: measured.rects,
+      text: (element.textContent || '').trim().replace(/\s{2,}/g, ' '),
+      type: element.tagName ? element.tagName.toLowerCase() : '',
+      ariaLabel: element.getAttribute && (element.getAttribute('aria-label') || element.getAttribute('aria-labelledby')) || '',
+      attributes: collectAttributes(element),
+      cssSelector: makeCssSelector(element),
+      xpath: null,
+      visible: true,
+      computedCursor: measured.style.cursor || ''
+    };
+  }
+
+  // Only keep inner clickable items: a single pass marks every ancestor of an
+  // item; items that got marked contain another item and are dropped.
+  // Each DOM node is walked at most once, so this is linear in the tree size.
+  function keepInnermost(items) {
+    var itemSet = new Set();
+    items.forEach(function (item) { itemSet.add(item.element); });
+
+    var walked = new Set();
+    var hasInnerItem = new Set();
+    items.forEach(function (item) {
+      for (var node = item.element.parentElement; node; node = node.parentElement) {
+        if (walked.has(node)) break;
+        walked.add(node);
+        if (itemSet.has(node)) hasInnerItem.add(node);
       }
+    });
 
-      var area = rects.reduce(function (acc, r) { return acc + (r.width * r.height); }, 0);
+    return items.filter(function (item) { return !hasInnerItem.has(item.element); });
+  }
 
+  // Convert an item to pure data (remove DOM references).
+  // `index` is the element's registry key, stable for as long as the document lives.
+  function toData(item, index) {
+    var rects = (item.rects || []).map(function (r) {
+      // center coordinate for each rect
+      var cx = Math.round(r.left + r.width / 2);
+      var cy = Math.round(r.top + r.height / 2);
       return {
-        element: element,
-        include:
-          element.tagName === 'INPUT' ||
-          element.tagName === 'TEXTAREA' ||
-          element.tagName === 'SELECT' ||
-          element.tagName === 'BUTTON' ||
-          element.tagName === 'A' ||
-          element.onclick != null ||
-          window.getComputedStyle(element).cursor === 'pointer' ||
-          element.tagName === 'IFRAME' ||
-          element.tagName === 'VIDEO',
-        area: area,
-        rects: rects,
-        text: textualContent,
-        type: elementType,
-        ariaLabel: ariaLabel,
-        attributes: collectAttributes(element),
-        cssSelector: makeCssSelector(element),
-        xpath: makeXPath(element),
-        visible: isVisible(element),
-        computedCursor: (function () { try { return window.getComputedStyle(element).cursor; } catch (e) { return ''; } })()
+        left: r.left,
+        top: r.top,
+        right: r.right,
+        bottom: r.bottom,
+        width: r.width,
+        height: r.height,
+        centerX: cx,
+        centerY: cy
       };
     });
 
-    // keep only interactive & reasonably sized ones
-    items = items.filter(function (item) {
-      return item.include && item.area >= 20 && item.visible;
+    // overall center (average of rect centers)
+    var center = { x: null, y: null };
+    if (rects.length > 0) {
+      var sx = 0, sy = 0;
+      rects.forEach(function (r) { sx += r.centerX; sy += r.centerY; });
+      center.x = Math.round(sx / rects.length);
+      center.y = Math.round(sy / rects.length);
+    }
+
+    rememberElement(index, item.element);
+
+    return {
+      index: index,
+      type: item.type,
+      text: item.text,
+      ariaLabel: item.ariaLabel,
+      attributes: item.attributes,
+      cssSelector: item.cssSelector,
+      xpath: item.xpath != null ? item.xpath : xpathFor(item.element),
+      visible: item.visible,
+      computedCursor: item.computedCursor,
+      area: item.area,
+      rects: rects,
+      center: center
+    };
+  }
+
+  function pageInfo() {
+    return {
+      url: window.location.href,
+      title: document.title,
+      timestamp: new Date().toISOString()
+    };
+  }
+
+  function viewportSize() {
+    return {
+      vw: Math.max(document.documentElement.clientWidth || 0, window.innerWidth || 0),
+      vh: Math.max(document.documentElement.clientHeight || 0, window.innerHeight || 0)
+    };
+  }
+
+  // ---- Incremental element registry ----
+  // Keeps the set of interactive candidates alive between markPage calls and
+  // only re-scans the parts of the DOM reported by the observers.
+  var registry = {
+    documentId: Math.random().toString(36).slice(2) + Date.now().toString(36),
+    generation: 0,
+    nextKey: 1,
+    keys: new WeakMap(),        // element -> registry key (stable id of the element in this document)
+    refs: new Map(),            // key -> WeakRef of elements handed out, for locateElement
+    candidates: new Map(),      // key -> element
+    inViewport: new Set(),      // keys reported as intersecting by the IntersectionObserver
+    unreported: new Set(),      // keys observed but without a first intersection entry yet
+    emitted: new Map(),         // key -> signature of the data last returned to the caller
+    dirtyRoots: new Set(),      // subtrees to re-scan for candidates
+    needsPrune: false,          // nodes were removed since last call
+    stale: true,                // anything (mutation / scroll / intersection) changed
+    structureVersion: 0,        // bumped on every observed mutation, invalidates cached xpaths
+    xpaths: new WeakMap(),      // element -> {version, xpath}
+    started: false,
+    io: null,
+    mo: null
+  };
+
+  function keyFor(element) {
+    var key = registry.keys.get(element);
+    if (key == null) {
+      key = registry.nextKey++;
+      registry.keys.set(element, key);
+    }
+    return key;
+  }
+
+  // elements handed out in a snapshot can be looked up by id later on
+  function rememberElement(key, element) {
+    if (typeof WeakRef === 'undefined') return;
+    registry.refs.set(key, new WeakRef(element));
+  }
+
+  function pruneRefs() {
+    registry.refs.forEach(function (ref, key) {
+      var element = ref.deref();
+      if (!element || !element.isConnected) registry.refs.delete(key);
+    });
+  }
+
+  function considerCandidate(element) {
+    if (SKIP_TAGS[element.tagName]) return;
+    var key = keyFor(element);
+    var interactive = false;
+    try { interactive = isInteractive(element); } catch (e) { interactive = false; }
+    if (interactive) {
+      if (!registry.candidates.has(key)) {
+        registry.candidates.set(key, element);
+        if (registry.io) {
+          registry.unreported.add(key);
+          registry.io.observe(element);
+        }
+      }
+    } else if (registry.candidates.has(key)) {
+      forgetCandidate(key, element);
+    }
+  }
+
+  function forgetCandidate(key, element) {
+    registry.candidates.delete(key);
+    registry.inViewport.delete(key);
+    registry.unreported.delete(key);
+    if (registry.io) registry.io.unobserve(element);
+  }
+
+  function scanSubtree(root) {
+    if (!root || root.nodeType !== 1) return;
+    considerCandidate(root);
+    var nodes = root.querySelectorAll('*');
+    for (var i = 0; i < nodes.length; i++) considerCandidate(nodes[i]);
+  }
+
+  // attributes that decide candidacy (isInteractive, cursor) or end up in the element data
+  var OBSERVED_ATTRIBUTES = ['class', 'style', 'onclick', 'disabled', 'hidden', 'aria-labelledby',
+    'id', 'name', 'href', 'type', 'value', 'placeholder', 'title', 'role', 'tabindex', 'aria-label',
+    'aria-hidden', 'aria-autocomplete', 'contenteditable', 'alt', 'src'];
+
+  function startRegistry() {
+    if (registry.started) return;
+    registry.started = true;
+
+    if (typeof IntersectionObserver !== 'undefined') {
+      registry.io = new IntersectionObserver(function (entries) { applyIntersections(entries); });
+    }
+
+    registry.mo = new MutationObserver(recordMutations);
+    // text changes (prices, counters, status lines) and every attribute describeElement reads
+    registry.mo.observe(document, { childList: true, subtree: true, characterData: true, attributes: true, attributeFilter: OBSERVED_ATTRIBUTES });
+
+    var markStale = function () { registry.stale = true; };
+    window.addEventListener('scroll', markStale, { passive: true, capture: true });
+    window.addEventListener('resize', markStale, { passive: true });
+
+    scanSubtree(document.documentElement);
+  }
+
+  // xpaths walk every ancestor and its preceding siblings, so they are computed once per
+  // structure version; only valid while the mutation observer runs
+  function xpathFor(element) {
+    if (!registry.started) return makeXPath(element);
+    var entry = registry.xpaths.get(element);
+    if (entry && entry.version === registry.structureVersion) return entry.xpath;
+    var xpath = makeXPath(element);
+    registry.xpaths.set(element, { version: registry.structureVersion, xpath: xpath });
+    return xpath;
+  }
+
+  function recordMutations(records) {
+    var structural = false;
+    records.forEach(function (record) {
+      if (record.type === 'childList') {
+        Array.prototype.forEach.call(record.addedNodes, function (node) {
+          if (node.nodeType === 1) registry.dirtyRoots.add(node);
+        });
+        if (record.removedNodes.length) registry.needsPrune = true;
+        structural = true;
+      } else if (record.type === 'attributes') {
+        // class/style changes may flip the cursor of the whole subtree
+        registry.dirtyRoots.add(record.target);
+        if (record.attributeName === 'id') structural = true;
+      }
+      // characterData: the candidate set is the same, only descriptions change (stale below)
     });
+    if (records.length) registry.stale = true;
+    // xpaths only depend on tags, sibling positions and ids
+    if (structural) registry.structureVersion++;
+  }
 
-    // Only keep inner clickable items (same behaviour as your previous script)
-    items = items.filter(function (x) {
-      return !items.some(function (y) {
-        return x.element.contains(y.element) && x !== y;
-      });
+  function applyIntersections(entries) {
+    entries.forEach(function (entry) {
+      var key = registry.keys.get(entry.target);
+      if (key == null) return;
+      registry.unreported.delete(key);
+      if (entry.isIntersecting) registry.inViewport.add(key);
+      else registry.inViewport.delete(key);
     });
+    if (entries.length) registry.stale = true;
+  }
 
-    // Convert items to pure data (remove DOM references)
-    var data = items.map(function (item, index) {
-      var rects = (item.rects || []).map(function (r) {
-        // center coordinate for each rect
-        var cx = Math.round(r.left + r.width / 2);
-        var cy = Math.round(r.top + r.height / 2);
-        return {
-          left: r.left,
-          top: r.top,
-          right: r.right,
-          bottom: r.bottom,
-          width: r.width,
-          height: r.height,
-          centerX: cx,
-          centerY: cy
-        };
+  function flushRegistry() {
+    // deliver observer records that are still queued
+    if (registry.mo) recordMutations(registry.mo.takeRecords());
+    if (registry.io) applyIntersections(registry.io.takeRecords());
+
+    if (registry.needsPrune) {
+      registry.candidates.forEach(function (element, key) {
+        if (!element.isConnected) forgetCandidate(key, element);
       });
+      pruneRefs();
+      registry.needsPrune = false;
+    }
 
-      // overall center (average of rect centers)
-      var center = { x: null, y: null };
-      if (rects.length > 0) {
-        var sx = 0, sy = 0;
-        rects.forEach(function (r) { sx += r.centerX; sy += r.centerY; });
-        center.x = Math.round(sx / rects.length);
-        center.y = Math.round(sy / rects.length);
-      }
+    registry.dirtyRoots.forEach(function (root) {
+      if (root.isConnected) scanSubtree(root);
+    });
+    registry.dirtyRoots.clear();
+  }
+
+  function currentItems() {
+    var size = viewportSize();
+    var items = [];
+    registry.candidates.forEach(function (element, key) {
+      // without an intersection entry yet (or without an IntersectionObserver) the candidate has to be measured
+      if (registry.io && !registry.inViewport.has(key) && !registry.unreported.has(key)) return;
+      var measured = measureElement(element, size.vw, size.vh);
+      if (measured) items.push(measured);
+    });
+    items = keepInnermost(items).map(function (measured) {
+      var item = describeElement(measured);
+      item.key = registry.keys.get(measured.element);
+      return item;
+    });
+    // keep document order so the model sees elements top to bottom
+    items.sort(function (a, b) {
+      var pos = a.element.compareDocumentPosition(b.element);
+      return pos & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : (pos & Node.DOCUMENT_POSITION_PRECEDING ? 1 : 0);
+    });
+    return items;
+  }
+
+  function signature(item) {
+    return JSON.stringify([item.type, item.text, item.ariaLabel, item.attributes, item.cssSelector, item.computedCursor, item.area, item.rects]);
+  }
 
+  // Incremental variant of markPage: returns only the elements that changed
+  // since generation `opts.sinceGeneration` of document `opts.documentId`.
+  function markPageIncremental(opts) {
+    startRegistry();
+    flushRegistry();
+
+    var full = opts.documentId !== registry.documentId || opts.sinceGeneration !== registry.generation;
+
+    if (!full && !registry.stale) {
       return {
-        index: index,
-        type: item.type,
-        text: item.text,
-        ariaLabel: item.ariaLabel,
-        attributes: item.attributes,
-        cssSelector: item.cssSelector,
-        xpath: item.xpath,
-        visible: item.visible,
-        computedCursor: item.computedCursor,
-        area: item.area,
-        rects: rects,
-        center: center
+        pageInfo: pageInfo(), incremental: true, full: false,
+        documentId: registry.documentId, generation: registry.generation,
+        elements: [], removed: [], order: null
       };
+    }
+
+    var items = currentItems();
+    var changed = [];
+    var seen = new Map();
+    items.forEach(function (item) {
+      var sig = signature(item);
+      seen.set(item.key, sig);
+      if (full || registry.emitted.get(item.key) !== sig) changed.push(toData(item, item.key));
     });
 
-    // also provide page context info
-    var pageInfo = {
-      url: window.location.href,
-      title: document.title,
-      timestamp: new Date().toISOString()
+    var removed = [];
+    if (!full) {
+      registry.emitted.forEach(function (_sig, key) {
+        if (!seen.has(key)) removed.push(key);
+      });
+    }
+
+    var order = items.map(function (item) { return item.key; });
+    if (full || changed.length || removed.length) registry.generation++;
+    registry.emitted = seen;
+    registry.stale = false;
+
+    return {
+      pageInfo: pageInfo(), incremental: true, full: full,
+      documentId: registry.documentId, generation: registry.generation,
+      elements: changed, removed: removed, order: order
     };
+  }
+
+  // Runs while the model is thinking (BrowserManager.prewarm): delivers pending observer
+  // work and computes the xpaths of candidates up to `lookahead` viewports above and
+  // below, so the extraction after the next action, typically a scroll, only measures.
+  function prewarmPage(opts) {
+    var lookahead = (opts && opts.lookahead) || 1;
+    startRegistry();
+    flushRegistry();
+    var size = viewportSize();
+    var warmed = 0;
+    registry.candidates.forEach(function (element) {
+      var box = element.getBoundingClientRect();
+      if (box.width <= 0 || box.height <= 0) return;
+      if (box.bottom < -size.vh * lookahead || box.top > size.vh * (1 + lookahead)) return;
+      xpathFor(element);
+      warmed++;
+    });
+    return { warmed: warmed, candidates: registry.candidates.size };
+  }
+
+  // Main function
+  function markPage(opts) {
+    if (opts && opts.incremental) return markPageIncremental(opts);
+    // cached xpaths are only valid once queued mutations are accounted for
+    if (registry.mo) recordMutations(registry.mo.takeRecords());
+
+    var size = viewportSize();
+    var elements = document.querySelectorAll('*');
+
+    var items = [];
+    for (var i = 0; i < elements.length; i++) {
+      var measured = measureElement(elements[i], size.vw, size.vh);
+      if (measured) items.push(measured);
+    }
+
+    items = keepInnermost(items).map(describeElement);
+
+    if (registry.refs.size > 4 * items.length + 1000) pruneRefs();
+    var data = items.map(function (item) {
+      return toData(item, keyFor(item.element));
+    });
+
+    return { pageInfo: pageInfo(), documentId: registry.documentId, elements: data };
+  }
+
+  // ---- Element lookup ----
+  function centerOf(element) {
+    var size = viewportSize();
+    var rects = clippedRects(element, size.vw, size.vh);
+    if (!rects.length) return null;
+    var sx = 0, sy = 0;
+    rects.forEach(function (r) { sx += r.left + r.width / 2; sy += r.top + r.height / 2; });
+    return { x: Math.round(sx / rects.length), y: Math.round(sy / rects.length) };
+  }
+
+  function byXPath(xpath) {
+    try {
+      return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } catch (e) {
+      return null;
+    }
+  }
+
+  // Fingerprint fallback (other document, element replaced): same tag found by
+  // xpath or css selector, preferring the one whose text / aria label still match.
+  function findByFingerprint(query) {
+    var found = [];
+    var node = query.xpath ? byXPath(query.xpath) : null;
+    if (node) found.push(node);
+    if (query.cssSelector) {
+      try {
+        Array.prototype.forEach.call(document.querySelectorAll(query.cssSelector), function (el) { found.push(el); });
+      } catch (e) {
+        // not a valid selector (generated from odd class names)
+      }
+    }
+
+    var best = null, bestScore = -1;
+    found.forEach(function (el) {
+      if (query.type && el.tagName.toLowerCase() !== query.type) return;
+      var score = 0;
+      if (query.text && (el.textContent || '').trim().replace(/\s{2,}/g, ' ') === query.text) score += 2;
+      if (query.ariaLabel && el.getAttribute('aria-label') === query.ariaLabel) score += 2;
+      if (el === node) score += 1;
+      if (score > bestScore) { best = el; bestScore = score; }
+    });
+    // a selector hit alone is ambiguous when it matched several elements
+    if (best && bestScore === 0 && found.length > 1 && !query.type) return null;
+    return best;
+  }
+
+  // Current center of an element handed out earlier: by id while the document
+  // is the same one, otherwise by fingerprint. Scrolls it into view if needed.
+  function locateElement(query) {
+    query = query || {};
+    var element = null, how = null;
+    if (query.documentId === registry.documentId && registry.refs.has(query.index)) {
+      element = registry.refs.get(query.index).deref();
+      if (element && element.isConnected) how = 'id';
+      else element = null;
+    }
+    if (!element) {
+      element = findByFingerprint(query);
+      if (element) how = 'fingerprint';
+    }
+    if (!element) return null;
+
+    var center = centerOf(element);
+    if (!center) {
+      element.scrollIntoView({ block: 'center', inline: 'center' });
+      center = centerOf(element);
+    }
+    if (!center) return null;
+    return { x: center.x, y: center.y, index: keyFor(element), matchedBy: how };
+  }
+
+  // ---- Page settle detection ----
+  // Tracks DOM mutations from the moment the script is installed so that
+  // settlePage() can tell how long the document has been quiet.
+  var settleState = { lastMutation: 0, mutations: 0, observer: null };
 
-    return { pageInfo: pageInfo, elements: data };
+  function ensureMutationObserver() {
+    if (settleState.observer || typeof MutationObserver === 'undefined') return;
+    settleState.observer = new MutationObserver(function (records) {
+      settleState.mutations += records.length;
+      settleState.lastMutation = performance.now();
+    });
+    settleState.observer.observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+  }
+
+  // Resolve after `count` animation frames. rAF is paused for background tabs,
+  // so a timer fallback makes sure we never hang on it.
+  function waitFrames(count) {
+    return new Promise(function (resolve) {
+      var done = false;
+      var timer = setTimeout(function () { done = true; resolve(); }, 100);
+      function step() {
+        if (done) return;
+        if (--count <= 0) { clearTimeout(timer); done = true; resolve(); return; }
+        requestAnimationFrame(step);
+      }
+      requestAnimationFrame(step);
+    });
   }
 
-  // expose function
+  // Resolve once no DOM mutation happened for `quietMs`, or after `timeoutMs`.
+  function settlePage(opts) {
+    opts = opts || {};
+    var quietMs = opts.quietMs != null ? opts.quietMs : 200;
+    var timeoutMs = opts.timeoutMs != null ? opts.timeoutMs : 5000;
+    ensureMutationObserver();
+
+    var start = performance.now();
+    var startMutations = settleState.mutations;
+
+    function result(timedOut) {
+      return {
+        elapsedMs: Math.round(performance.now() - start),
+        mutations: settleState.mutations - startMutations,
+        readyState: document.readyState,
+        timedOut: timedOut
+      };
+    }
+
+    // let pending handlers/paints of the previous action run first
+    return waitFrames(2).then(function () {
+      return new Promise(function (resolve) {
+        function check() {
+          var now = performance.now();
+          var quietFor = now - settleState.lastMutation;
+          if (quietFor >= quietMs) return resolve(result(false));
+          if (now - start >= timeoutMs) return resolve(result(true));
+          setTimeout(check, Math.max(10, Math.min(quietMs - quietFor, timeoutMs - (now - start))));
+        }
+        check();
+      });
+    });
+  }
+
+  // Changes whenever the document is replaced or mutated, used to skip re-scanning unchanged tabs
+  function pageVersion() {
+    return registry.documentId + ':' + settleState.mutations;
+  }
+
+  ensureMutationObserver();
+
+  // expose functions
   window.markPage = markPage;
+  window.settlePage = settlePage;
+  window.waitFrames = waitFrames;
+  window.pageVersion = pageVersion;
+  window.locateElement = locateElement;
+  window.prewarmPage = prewarmPage;
 })();
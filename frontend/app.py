@@ -1,16 +1,35 @@
 import streamlit as st
+import base64
+import os
 import queue
-from streamlit_autorefresh import st_autorefresh
 from ws_manager import WebSocketManager
 
+# push (default): the chat history is rendered on real reruns only, a small fragment
+#                 re-renders the live part when the websocket delivered something new
+# poll:           legacy full-page st_autorefresh every 500 ms
+UI_MODE = os.environ.get("YB_UI_MODE", "push")
+LIVE_INTERVAL = float(os.environ.get("YB_UI_LIVE_INTERVAL", "0.5"))
+
 # ----------------------------
 # SESSION STATE INIT
 # ----------------------------
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# goal_id -> progress events streamed by the web automation agents
+if "progress" not in st.session_state:
+    st.session_state.progress = {}
+
 if "ws_message_queue" not in st.session_state:
-    st.session_state.ws_message_queue = queue.Queue(maxsize=500)
+    # unbounded, nothing received is ever dropped
+    st.session_state.ws_message_queue = queue.Queue()
+
+# last control acknowledgement from the backend (queued / cancel / pause / resume)
+if "status" not in st.session_state:
+    st.session_state.status = None
+
+if "rendered_version" not in st.session_state:
+    st.session_state.rendered_version = 0
 
 if "ws_manager" not in st.session_state:
     st.session_state.ws_manager = WebSocketManager(
@@ -20,14 +39,19 @@ if "ws_manager" not in st.session_state:
 
 ws = st.session_state.ws_manager
 
-st_autorefresh(interval=500, key="ws_refresh")
+if UI_MODE == "poll":
+    from streamlit_autorefresh import st_autorefresh
+    st_autorefresh(interval=500, key="ws_refresh")
 
 
 # ----------------------------
 # DRAIN WS QUEUE INTO SESSION
 # ----------------------------
+MAX_PROGRESS_EVENTS = 60
+
 def drain_queue_to_session():
     q = st.session_state.ws_message_queue
+    st.session_state.rendered_version = ws.version
     while True:
         try:
             data = q.get_nowait()
@@ -35,6 +59,12 @@ def drain_queue_to_session():
             break
         if isinstance(data, list):
             st.session_state.messages.extend(data)
+        elif isinstance(data, dict) and data.get("type") == "progress":
+            events = st.session_state.progress.setdefault(data.get("goal_id"), [])
+            events.append(data)
+            del events[:-MAX_PROGRESS_EVENTS]
+        elif isinstance(data, dict) and data.get("type") == "status":
+            st.session_state.status = data
         else:
             st.session_state.messages.append(data)
 
@@ -44,29 +74,64 @@ drain_queue_to_session()
 # ----------------------------
 # DETECT consecutive function_call messages at end
 # ----------------------------
-def get_trailing_function_call_indices(messages):
-    indices = []
-    for i in range(len(messages) - 1, -1, -1):
-        if "function_call" in messages[i]:
-            indices.append(i)
-        else:
-            break
-    return set(indices)
-
-trailing_fc_indices = get_trailing_function_call_indices(st.session_state.messages)
+def get_live_start(messages):
+    # index of the first function_call of the trailing group (still running);
+    # user messages sent while it runs are queued follow-ups and belong to it
+    start = live = len(messages)
+    while start > 0 and ("function_call" in messages[start - 1] or messages[start - 1].get("role") == "user"):
+        start -= 1
+        if "function_call" in messages[start]:
+            live = start
+    return live
 
 
 # ----------------------------
-# RENDER UI
+# PROGRESS OF ONE GOAL
 # ----------------------------
-st.title("YB Browser")
+def describe_event(event):
+    phase = event.get("phase")
+    elapsed = f"{event.get('elapsed_ms', 0) / 1000:.1f}s"
+    if phase == "snapshot":
+        return f"Step {event.get('step')}: looked at page ({event.get('elements', 0)} elements) · {elapsed}"
+    if phase == "decision":
+        what = event.get("summary") or event.get("action") or "deciding"
+        if event.get("replayed"):
+            what += " (replayed)"
+        return f"Step {event.get('step')}: {what} · {elapsed}"
+    if phase == "action":
+        return f"Step {event.get('step')}: ran `{event.get('action')}` · {elapsed}"
+    if phase == "queued":
+        return f"Queued, {event.get('position')} goal(s) ahead"
+    if phase == "finished":
+        error = f": {event['error']}" if event.get("error") else ""
+        return f"Finished with `{event.get('status')}`{error} · {elapsed}"
+    return str(event)
+
+
+def render_progress(goal_id, running):
+    events = st.session_state.progress.get(goal_id) or []
+    if not events:
+        return
+    if running:
+        st.caption(describe_event(events[-1]))
+        thumbnail = next((e["thumbnail"] for e in reversed(events) if e.get("thumbnail")), None)
+        if thumbnail:
+            st.image(base64.b64decode(thumbnail), width=320)
+    with st.expander(f"Steps ({len([e for e in events if e.get('phase') == 'action'])} actions)", expanded=False):
+        for event in events:
+            if event.get("phase") != "snapshot":
+                st.markdown(f"- {describe_event(event)}")
 
-for idx, message in enumerate(st.session_state.messages):
+
+# ----------------------------
+# RENDER ONE MESSAGE
+# ----------------------------
+def render_message(message, running):
 
     # ----- REGULAR TEXT MESSAGE -----
     if message.get("text"):
         st.chat_message(message["role"]).write(message["text"])
-        continue
+        return
 
     # ----- FUNCTION CALL MESSAGE -----
     if "function_call" in message:
@@ -86,13 +151,69 @@ for idx, message in enumerate(st.session_state.messages):
         chat = st.chat_message("agent")
 
         # If this function call is in trailing group => show loader
-        if idx in trailing_fc_indices:
+        if running:
             with chat:
                 with st.spinner("Running automation..."):
                     st.markdown(pretty_text)
+                render_progress(message.get("goal_id"), running=True)
         else:
             # Completed state
             chat.success(pretty_text)
+            with chat:
+                render_progress(message.get("goal_id"), running=False)
+
+
+# ----------------------------
+# LIVE PART (push mode)
+# ----------------------------
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+@fragment(run_every=LIVE_INTERVAL)
+def live_updates():
+    # the live part and its buttons are drawn on every run (a fragment run that draws nothing
+    # clears them, and a Stop / Pause click reruns the fragment with an unchanged version);
+    # the cheap version check only decides whether there is anything to drain
+    messages = st.session_state.messages
+    live_start = get_live_start(messages)
+    if ws.version != st.session_state.rendered_version:
+        drain_queue_to_session()
+        if get_live_start(messages) != live_start:
+            # a model response ended the live part: one full render of the history
+            st.rerun()
+    for message in messages[live_start:]:
+        render_message(message, running=True)
+    if live_start < len(messages):
+        render_controls()
+
+
+def render_controls():
+    # cancel / pause the running turn; the backend keeps reading the socket while agents run
+    status = st.session_state.status or {}
+    paused = status.get("action") == "pause"
+    stop_col, pause_col = st.columns(2)
+    if stop_col.button("Stop", key="stop_run"):
+        ws.send({"action": "cancel"})
+    if pause_col.button("Resume" if paused else "Pause", key="pause_run"):
+        ws.send({"action": "resume" if paused else "pause"})
+    if status.get("action") == "queued":
+        st.caption("Your message will be handled when the current task finishes.")
+
+
+# ----------------------------
+# RENDER UI
+# ----------------------------
+st.title("YB Browser")
+
+live_start = get_live_start(st.session_state.messages)
+for idx, message in enumerate(st.session_state.messages):
+    if UI_MODE != "poll" and idx >= live_start:
+        break
+    render_message(message, running=idx >= live_start)
+
+if UI_MODE != "poll":
+    live_updates()
+elif live_start < len(st.session_state.messages):
+    render_controls()
 
 
 # ----------------------------
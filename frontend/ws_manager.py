@@ -5,13 +5,19 @@ import uuid
 import threading
 import queue
 import time
+import os
 
-WS_URL = "ws://localhost:8000/ws"
+WS_URL = os.environ.get("YB_WS_URL", "ws://localhost:8000/ws")
 
 class WebSocketManager:
-    def __init__(self, message_queue):
+    def __init__(self, message_queue=None, url=None):
         self.uid = str(uuid.uuid4())
-        self._message_queue = message_queue
+        # unbounded by default: incoming messages are never dropped, a bounded queue
+        # passed in makes the listener wait (and the socket backpressure the server)
+        self._message_queue = message_queue if message_queue is not None else queue.Queue()
+        self._url = url or WS_URL
+        # bumped for every received message, lets the UI re-render only when something arrived
+        self.version = 0
         self._outbound_q = queue.Queue()
         self._ws_connected = False
         self._last_error = None
@@ -58,18 +64,9 @@ class WebSocketManager:
                 data = json.loads(message)
             except Exception:
                 data = message
-            # Non-blocking put (if queue is full, we drop oldest to avoid blocking)
-            try:
-                self._message_queue.put_nowait(data)
-            except queue.Full:
-                try:
-                    _ = self._message_queue.get_nowait()  # drop one
-                except queue.Empty:
-                    pass
-                try:
-                    self._message_queue.put_nowait(data)
-                except queue.Full:
-                    print("[ws] message queue full, dropped message")
+            # Blocking put: a full queue pauses reading instead of losing messages
+            self._message_queue.put(data)
+            self.version += 1
 
         def on_error(ws, error):
             self._last_error = str(error)
@@ -82,7 +79,7 @@ class WebSocketManager:
         while not self._should_stop:
             try:
                 ws_app = websocket.WebSocketApp(
-                    f"{WS_URL}?uid={self.uid}",
+                    f"{self._url}?uid={self.uid}",
                     on_open=on_open,
                     on_message=on_message,
                     on_error=on_error,
@@ -0,0 +1,77 @@
+import asyncio
+
+from google.genai import types
+
+from backend.agents import coordinator_agent
+from backend.model_interactions.history import HistoryManager
+
+
+class FakeProgress:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, payload):
+        self.sent.append(payload)
+
+    def publish(self, event):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = object()
+        self.pages.append(page)
+        return page
+
+
+class FakeBrowserManager:
+    def __init__(self):
+        self.context = FakeContext()
+
+    async def context_for(self, uid):
+        return self.context
+
+    async def get_page_summaries(self, context):
+        return []
+
+
+class FakeWebGraph:
+    """Stands in for web_automation_agent_graph: a finished goal with its page and snapshot payloads."""
+
+    async def ainvoke(self, state, config=None):
+        return {**state, "action": "done", "action_args": {"output": "found it"},
+                "last_screenshot": b"png" * 1000, "last_elements": ["element"] * 100}
+
+
+def test_post_tool_calls_drops_goal_payloads(monkeypatch):
+    responses = iter([
+        types.Content(role="model", parts=[types.Part.from_function_call(
+            name="web_interaction", args={"goal": "find the price", "url": "https://example.com"})]),
+        types.Content(role="model", parts=[types.Part.from_text(text="The price is 3.")]),
+    ])
+
+    async def fake_call_gemini(conversation_history):
+        return next(responses)
+
+    monkeypatch.setattr(coordinator_agent, "call_gemini", fake_call_gemini)
+    monkeypatch.setattr(coordinator_agent, "web_automation_agent_graph", FakeWebGraph())
+
+    state = {
+        "progress": FakeProgress(),
+        "browser_manager": FakeBrowserManager(),
+        "worker_pool": None,
+        "session_id": "test",
+        "history": HistoryManager([]),
+        "last_user_message": "what does it cost?",
+        "subgraph_states": [],
+    }
+    result = asyncio.run(coordinator_agent.coordinator_agent_graph.ainvoke(state))
+
+    assert result["subgraph_states"] == [{"goal_statement": "find the price WEBSITE - https://example.com",
+                                          "action": "done", "action_args": {"output": "found it"}}]
+    responses_sent = [part.function_response.response for message in result["history"].messages
+                      for part in message.parts if part.function_response]
+    assert responses_sent == [{"result": {"status": "done", "output": "found it"}}]
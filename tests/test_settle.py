@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from backend.browser.settle import PageSettler, SettleConfig
+
+
+class FakeRequest:
+    def __init__(self, frame, resource_type="fetch"):
+        self.frame = frame
+        self.resource_type = resource_type
+        self.failure = None
+
+    def is_navigation_request(self):
+        return False
+
+
+class FakePage:
+    """Just enough of a Playwright page for PageSettler: a quiet DOM and the request events."""
+
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event, *args):
+        for handler in self.handlers.get(event, []):
+            handler(*args)
+
+    async def evaluate(self, expression, arg=None):
+        return {"timedOut": False, "mutations": 0}
+
+    async def wait_for_load_state(self, state, timeout=None):
+        return None
+
+
+def test_settle_ignores_a_permanently_pending_request():
+    settler = PageSettler(SettleConfig(timeout=3, network_idle_ms=50))
+    page = FakePage()
+    settler.attach(page)
+    # a long-poll that never answers, plus a beacon and a websocket
+    page.emit("request", FakeRequest(page.main_frame, "xhr"))
+    page.emit("request", FakeRequest(page.main_frame, "ping"))
+    page.emit("request", FakeRequest(page.main_frame, "websocket"))
+
+    started = time.monotonic()
+    report = asyncio.run(settler.settle(page, reason="test"))
+
+    assert report.network_idle and not report.timed_out
+    assert time.monotonic() - started < 1
+
+
+def test_settle_waits_for_more_requests_than_allowed():
+    settler = PageSettler(SettleConfig(timeout=0.3, network_idle_ms=50, max_inflight=2))
+    page = FakePage()
+    settler.attach(page)
+    for _ in range(3):
+        page.emit("request", FakeRequest(page.main_frame, "fetch"))
+
+    report = asyncio.run(settler.settle(page, reason="test"))
+
+    assert report.timed_out and not report.network_idle